@@ -1,10 +1,10 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
-from werkzeug.utils import secure_filename
+from flask import Flask, Response, abort, render_template, request, redirect, url_for, flash, session, jsonify, g
+from markupsafe import Markup
+from werkzeug.exceptions import NotFound
+import hashlib
 import os
 import re
-from datetime import datetime
+from itertools import islice
 from config import config
 
 app = Flask(__name__)
@@ -16,14 +16,21 @@ app.config.from_object(config[config_name])
 # Создаем папку для загрузок если её нет
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Инициализируем расширения
-bcrypt = Bcrypt()
-
-# Инициализируем расширения с приложением
-bcrypt.init_app(app)
-
 # Импортируем модели и db
-from models import db, User, Recipe, Category, Ingredient, RecipeIngredient, Comment, Rating, Favorite, UserProfile
+from models import db, User, Recipe, RecipeIngredient, Comment, Rating, Favorite, UserProfile
+from pagination import InvalidCursor, keyset_paginate
+from bulk import insert_ignore_from_select, resolve_ingredient_ids, upsert
+from images import save_upload, schedule_image_cleanup, image_variants, recipe_image
+from cache import create_cache
+from search import ensure_search_index, index_recipe, unindex_recipes, search_subquery
+from passwords import PasswordHasher, PasswordHasherBusy
+from metrics import RequestMetrics
+from transfer import RecipeLoader, export_records, parse_ndjson, to_ndjson
+from categories import category_cache
+from ratings import rating_aggregator
+from http_cache import http_cache
+from static_assets import static_assets
+from compression import CompressionMiddleware
 
 # Инициализируем db с приложением
 db.init_app(app)
@@ -31,6 +38,82 @@ db.init_app(app)
 # Создаем таблицы
 with app.app_context():
     db.create_all()
+    # Индекс полнотекстового поиска (FULLTEXT в MySQL, FTS5 в SQLite): при
+    # запуске только создается пустая таблица. Полное построение - DELETE и
+    # INSERT ... SELECT по всем рецептам - выполняет migrate_search_index.py:
+    # иначе его запускал бы каждый процесс WSGI-сервера и каждый скрипт,
+    # импортирующий app, одновременно и по тем же строкам
+    if ensure_search_index() and db.session.execute(db.select(Recipe.id).limit(1)).first():
+        app.logger.warning("Создан пустой поисковый индекс; заполните его: python migrate_search_index.py")
+
+# Варианты изображений рецептов доступны в шаблонах
+app.add_template_global(recipe_image)
+
+# CSS/JS по адресам с хешем содержимого (кэш браузера на год) и заранее
+# сжатые gzip/br варианты
+static_assets.init_app(app)
+
+# Кэш отрендеренных фрагментов: карточки рецептов и части страницы рецепта.
+# Ключ включает updated_at и счетчики рецепта (в MySQL updated_at хранится с
+# точностью до секунды), поэтому изменение рецепта, новая оценка, комментарий
+# или избранное дают новый ключ. Ключ карточки включает имя автора, название
+# категории и готовность вариантов изображения; смена имени сбрасывает
+# комментарии пользователя явно
+fragment_cache = create_cache(app.config)
+RECIPE_FRAGMENTS = ('body', 'comments')
+
+# Число SQL-запросов и время по маршрутам: Server-Timing и /metrics
+request_metrics = RequestMetrics(app)
+request_metrics.register_cache('fragments', fragment_cache)
+
+# Список категорий в памяти процесса: фильтр каталога, форма рецепта, карточки
+category_cache.init_app(app)
+request_metrics.register_cache('categories', category_cache)
+
+# Агрегаты оценок пересчитываются пакетно: раз в RATING_FLUSH_INTERVAL_MS
+# или после RATING_FLUSH_MAX_VOTES голосов
+rating_aggregator.init_app(app)
+
+# Условные GET (ETag/Last-Modified, ответ 304) для каталога и страницы рецепта
+http_cache.init_app(app)
+request_metrics.register_cache('http', http_cache)
+
+# Сжатие HTML/JSON ответов (gzip, br) с учетом Accept-Encoding
+app.wsgi_app = CompressionMiddleware.from_config(app.wsgi_app, app.config)
+
+def recipe_fragment_key(recipe, part):
+    updated_at = recipe.updated_at.isoformat() if recipe.updated_at else '0'
+    version = (f"{updated_at}:{recipe.rating_sum}:{recipe.rating_count}:"
+               f"{recipe.comment_count}:{recipe.favorite_count}")
+    return f"recipe:{recipe.id}:{version}:{part}"
+
+def invalidate_recipe_fragments(recipe):
+    fragment_cache.delete(*(recipe_fragment_key(recipe, part) for part in RECIPE_FRAGMENTS))
+
+def card_part(recipe):
+    # Автор, категория и готовность вариантов изображения (srcset)
+    # меняются без изменения строки рецепта
+    names = hashlib.blake2b(
+        repr((recipe.author.username, category_cache.name(recipe.category_id))).encode('utf-8'),
+        digest_size=8
+    ).hexdigest()
+    images_ready = int(bool(image_variants(recipe.image_path)))
+    return f'card:{names}:{images_ready}'
+
+@app.template_global()
+def recipe_card(recipe):
+    return fragment_cache.get_or_set(
+        recipe_fragment_key(recipe, card_part(recipe)),
+        lambda: Markup(render_template('_recipe_card.html', recipe=recipe))
+    )
+
+# bcrypt выполняется в отдельном пуле процессов с ограниченной очередью
+password_hasher = PasswordHasher.from_config(app.config)
+
+def server_busy(template):
+    """Быстрый отказ, когда пул хеширования паролей перегружен"""
+    flash('Сервер перегружен, попробуйте еще раз через несколько секунд', 'error')
+    return render_template(template), 503, {'Retry-After': '2'}
 
 # Валидация email
 def is_valid_email(email):
@@ -41,6 +124,13 @@ def is_valid_email(email):
 def is_valid_password(password):
     return len(password) >= 6
 
+# Текущий пользователь загружается один раз за запрос и хранится в flask.g
+def get_current_user():
+    if 'current_user' not in g:
+        user_id = session.get('user_id')
+        g.current_user = db.session.get(User, user_id) if user_id else None
+    return g.current_user
+
 # Декоратор для проверки авторизации
 def login_required(f):
     from functools import wraps
@@ -51,7 +141,7 @@ def login_required(f):
             return redirect(url_for('login'))
         
         # Проверяем, что пользователь существует в базе данных
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
         if not user:
             flash('Сессия истекла. Пожалуйста, войдите в систему заново.', 'error')
             session.clear()
@@ -93,7 +183,10 @@ def register():
             return render_template('register.html')
         
         # Создание пользователя
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+        try:
+            hashed_password = password_hasher.hash(password)
+        except PasswordHasherBusy:
+            return server_busy('register.html')
         user = User(username=username, email=email, password=hashed_password)
         db.session.add(user)
         db.session.flush()  # Получаем ID пользователя
@@ -117,7 +210,7 @@ def register():
 @app.route('/account', methods=['GET', 'POST'])
 @login_required
 def account():
-    user = User.query.get_or_404(session['user_id'])
+    user = get_current_user()
     profile = user.profile
     if request.method == 'POST':
         # Обновление основных данных
@@ -143,6 +236,7 @@ def account():
             return render_template('account.html', user=user, profile=profile)
 
         # Применяем изменения
+        renamed = bool(new_username) and new_username != user.username
         if new_username:
             user.username = new_username
             session['username'] = new_username
@@ -159,6 +253,18 @@ def account():
         profile.bio = bio or profile.bio
 
         db.session.commit()
+
+        if renamed:
+            # Имя автора есть в закэшированных комментариях рецептов
+            # (ключи карточек включают имя сами)
+            commented = db.session.execute(
+                db.select(Recipe).where(
+                    Recipe.id.in_(db.select(Comment.recipe_id).where(Comment.user_id == user.id))
+                )
+            ).scalars()
+            for recipe in commented:
+                invalidate_recipe_fragments(recipe)
+
         flash('Профиль обновлен', 'success')
         return redirect(url_for('account'))
 
@@ -172,7 +278,20 @@ def login():
         
         user = User.query.filter_by(email=email).first()
         
-        if user and bcrypt.check_password_hash(user.password, password):
+        try:
+            password_ok = user is not None and password_hasher.check(user.password, password)
+        except PasswordHasherBusy:
+            return server_busy('login.html')
+        
+        if password_ok:
+            # Хеш создан с другой стоимостью - пересчитываем с текущей
+            if password_hasher.needs_rehash(user.password):
+                try:
+                    user.password = password_hasher.hash(password)
+                    db.session.commit()
+                except PasswordHasherBusy:
+                    # Не критично: пересчитаем при следующем входе
+                    pass
             session['user_id'] = user.id
             session['username'] = user.username
             flash('Добро пожаловать!', 'success')
@@ -195,60 +314,173 @@ def recipes():
     search_query = request.args.get('search', '')
     time_filter = request.args.get('time', type=int)
     
-    # Базовый запрос
-    query = Recipe.query
+    # Базовый запрос: автор карточки загружается тем же SELECT,
+    # название категории берется из кэша категорий
+    query = Recipe.query.options(db.joinedload(Recipe.author))
     
     # Фильтрация по категории
     if category_id:
         query = query.filter_by(category_id=category_id)
     
-    # Поиск по названию и описанию
+    # Полнотекстовый поиск по названию, описанию, инструкциям и ингредиентам
+    search_results = None
     if search_query:
-        query = query.filter(
-            db.or_(
-                Recipe.title.contains(search_query),
-                Recipe.description.contains(search_query)
+        search_results = search_subquery(search_query)
+        if search_results is None:
+            # СУБД без полнотекстового индекса: поиск по подстроке
+            query = query.filter(
+                db.or_(
+                    Recipe.title.contains(search_query),
+                    Recipe.description.contains(search_query)
+                )
             )
-        )
+        else:
+            query = query.join(search_results, search_results.c.recipe_id == Recipe.id)
     
-    # Фильтрация по времени приготовления
+    # Фильтрация по общему времени приготовления (хранимый столбец total_time)
     if time_filter:
-        # Фильтруем по общему времени приготовления (prep_time + cook_time)
-        query = query.filter(
-            db.or_(
-                db.and_(Recipe.prep_time.isnot(None), Recipe.cook_time.isnot(None), 
-                       (Recipe.prep_time + Recipe.cook_time) <= time_filter),
-                db.and_(Recipe.prep_time.isnot(None), Recipe.cook_time.is_(None), 
-                       Recipe.prep_time <= time_filter),
-                db.and_(Recipe.prep_time.is_(None), Recipe.cook_time.isnot(None), 
-                       Recipe.cook_time <= time_filter)
-            )
-        )
+        query = query.filter(Recipe.total_time <= time_filter)
     
-    recipes = query.all()
-    categories = Category.query.all()
-    
-    return render_template('recipes.html', recipes=recipes, categories=categories, 
-                         selected_category=category_id, search_query=search_query, 
-                         selected_time=time_filter)
+    # Keyset-пагинация вместо загрузки всей таблицы: результаты поиска
+    # упорядочены по релевантности, остальные - по (created_at, id)
+    if search_results is not None:
+        page = keyset_paginate(
+            query.add_columns(search_results.c.score), search_results.c.score, Recipe.id,
+            per_page=app.config['RECIPES_PER_PAGE'],
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            row_key=lambda row: (row.score, row.Recipe.id)
+        )
+        page.items = [row.Recipe for row in page.items]
+    else:
+        page = keyset_paginate(
+            query, Recipe.created_at, Recipe.id,
+            per_page=app.config['RECIPES_PER_PAGE'],
+            after=request.args.get('after'),
+            before=request.args.get('before')
+        )
+    categories = category_cache.all()
+
+    # Версия страницы - рецепты на ней (ключ карточки: строка рецепта, автор,
+    # категория, готовность вариантов изображения), соседние страницы и
+    # фильтр категорий. Last-Modified не задается: состав страницы меняется и
+    # без изменения ее рецептов
+    page_cache = http_cache.page(
+        [recipe_fragment_key(recipe, card_part(recipe)) for recipe in page.items],
+        page.next_cursor, page.prev_cursor, categories
+    )
+    if page_cache.not_modified():
+        return page_cache.not_modified_response()
+
+    # Текущие фильтры сохраняются в ссылках на соседние страницы
+    filter_args = {
+        'category': category_id or None,
+        'search': search_query or None,
+        'time': time_filter or None
+    }
+
+    return page_cache.response(render_template('recipes.html', recipes=page.items, page=page,
+                         filter_args=filter_args, categories=categories,
+                         selected_category=category_id, search_query=search_query,
+                         selected_time=time_filter))
 
 @app.route('/recipe/<int:recipe_id>')
 def recipe_detail(recipe_id):
-    recipe = Recipe.query.get_or_404(recipe_id)
-    ingredients = RecipeIngredient.query.filter_by(recipe_id=recipe_id).all()
-    comments = Comment.query.filter_by(recipe_id=recipe_id).all()
-    return render_template('recipe_detail.html', recipe=recipe, ingredients=ingredients, comments=comments)
+    # Рецепт с автором, оценка и избранное текущего пользователя - одним
+    # запросом. Персональные значения не кэшируются вместе с фрагментами
+    columns = [Recipe]
+    if 'user_id' in session:
+        columns += [
+            db.select(Rating.rating)
+            .where(Rating.user_id == session['user_id'], Rating.recipe_id == Recipe.id)
+            .scalar_subquery(),
+            db.exists().where(Favorite.user_id == session['user_id'], Favorite.recipe_id == Recipe.id)
+        ]
+    row = db.session.execute(
+        db.select(*columns).options(db.joinedload(Recipe.author)).where(Recipe.id == recipe_id)
+    ).first()
+    if row is None:
+        abort(404)
+    recipe, *personal = row
+    user_rating, is_favorite = personal or (None, False)
+    
+    # Описание, ингредиенты и комментарии берутся из кэша фрагментов;
+    # запросы к БД выполняются только при промахе
+    def render_body():
+        ingredients = RecipeIngredient.query.options(
+            db.joinedload(RecipeIngredient.ingredient)
+        ).filter_by(recipe_id=recipe_id).all()
+        return Markup(render_template('_recipe_body.html', recipe=recipe, ingredients=ingredients))
+    
+    def render_comments(after=None):
+        page = comments_page(recipe_id, after)
+        return {
+            'html': Markup(render_template('_recipe_comments.html', comments=page.items)),
+            'next_cursor': page.next_cursor
+        }
+    
+    # Кэшируется первая страница комментариев; следующие (без JavaScript -
+    # по ссылке ?comments_after=...) строятся по запросу
+    comments_after = request.args.get('comments_after')
+    if comments_after:
+        comments_fragment = render_comments(comments_after)
+    else:
+        comments_fragment = fragment_cache.get_or_set(recipe_fragment_key(recipe, 'comments'), render_comments)
+    
+    # Версия страницы: строка рецепта (updated_at меняется при правке и
+    # пересчете оценок, счетчики - при новых комментариях и избранном),
+    # автор, категория, готовность вариантов изображения, фрагмент
+    # комментариев (имена комментаторов; при переименовании он сбрасывается)
+    # и персональные значения. Last-Modified не задается: избранное и
+    # переименования не меняют updated_at. Ответ 304 - без рендеринга страницы
+    page_cache = http_cache.page(
+        recipe.id, recipe.updated_at, recipe.rating_sum, recipe.rating_count,
+        recipe.favorite_count, recipe.comment_count,
+        recipe.author.username, category_cache.name(recipe.category_id),
+        bool(image_variants(recipe.image_path)), comments_fragment['html'],
+        user_rating, is_favorite
+    )
+    if page_cache.not_modified():
+        return page_cache.not_modified_response()
+    
+    recipe_body = fragment_cache.get_or_set(recipe_fragment_key(recipe, 'body'), render_body)
+    
+    return page_cache.response(render_template('recipe_detail.html', recipe=recipe, recipe_body=recipe_body,
+                         comments_fragment=comments_fragment, user_rating=user_rating,
+                         is_favorite=is_favorite))
+
+def comments_page(recipe_id, after=None):
+    """
+    Страница комментариев рецепта, новые первыми. Keyset по (created_at, id)
+    идет по индексу idx_comments_recipe_created_at; имя автора берется тем же
+    запросом, загружаются только нужные столбцы.
+    """
+    query = (
+        db.session.query(Comment.id, Comment.content, Comment.created_at, User.username)
+        .join(User, User.id == Comment.user_id)
+        .filter(Comment.recipe_id == recipe_id)
+    )
+    return keyset_paginate(query, Comment.created_at, Comment.id,
+                           per_page=app.config['COMMENTS_PER_PAGE'], after=after)
+
+@app.route('/recipe/<int:recipe_id>/comments')
+def recipe_comments(recipe_id):
+    """Следующая страница комментариев для кнопки «Показать еще» (JSON)"""
+    try:
+        page = comments_page(recipe_id, request.args.get('after'))
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'message': e.description}), 400
+    return jsonify({
+        'success': True,
+        'html': render_template('_comment_items.html', comments=page.items),
+        'next_cursor': page.next_cursor
+    })
 
 @app.route('/add_recipe', methods=['GET', 'POST'])
 @login_required
 def add_recipe():
     if request.method == 'POST':
-        # Проверяем, что пользователь существует
-        user = User.query.get(session['user_id'])
-        if not user:
-            flash('Пользователь не найден. Пожалуйста, войдите в систему заново.', 'error')
-            session.clear()
-            return redirect(url_for('login'))
+        user = get_current_user()
         
         title = request.form['title']
         description = request.form['description']
@@ -263,14 +495,12 @@ def add_recipe():
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                # Добавляем timestamp для уникальности имени файла
-                import time
-                timestamp = str(int(time.time()))
-                name, ext = os.path.splitext(filename)
-                filename = f"{name}_{timestamp}{ext}"
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                image_path = filename
+                # Проверка, сохранение и фоновая обработка (варианты для srcset)
+                image_path = save_upload(file)
+                if not image_path:
+                    flash('Недопустимый файл изображения. Разрешены: ' +
+                          ', '.join(sorted(app.config['ALLOWED_EXTENSIONS'])), 'error')
+                    return render_template('add_recipe.html', categories=category_cache.all())
         
         # Создание рецепта
         recipe = Recipe(
@@ -279,6 +509,7 @@ def add_recipe():
             instructions=instructions,
             prep_time=prep_time,
             cook_time=cook_time,
+            total_time=Recipe.calculate_total_time(prep_time, cook_time),
             servings=servings,
             image_path=image_path,
             user_id=user.id,  # Используем ID из базы данных
@@ -293,42 +524,47 @@ def add_recipe():
         ingredient_quantities = request.form.getlist('ingredient_quantity[]')
         ingredient_units = request.form.getlist('ingredient_unit[]')
         
+        entries = []
+        units_by_name = {}
         for i, name in enumerate(ingredient_names):
-            if name.strip():  # Проверяем, что название не пустое
-                # Ищем существующий ингредиент или создаем новый
-                ingredient = Ingredient.query.filter_by(name=name.strip()).first()
-                if not ingredient:
-                    ingredient = Ingredient(name=name.strip(), unit=ingredient_units[i] if i < len(ingredient_units) else 'г')
-                    db.session.add(ingredient)
-                    db.session.flush()
-                
-                # Создаем связь рецепта с ингредиентом
+            name = name.strip()
+            if name:  # Проверяем, что название не пустое
                 quantity = float(ingredient_quantities[i]) if i < len(ingredient_quantities) and ingredient_quantities[i] else 0
-                recipe_ingredient = RecipeIngredient(
-                    quantity=quantity,
-                    recipe_id=recipe.id,
-                    ingredient_id=ingredient.id
-                )
-                db.session.add(recipe_ingredient)
-        
+                unit = ingredient_units[i] if i < len(ingredient_units) else 'г'
+                units_by_name.setdefault(name, unit)
+                entries.append((name, quantity))
+        
+        # Находим или создаем все ингредиенты пакетно, без запросов на каждый
+        try:
+            ingredient_ids = resolve_ingredient_ids(units_by_name)
+        except ValueError as e:
+            db.session.rollback()
+            schedule_image_cleanup([image_path])
+            flash(str(e), 'error')
+            return render_template('add_recipe.html', categories=category_cache.all()), 400
+        
+        # Связи рецепта с ингредиентами одной многострочной вставкой
+        if entries:
+            db.session.execute(db.insert(RecipeIngredient), [
+                {'quantity': quantity, 'recipe_id': recipe.id, 'ingredient_id': ingredient_ids[name]}
+                for name, quantity in entries
+            ])
+        
+        # Добавляем рецепт в поисковый индекс в той же транзакции
+        index_recipe(recipe, list(units_by_name))
         db.session.commit()
         
         flash('Рецепт успешно добавлен!', 'success')
         return redirect(url_for('recipes'))
     
-    # Получаем все категории для отображения в форме
-    categories = Category.query.all()
+    # Категории для формы (из кэша)
+    categories = category_cache.all()
     return render_template('add_recipe.html', categories=categories)
 
 @app.route('/add_comment/<int:recipe_id>', methods=['POST'])
 @login_required
 def add_comment(recipe_id):
-    # Проверяем, что пользователь существует
-    user = User.query.get(session['user_id'])
-    if not user:
-        flash('Пользователь не найден. Пожалуйста, войдите в систему заново.', 'error')
-        session.clear()
-        return redirect(url_for('login'))
+    user = get_current_user()
     
     content = request.form['content']
     
@@ -339,109 +575,143 @@ def add_comment(recipe_id):
     )
     
     db.session.add(comment)
+    change_recipe_counter(recipe_id, Recipe.comment_count, 1)
     db.session.commit()
     
+    # Сбрасываем закэшированные фрагменты рецепта
+    recipe = db.session.get(Recipe, recipe_id)
+    if recipe:
+        invalidate_recipe_fragments(recipe)
+    
     flash('Комментарий добавлен!', 'success')
     return redirect(url_for('recipe_detail', recipe_id=recipe_id))
 
 @app.route('/favorites')
 @login_required
 def favorites():
-    # Проверяем, что пользователь существует
-    user = User.query.get(session['user_id'])
-    if not user:
-        flash('Пользователь не найден. Пожалуйста, войдите в систему заново.', 'error')
-        session.clear()
-        return redirect(url_for('login'))
+    user = get_current_user()
     
-    favorites = Favorite.query.filter_by(user_id=user.id).all()
-    recipes = [fav.recipe for fav in favorites]
+    # Рецепты из избранного одним запросом вместо загрузки каждого по отдельности
+    recipes = Recipe.query.join(Favorite, Favorite.recipe_id == Recipe.id).options(
+        db.joinedload(Recipe.author)
+    ).filter(Favorite.user_id == user.id).all()
     return render_template('favorites.html', recipes=recipes)
 
 @app.route('/my_recipes')
 @login_required
 def my_recipes():
-    # Проверяем, что пользователь существует
-    user = User.query.get(session['user_id'])
-    if not user:
-        flash('Пользователь не найден. Пожалуйста, войдите в систему заново.', 'error')
-        session.clear()
-        return redirect(url_for('login'))
+    user = get_current_user()
     
+    # Число избранного и комментариев хранится в самих рецептах: один запрос
+    # без загрузки связанных строк
     recipes = Recipe.query.filter_by(user_id=user.id).order_by(Recipe.created_at.desc()).all()
     return render_template('my_recipes.html', recipes=recipes)
 
+def delete_recipes(*criteria):
+    """
+    Удаляет рецепты, подходящие под условия, пачками по RECIPE_DELETE_CHUNK_SIZE:
+    на пачку один DELETE и отдельная транзакция. Ингредиенты, комментарии,
+    оценки, избранное (и строки поиска в MySQL) удаляет каскад внешних ключей,
+    файлы изображений удаляются в фоне после фиксации. Счетчики других
+    рецептов не меняются: удаленные строки относятся только к удаленным рецептам.
+    Возвращает число удаленных рецептов.
+    """
+    chunk_size = app.config['RECIPE_DELETE_CHUNK_SIZE']
+    deleted = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Recipe.id, Recipe.image_path, Recipe.updated_at, Recipe.rating_sum,
+                      Recipe.rating_count, Recipe.comment_count, Recipe.favorite_count)
+            .where(Recipe.id > last_id, *criteria)
+            .order_by(Recipe.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        recipe_ids = [row.id for row in rows]
+
+        unindex_recipes(recipe_ids)
+        result = db.session.execute(
+            db.delete(Recipe)
+            .where(Recipe.id.in_(recipe_ids), *criteria)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        deleted += result.rowcount
+
+        for row in rows:
+            invalidate_recipe_fragments(row)
+        schedule_image_cleanup([row.image_path for row in rows])
+        if len(rows) < chunk_size:
+            break
+    return deleted
+
 @app.route('/delete_recipe/<int:recipe_id>', methods=['POST'])
 @login_required
 def delete_recipe(recipe_id):
     try:
-        # Проверяем, что пользователь существует
-        user = User.query.get(session['user_id'])
-        if not user:
-            return jsonify({'success': False, 'message': 'Пользователь не найден. Пожалуйста, войдите в систему заново.'})
-        
-        # Проверяем, что рецепт принадлежит текущему пользователю
-        recipe = Recipe.query.filter_by(id=recipe_id, user_id=user.id).first()
+        user = get_current_user()
         
-        if not recipe:
+        # Условие на автора проверяет права в том же запросе
+        if not delete_recipes(Recipe.id == recipe_id, Recipe.user_id == user.id):
             return jsonify({'success': False, 'message': 'Рецепт не найден или у вас нет прав на его удаление'})
         
-        # Удаляем связанные данные
-        # Удаляем ингредиенты рецепта
-        RecipeIngredient.query.filter_by(recipe_id=recipe_id).delete()
-        
-        # Удаляем комментарии
-        Comment.query.filter_by(recipe_id=recipe_id).delete()
-        
-        # Удаляем оценки
-        Rating.query.filter_by(recipe_id=recipe_id).delete()
-        
-        # Удаляем из избранного
-        Favorite.query.filter_by(recipe_id=recipe_id).delete()
-        
-        # Удаляем изображение, если оно есть
-        if recipe.image_path:
-            import os
-            image_path = os.path.join(app.config['UPLOAD_FOLDER'], recipe.image_path)
-            if os.path.exists(image_path):
-                try:
-                    os.remove(image_path)
-                except OSError:
-                    pass  # Игнорируем ошибки при удалении файла
-        
-        # Удаляем сам рецепт
-        db.session.delete(recipe)
-        db.session.commit()
-        
         return jsonify({'success': True, 'message': 'Рецепт успешно удален'})
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)})
 
+def change_recipe_counter(recipe_id, column, delta):
+    """
+    Атомарно сдвигает счетчик рецепта (Recipe.favorite_count или Recipe.comment_count)
+    в текущей транзакции. updated_at не меняется: счетчики не входят в кэшируемые фрагменты.
+    """
+    db.session.execute(
+        db.update(Recipe)
+        .where(Recipe.id == recipe_id)
+        .values({column: column + delta, Recipe.updated_at: Recipe.updated_at})
+    )
+
+def set_favorite(user_id, recipe_id, favorite):
+    """
+    Добавляет рецепт в избранное или удаляет из него одним запросом.
+    Повторный вызов с тем же значением ничего не меняет; возвращает True,
+    если запись была добавлена или удалена. Счетчик favorite_count
+    меняется в той же транзакции, только если запись действительно изменилась.
+    Добавление несуществующего рецепта - 404.
+    """
+    if favorite:
+        # INSERT IGNORE / ON CONFLICT DO NOTHING по unique_user_recipe_favorite:
+        # двойной клик или параллельный запрос не приводят к IntegrityError.
+        # INSERT ... SELECT вставляет строку, только если рецепт существует,
+        # вместо ошибки внешнего ключа (MySQL с IGNORE пропустил бы ее молча)
+        changed = insert_ignore_from_select(
+            Favorite, ['user_id', 'recipe_id'],
+            db.select(db.literal(user_id), Recipe.id).where(Recipe.id == recipe_id),
+            ['user_id', 'recipe_id']
+        )
+        if not changed and db.session.execute(
+                db.select(Recipe.id).where(Recipe.id == recipe_id)).first() is None:
+            db.session.rollback()
+            abort(404)
+    else:
+        changed = db.session.execute(
+            db.delete(Favorite).where(Favorite.user_id == user_id, Favorite.recipe_id == recipe_id)
+        ).rowcount
+    if changed:
+        change_recipe_counter(recipe_id, Recipe.favorite_count, 1 if favorite else -1)
+    db.session.commit()
+    return changed > 0
+
 @app.route('/add_favorite/<int:recipe_id>', methods=['POST'])
 @login_required
 def add_favorite(recipe_id):
-    # Проверяем, что пользователь существует
-    user = User.query.get(session['user_id'])
-    if not user:
-        flash('Пользователь не найден. Пожалуйста, войдите в систему заново.', 'error')
-        session.clear()
-        return redirect(url_for('login'))
+    user = get_current_user()
     
-    # Проверяем, не добавлен ли уже рецепт в избранное
-    existing_favorite = Favorite.query.filter_by(
-        user_id=user.id, 
-        recipe_id=recipe_id
-    ).first()
-    
-    if not existing_favorite:
-        favorite = Favorite(
-            user_id=user.id,
-            recipe_id=recipe_id
-        )
-        db.session.add(favorite)
-        db.session.commit()
+    if set_favorite(user.id, recipe_id, True):
         flash('Рецепт добавлен в избранное!', 'success')
     else:
         flash('Рецепт уже в избранном!', 'info')
@@ -451,33 +721,46 @@ def add_favorite(recipe_id):
 @app.route('/remove_favorite/<int:recipe_id>', methods=['POST'])
 @login_required
 def remove_favorite(recipe_id):
-    # Проверяем, что пользователь существует
-    user = User.query.get(session['user_id'])
-    if not user:
-        flash('Пользователь не найден. Пожалуйста, войдите в систему заново.', 'error')
-        session.clear()
-        return redirect(url_for('login'))
+    user = get_current_user()
     
-    favorite = Favorite.query.filter_by(
-        user_id=user.id, 
-        recipe_id=recipe_id
-    ).first()
-    
-    if favorite:
-        db.session.delete(favorite)
-        db.session.commit()
+    if set_favorite(user.id, recipe_id, False):
         flash('Рецепт удален из избранного!', 'info')
     
     return redirect(url_for('favorites'))
 
+@app.route('/toggle_favorite/<int:recipe_id>', methods=['POST'])
+@login_required
+def toggle_favorite(recipe_id):
+    """
+    JSON-версия для script.js: {"favorite": true|false} задает состояние
+    (повтор запроса безопасен), без тела - переключает текущее.
+    """
+    try:
+        user = get_current_user()
+        data = request.get_json(silent=True) or {}
+        
+        if 'favorite' in data:
+            favorite = bool(data['favorite'])
+            set_favorite(user.id, recipe_id, favorite)
+        else:
+            # Сначала пробуем добавить; если запись уже была - удаляем
+            favorite = set_favorite(user.id, recipe_id, True)
+            if not favorite:
+                set_favorite(user.id, recipe_id, False)
+        
+        return jsonify({'success': True, 'favorite': favorite})
+    
+    except NotFound:
+        return jsonify({'success': False, 'message': 'Рецепт не найден'}), 404
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+
 @app.route('/rate_recipe', methods=['POST'])
 @login_required
 def rate_recipe():
     try:
-        # Проверяем, что пользователь существует
-        user = User.query.get(session['user_id'])
-        if not user:
-            return jsonify({'success': False, 'message': 'Пользователь не найден. Пожалуйста, войдите в систему заново.'})
+        user = get_current_user()
         
         data = request.get_json()
         recipe_id = data.get('recipe_id')
@@ -489,34 +772,34 @@ def rate_recipe():
         if rating < 1 or rating > 5:
             return jsonify({'success': False, 'message': 'Оценка должна быть от 1 до 5'})
         
-        # Проверяем, есть ли уже оценка от этого пользователя
-        existing_rating = Rating.query.filter_by(
-            user_id=user.id,
-            recipe_id=recipe_id
+        # Агрегаты рецепта и прежняя оценка пользователя одним запросом
+        previous = (
+            db.select(Rating.rating)
+            .where(Rating.user_id == user.id, Rating.recipe_id == recipe_id)
+            .scalar_subquery()
+        )
+        current = db.session.execute(
+            db.select(Recipe.rating_sum, Recipe.rating_count, previous.label('previous'))
+            .where(Recipe.id == recipe_id)
         ).first()
+        if not current:
+            return jsonify({'success': False, 'message': 'Рецепт не найден'})
         
-        if existing_rating:
-            # Обновляем существующую оценку
-            existing_rating.rating = rating
-        else:
-            # Создаем новую оценку
-            new_rating = Rating(
-                user_id=user.id,
-                recipe_id=recipe_id,
-                rating=rating
-            )
-            db.session.add(new_rating)
-        
+        # Атомарная вставка или замена оценки по unique_user_recipe_rating:
+        # без SELECT ... затем INSERT/UPDATE и без блокировки строки рецепта
+        upsert(Rating, [{'user_id': user.id, 'recipe_id': recipe_id, 'rating': rating}],
+               ['user_id', 'recipe_id'], ['rating'])
         db.session.commit()
         
-        # Вычисляем среднюю оценку
-        recipe_ratings = Rating.query.filter_by(recipe_id=recipe_id).all()
-        if recipe_ratings:
-            average_rating = sum(r.rating for r in recipe_ratings) / len(recipe_ratings)
-            total_ratings = len(recipe_ratings)
+        # Агрегаты рецепта пересчитываются пакетно в фоне, ответ - с учетом этого голоса
+        if current.previous is None:
+            delta_sum, delta_count = rating, 1
         else:
-            average_rating = 0
-            total_ratings = 0
+            delta_sum, delta_count = rating - current.previous, 0
+        rating_sum, total_ratings = rating_aggregator.add(
+            recipe_id, delta_sum, delta_count, current.rating_sum, current.rating_count
+        )
+        average_rating = rating_sum / total_ratings if total_ratings else 0
         
         return jsonify({
             'success': True,
@@ -528,5 +811,54 @@ def rate_recipe():
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/api/recipes/export')
+@login_required
+def export_recipes():
+    """
+    Выгрузка рецептов в NDJSON без авторов. Ответ формируется потоково.
+    ?after=<id> - продолжить после последней полученной записи, ?mine=1 - только свои.
+    """
+    after_id = request.args.get('after', 0, type=int)
+    user_id = get_current_user().id if request.args.get('mine') else None
+    engine = db.engine
+    
+    def generate():
+        # Отдельное соединение: серверный курсор занимает его до конца выгрузки
+        with engine.connect() as connection:
+            for record in export_records(connection, after_id=after_id, user_id=user_id,
+                                         include_authors=False):
+                yield to_ndjson(record)
+    
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename=recipes.ndjson'})
+
+@app.route('/api/recipes/import', methods=['POST'])
+@login_required
+def import_recipes():
+    """
+    Загрузка рецептов из NDJSON в теле запроса от имени текущего пользователя.
+    Записи фиксируются пакетами; checkpoint в ответе - число загруженных записей.
+    ?skip=<checkpoint> - продолжить прерванную загрузку, ?update=1 - обновлять
+    существующие рецепты (с тем же названием).
+    """
+    user = get_current_user()
+    skip = request.args.get('skip', 0, type=int)
+    loader = RecipeLoader(default_author=user.email, update_existing=bool(request.args.get('update')))
+    loader.committed = skip
+    
+    # Все рецепты принадлежат текущему пользователю; комментарии, оценки и
+    # изображения не переносятся (путь к файлу от клиента не принимается)
+    records = (
+        {**record, 'author': user.email, 'image_path': None, 'comments': [], 'ratings': []}
+        for record in islice(parse_ndjson(request.stream), skip, None)
+    )
+    try:
+        stats = loader.load(records)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e),
+                        'stats': loader.stats, 'checkpoint': loader.committed}), 400
+    
+    return jsonify({'success': True, 'stats': stats, 'checkpoint': loader.committed})
+
 if __name__ == '__main__':
     app.run(debug=True)
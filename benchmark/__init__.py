@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""
+Нагрузочные тесты Sweetie.
+
+    python -m benchmark.generate --scale medium   # синтетические данные
+    python -m benchmark.run --save before.json    # прогон маршрутов и отчет
+    python -m benchmark.run --compare before.json # сравнение с сохраненным прогоном
+    python -m benchmark.compression               # размер и время сжатия ответов
+
+База выбирается как обычно (DATABASE_URL/DEV_DATABASE_URL), поэтому для
+тестов лучше указывать отдельную базу, например
+DEV_DATABASE_URL=sqlite:///bench.db.
+"""
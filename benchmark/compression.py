@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Сжатие ответов на страницах приложения: размер, время и выигрыш по сети.
+
+Тела ответов (каталог, поиск, страница рецепта, JSON комментариев и
+оценки, NDJSON выгрузки) берутся у приложения без сжатия и сжимаются тем
+же кодом, что и в CompressionMiddleware, на нескольких уровнях gzip и
+brotli (если установлен пакет brotli).
+
+Отчет:
+- размер и доля от исходного, время сжатия и распаковки (медиана --repeat);
+- оценка времени доставки тела на каналах --bandwidth Мбит/с:
+  сжатие + передача + распаковка против передачи без сжатия;
+- задержка запроса через тестовый клиент с Accept-Encoding и без него
+  (p50 из --requests), то есть цена сжатия на сервере при текущих настройках.
+
+Запуск:
+    python -m benchmark.compression [--bandwidth 2 10 100] [--save compression.json]
+"""
+
+import argparse
+import gzip
+import json
+import statistics
+import time
+
+from flask import jsonify
+
+from app import app
+from compression import CompressionMiddleware, brotli
+from benchmark.run import FlaskClient, Sample, percentile
+
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 4, 11)
+
+
+def pages(sample):
+    """Список (название, путь или None, тело без сжатия)"""
+    client = FlaskClient(sample.user_id())
+    recipe_id = sample.recipe_id()
+    paths = [
+        ('каталог', '/recipes'),
+        ('поиск', '/recipes?search=' + sample.search()),
+        ('рецепт', f'/recipe/{recipe_id}'),
+        ('комментарии JSON', f'/recipe/{recipe_id}/comments'),
+        ('выгрузка NDJSON', f'/api/recipes/export?after={max(sample.max_recipe - 50, 0)}'),
+    ]
+    result = []
+    for name, path in paths:
+        response = client.client.get(path, headers={'Accept-Encoding': 'identity'})
+        result.append((name, path, response.get_data()))
+
+    # Ответ rate_recipe меняет данные, поэтому его тело строится так же, как в маршруте
+    with app.app_context():
+        rating = jsonify({'success': True, 'average_rating': 4.3, 'total_ratings': 17}).get_data()
+    result.append(('оценка JSON', None, rating))
+    return result
+
+
+def variants():
+    """Список (название, функция сжатия, функция распаковки)"""
+    result = []
+    for level in GZIP_LEVELS:
+        middleware = CompressionMiddleware(None, level=level)
+        result.append((f'gzip-{level}', _compress_with(middleware, 'gzip'), gzip.decompress))
+    if brotli is not None:
+        for quality in BROTLI_QUALITIES:
+            middleware = CompressionMiddleware(None, brotli_quality=quality)
+            result.append((f'br-{quality}', _compress_with(middleware, 'br'), brotli.decompress))
+    return result
+
+
+def _compress_with(middleware, encoding):
+    def compress(data):
+        compressor = middleware.compressor(encoding)
+        return compressor.compress(data) + compressor.flush()
+    return compress
+
+
+def _median_ms(func, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(data)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def measure_sizes(bodies, repeat):
+    results = {}
+    for name, _, body in bodies:
+        rows = {}
+        for variant, compress, decompress in variants():
+            compressed = compress(body)
+            rows[variant] = {
+                'bytes': len(compressed),
+                'compress_ms': _median_ms(compress, body, repeat),
+                'decompress_ms': _median_ms(decompress, compressed, repeat),
+            }
+        results[name] = {'bytes': len(body), 'variants': rows}
+    return results
+
+
+def measure_latency(sample, bodies, requests):
+    """p50 задержки маршрута без сжатия и с каждой поддерживаемой кодировкой"""
+    client = FlaskClient(sample.user_id())
+    encodings = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+    results = {}
+    for name, path, _ in bodies:
+        if path is None:
+            continue
+        results[name] = {}
+        for encoding in encodings:
+            timings = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                response = client.client.get(path, headers={'Accept-Encoding': encoding})
+                response.get_data()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name][encoding] = {
+                'p50_ms': percentile(timings, 0.5),
+                'bytes': len(response.get_data()),
+                'encoding': response.headers.get('Content-Encoding', 'identity'),
+            }
+    return results
+
+
+def transfer_ms(size, bandwidth_mbit):
+    return size * 8 / (bandwidth_mbit * 1000)
+
+
+def report(sizes, latency, bandwidths):
+    for name, page in sizes.items():
+        print(f"\n{name}: {page['bytes']} байт")
+        header = f"{'вариант':<10}{'байт':>9}{'доля':>8}{'сжатие, мс':>12}{'распак., мс':>13}"
+        header += ''.join(f"{f'{bw:g} Мбит/с':>14}" for bw in bandwidths)
+        print(header)
+        print('-' * len(header))
+        # Строка без сжатия: только передача
+        row = f"{'identity':<10}{page['bytes']:>9}{'100%':>8}{'-':>12}{'-':>13}"
+        row += ''.join(f"{transfer_ms(page['bytes'], bw):>11.2f} мс" for bw in bandwidths)
+        print(row)
+        for variant, data in page['variants'].items():
+            row = (f"{variant:<10}{data['bytes']:>9}{data['bytes'] / page['bytes']:>8.0%}"
+                   f"{data['compress_ms']:>12.3f}{data['decompress_ms']:>13.3f}")
+            for bw in bandwidths:
+                total = data['compress_ms'] + transfer_ms(data['bytes'], bw) + data['decompress_ms']
+                row += f"{total:>11.2f} мс"
+            print(row)
+
+    if latency:
+        print("\nЗадержка маршрута через приложение (p50, мс; CompressionMiddleware по настройкам)")
+        encodings = list(next(iter(latency.values())))
+        header = f"{'страница':<20}" + ''.join(f"{encoding:>22}" for encoding in encodings)
+        print(header)
+        print('-' * len(header))
+        for name, results in latency.items():
+            print(f"{name:<20}" + ''.join(
+                f"{results[e]['p50_ms']:>9.2f} ({results[e]['bytes']:>7} байт)" for e in encodings
+            ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение сжатия ответов Sweetie')
+    parser.add_argument('--repeat', type=int, default=30, help='повторов сжатия для медианы')
+    parser.add_argument('--requests', type=int, default=50, help='запросов на страницу и кодировку')
+    parser.add_argument('--bandwidth', type=float, nargs='+', default=[2, 10, 100],
+                        help='пропускная способность каналов, Мбит/с')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='сохранить результаты в JSON')
+    args = parser.parse_args()
+
+    sample = Sample(args.seed)
+    bodies = pages(sample)
+    sizes = measure_sizes(bodies, args.repeat)
+    latency = measure_latency(sample, bodies, args.requests) if args.requests else {}
+    if brotli is None:
+        print("Пакет brotli не установлен: сравниваются только уровни gzip")
+    report(sizes, latency, args.bandwidth)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'compress_min_size': app.config.get('COMPRESS_MIN_SIZE'),
+                'compress_level': app.config.get('COMPRESS_LEVEL'),
+                'bandwidth_mbit': args.bandwidth,
+                'sizes': sizes,
+                'latency': latency,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены: {args.save}")
+
+
+if __name__ == '__main__':
+    main()
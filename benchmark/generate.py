@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Генератор синтетических данных для нагрузочных тестов.
+
+Пользователи, рецепты, ингредиенты рецептов, оценки, комментарии и избранное
+вставляются пакетами через многострочные INSERT с явными id, агрегаты оценок
+(rating_sum, rating_count) и счетчики избранного и комментариев считаются
+по ходу генерации. Данные детерминированы
+(--seed), повторный запуск добавляет новый набор после существующих строк.
+
+Все пользователи получают пароль BENCH_PASSWORD, email вида
+bench<N>@bench.example.
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from app import app, db
+from bulk import resolve_ingredient_ids
+from models import User, Recipe, Category, RecipeIngredient, Comment, Rating, Favorite, UserProfile
+from passwords import hash_password
+from search import rebuild_search_index
+
+BENCH_PASSWORD = 'password123'
+BENCH_EMAIL_DOMAIN = 'bench.example'
+
+# Объемы: пользователи, рецепты, оценки, комментарии, избранное
+SCALES = {
+    'small': (1_000, 10_000, 100_000, 50_000, 30_000),
+    'medium': (10_000, 100_000, 1_000_000, 500_000, 300_000),
+    'large': (100_000, 1_000_000, 10_000_000, 5_000_000, 3_000_000),
+}
+
+CATEGORIES = ['Торты', 'Печенье', 'Десерты', 'Конфеты', 'Пироги', 'Выпечка', 'Мороженое', 'Напитки']
+
+DISHES = ['торт', 'пирог', 'чизкейк', 'кекс', 'маффин', 'печенье', 'пирожное', 'тарт',
+          'рулет', 'брауни', 'мусс', 'пудинг', 'эклер', 'вафли', 'блины', 'суфле']
+FLAVOURS = ['шоколадный', 'ванильный', 'клубничный', 'лимонный', 'медовый', 'ореховый',
+            'карамельный', 'кофейный', 'малиновый', 'вишневый', 'банановый', 'творожный',
+            'морковный', 'яблочный', 'апельсиновый', 'мятный']
+STYLES = ['домашний', 'быстрый', 'праздничный', 'бабушкин', 'нежный', 'воздушный',
+          'постный', 'классический', 'французский', 'венский']
+
+BASE_INGREDIENTS = {
+    'Мука': 'г', 'Сахар': 'г', 'Яйца': 'шт', 'Масло сливочное': 'г', 'Молоко': 'мл',
+    'Соль': 'г', 'Разрыхлитель': 'г', 'Ванилин': 'г', 'Какао-порошок': 'г', 'Сметана': 'г',
+    'Маскарпоне': 'г', 'Кофе': 'мл', 'Сливки': 'мл', 'Творог': 'г', 'Мед': 'г',
+    'Шоколад': 'г', 'Орехи': 'г', 'Изюм': 'г', 'Корица': 'г', 'Желатин': 'г',
+}
+
+COMMENT_PHRASES = ['Очень вкусно!', 'Получилось с первого раза.', 'Уменьшила сахар вдвое.',
+                   'Дети в восторге.', 'Готовлю уже третий раз.', 'Тесто получилось жидковатым.',
+                   'Добавила больше ванили.', 'Спасибо за рецепт!', 'Пекла дольше на 10 минут.']
+
+
+def _max_id(conn, model):
+    return conn.execute(db.select(db.func.max(model.id))).scalar() or 0
+
+
+def _counts(rng, total, buckets):
+    """Случайное распределение total элементов по buckets корзинам (перекос как в жизни)"""
+    weights = [rng.paretovariate(1.5) for _ in range(buckets)]
+    scale = total / sum(weights)
+    return [int(weight * scale) for weight in weights]
+
+
+def _insert(conn, model, rows):
+    if rows:
+        conn.execute(db.insert(model), rows)
+
+
+def generate(users, recipes, ratings, comments, favorites, batch_size=5000, seed=42):
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    with app.app_context():
+        db.create_all()
+
+        # Справочники создаются через обычную сессию
+        for name in CATEGORIES:
+            if not Category.query.filter_by(name=name).first():
+                db.session.add(Category(name=name, description=f'{name} (тестовые данные)'))
+        ingredient_ids = list(resolve_ingredient_ids(BASE_INGREDIENTS).values())
+        db.session.commit()
+        category_ids = [category_id for (category_id,) in db.session.execute(db.select(Category.id))]
+
+        # Один хеш на всех пользователей: bcrypt для каждого занял бы часы
+        password = hash_password(BENCH_PASSWORD, app.config['BCRYPT_LOG_ROUNDS'])
+
+        with db.engine.connect() as conn:
+            if conn.dialect.name == 'sqlite':
+                conn.exec_driver_sql('PRAGMA synchronous = OFF')
+
+            # Пользователи и профили
+            first_user = _max_id(conn, User) + 1
+            print(f"Пользователи: {users}")
+            for start in range(0, users, batch_size):
+                user_rows, profile_rows = [], []
+                for i in range(start, min(start + batch_size, users)):
+                    user_id = first_user + i
+                    user_rows.append({'id': user_id, 'username': f'bench_{user_id}',
+                                      'email': f'bench{user_id}@{BENCH_EMAIL_DOMAIN}', 'password': password})
+                    profile_rows.append({'user_id': user_id, 'first_name': f'Пользователь {user_id}',
+                                         'bio': 'Сгенерирован для нагрузочного теста'})
+                _insert(conn, User, user_rows)
+                _insert(conn, UserProfile, profile_rows)
+                conn.commit()
+            user_ids = range(first_user, first_user + users)
+
+            # Оценки, комментарии и избранное распределяются по рецептам неравномерно:
+            # у немногих популярных рецептов их много, у большинства - единицы
+            rating_counts = _counts(rng, ratings, recipes)
+            comment_counts = _counts(rng, comments, recipes)
+            favorite_counts = _counts(rng, favorites, recipes)
+
+            first_recipe = _max_id(conn, Recipe) + 1
+            now = datetime.utcnow()
+            print(f"Рецепты: {recipes} (оценок ~{ratings}, комментариев ~{comments}, избранного ~{favorites})")
+            for start in range(0, recipes, batch_size):
+                recipe_rows, ingredient_rows, rating_rows, comment_rows, favorite_rows = [], [], [], [], []
+                for i in range(start, min(start + batch_size, recipes)):
+                    recipe_id = first_recipe + i
+                    created_at = now - timedelta(seconds=rng.randint(0, 2 * 365 * 24 * 3600))
+                    prep_time, cook_time = rng.choice([5, 10, 15, 20, 30, 45]), rng.choice([0, 10, 20, 30, 40, 60, 90])
+
+                    # Уникальность (пользователь, рецепт) для оценок и избранного
+                    raters = rng.sample(user_ids, min(rating_counts[i], users))
+                    scores = [rng.choices((1, 2, 3, 4, 5), weights=(1, 1, 3, 6, 8))[0] for _ in raters]
+                    rating_rows.extend({'recipe_id': recipe_id, 'user_id': user_id, 'rating': score,
+                                        'created_at': created_at} for user_id, score in zip(raters, scores))
+                    favorites_before = len(favorite_rows)
+                    favorite_rows.extend({'recipe_id': recipe_id, 'user_id': user_id, 'created_at': created_at}
+                                         for user_id in rng.sample(user_ids, min(favorite_counts[i], users)))
+                    comment_rows.extend({'recipe_id': recipe_id, 'user_id': rng.choice(user_ids),
+                                         'content': rng.choice(COMMENT_PHRASES), 'created_at': created_at}
+                                        for _ in range(comment_counts[i]))
+                    ingredient_rows.extend({'recipe_id': recipe_id, 'ingredient_id': ingredient_id,
+                                            'quantity': rng.choice([1, 2, 50, 100, 200, 250, 500])}
+                                           for ingredient_id in rng.sample(ingredient_ids, rng.randint(3, 8)))
+
+                    title = f"{rng.choice(STYLES).capitalize()} {rng.choice(FLAVOURS)} {rng.choice(DISHES)}"
+                    recipe_rows.append({
+                        'id': recipe_id,
+                        'title': title,
+                        'description': f"{title}: проверенный рецепт на {rng.randint(2, 12)} порций.",
+                        'instructions': 'Смешать ингредиенты. Выпекать до готовности. Остудить и подавать.',
+                        'prep_time': prep_time,
+                        'cook_time': cook_time,
+                        'total_time': Recipe.calculate_total_time(prep_time, cook_time),
+                        'servings': rng.randint(2, 12),
+                        'user_id': rng.choice(user_ids),
+                        'category_id': rng.choice(category_ids),
+                        'created_at': created_at,
+                        'updated_at': created_at,
+                        'is_published': True,
+                        'rating_sum': sum(scores),
+                        'rating_count': len(scores),
+                        'favorite_count': len(favorite_rows) - favorites_before,
+                        'comment_count': comment_counts[i],
+                    })
+
+                # Рецепты первыми: на них ссылаются внешние ключи остальных таблиц
+                _insert(conn, Recipe, recipe_rows)
+                _insert(conn, RecipeIngredient, ingredient_rows)
+                for offset in range(0, len(rating_rows), batch_size):
+                    _insert(conn, Rating, rating_rows[offset:offset + batch_size])
+                for offset in range(0, len(comment_rows), batch_size):
+                    _insert(conn, Comment, comment_rows[offset:offset + batch_size])
+                for offset in range(0, len(favorite_rows), batch_size):
+                    _insert(conn, Favorite, favorite_rows[offset:offset + batch_size])
+                conn.commit()
+                done = min(start + batch_size, recipes)
+                print(f"  {done}/{recipes} рецептов, {time.perf_counter() - started:.0f} с")
+
+        print("Перестройка поискового индекса...")
+        rebuild_search_index()
+    print(f"Готово за {time.perf_counter() - started:.0f} с")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Синтетические данные для нагрузочных тестов')
+    parser.add_argument('--scale', choices=SCALES, default='small',
+                        help='готовый набор объемов (large: 100k пользователей, 1M рецептов, 10M оценок)')
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--recipes', type=int)
+    parser.add_argument('--ratings', type=int)
+    parser.add_argument('--comments', type=int)
+    parser.add_argument('--favorites', type=int)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    users, recipes, ratings, comments, favorites = SCALES[args.scale]
+    generate(
+        users=args.users or users,
+        recipes=args.recipes or recipes,
+        ratings=args.ratings if args.ratings is not None else ratings,
+        comments=args.comments if args.comments is not None else comments,
+        favorites=args.favorites if args.favorites is not None else favorites,
+        batch_size=args.batch_size,
+        seed=args.seed,
+    )
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+Прогон маршрутов приложения и отчет о задержках.
+
+Каждый сценарий (лента, фильтры, поиск, страница рецепта, комментарии,
+выгрузка, вход, избранное и т.д.) выполняется --requests раз в --concurrency
+потоков. Запросы идут через тестовый клиент Flask в этом же процессе или,
+с --url, по HTTP к запущенному серверу. Число SQL-запросов берется из заголовка Server-Timing.
+
+Отчет: p50/p95/p99 задержки, пропускная способность и SQL-запросы на запрос.
+--save сохраняет результат в JSON, --compare сравнивает с сохраненным.
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+
+from app import app, db
+from models import User, Recipe, Category
+from pagination import encode_cursor
+from benchmark.generate import BENCH_EMAIL_DOMAIN, BENCH_PASSWORD, BASE_INGREDIENTS, FLAVOURS, DISHES
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+# Выгрузка начинается за столько рецептов до последнего: ответ потоковый,
+# а полная выгрузка большой базы измеряла бы диск, а не маршрут
+EXPORT_TAIL = 50
+
+
+class Sample:
+    """Данные для построения URL: id рецептов, пользователей, категорий"""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        with app.app_context():
+            self.min_recipe, self.max_recipe = db.session.execute(
+                db.select(db.func.min(Recipe.id), db.func.max(Recipe.id))
+            ).one()
+            if self.min_recipe is None:
+                raise SystemExit("В базе нет рецептов. Запустите: python -m benchmark.generate")
+            self.category_ids = [category_id for (category_id,) in db.session.execute(db.select(Category.id))]
+            # Пользователи генератора: известен пароль для входа по HTTP
+            bench_users = db.session.execute(
+                db.select(User.id, User.email).where(User.email.like(f'%@{BENCH_EMAIL_DOMAIN}')).limit(1000)
+            ).all()
+            self.user_ids = [user_id for user_id, _ in bench_users] or \
+                [user_id for (user_id,) in db.session.execute(db.select(User.id).limit(1000))]
+            self.emails = [email for _, email in bench_users]
+        self.cursors = self._cursors()
+        # Имена новых пользователей не повторяются между прогонами
+        self.run_id = uuid.uuid4().hex[:8]
+        self.registered = 0
+
+    def _cursors(self):
+        """Курсоры в глубине ленты: проверка дальних страниц"""
+        cursors = []
+        with app.app_context():
+            total = db.session.execute(db.select(db.func.count(Recipe.id))).scalar()
+            for offset in (total // 10, total // 2, max(total - 2, 0)):
+                row = db.session.execute(
+                    db.select(Recipe.created_at, Recipe.id)
+                    .order_by(Recipe.created_at.desc(), Recipe.id.desc()).offset(offset).limit(1)
+                ).first()
+                if row:
+                    cursors.append(encode_cursor(row.created_at, row.id))
+        return cursors
+
+    def recipe_id(self):
+        return self.rng.randint(self.min_recipe, self.max_recipe)
+
+    def category_id(self):
+        return self.rng.choice(self.category_ids) if self.category_ids else 1
+
+    def user_id(self):
+        return self.rng.choice(self.user_ids)
+
+    def email(self):
+        return self.rng.choice(self.emails) if self.emails else 'nobody@' + BENCH_EMAIL_DOMAIN
+
+    def new_user(self):
+        self.registered += 1
+        username = f"bench_{self.run_id}_{self.registered}"
+        return {'username': username, 'email': f"{username}@{BENCH_EMAIL_DOMAIN}",
+                'password': BENCH_PASSWORD, 'confirm_password': BENCH_PASSWORD}
+
+    def recipe_form(self):
+        ingredients = self.rng.sample(list(BASE_INGREDIENTS), 3)
+        return {
+            'title': f"{self.rng.choice(FLAVOURS)} {self.rng.choice(DISHES)}".capitalize(),
+            'description': 'Рецепт нагрузочного теста',
+            'instructions': 'Смешать и испечь',
+            'prep_time': self.rng.randint(5, 60),
+            'cook_time': self.rng.randint(0, 120),
+            'servings': self.rng.randint(1, 12),
+            'category_id': self.category_id(),
+            'ingredient_name[]': ingredients,
+            'ingredient_quantity[]': [self.rng.randint(1, 500) for _ in ingredients],
+            'ingredient_unit[]': [BASE_INGREDIENTS[name] for name in ingredients],
+        }
+
+    def search(self):
+        return self.rng.choice([self.rng.choice(FLAVOURS), self.rng.choice(DISHES),
+                                f"{self.rng.choice(FLAVOURS)} {self.rng.choice(DISHES)}"])
+
+
+def scenarios(sample, include_writes):
+    """(имя, нужен ли вход, функция -> (метод, путь, параметры))"""
+    q = urllib.parse.urlencode
+    items = [
+        ('index', False, lambda: ('GET', '/', None)),
+        ('recipes', False, lambda: ('GET', '/recipes', None)),
+        ('recipes_deep_page', False, lambda: ('GET', '/recipes?' + q({'after': sample.rng.choice(sample.cursors)}), None)),
+        ('recipes_category', False, lambda: ('GET', '/recipes?' + q({'category': sample.category_id()}), None)),
+        ('recipes_category_time', False,
+         lambda: ('GET', '/recipes?' + q({'category': sample.category_id(), 'time': sample.rng.choice([30, 60, 90])}), None)),
+        ('recipes_search', False, lambda: ('GET', '/recipes?' + q({'search': sample.search()}), None)),
+        ('recipe_detail', False, lambda: ('GET', f'/recipe/{sample.recipe_id()}', None)),
+        ('recipe_comments', False, lambda: ('GET', f'/recipe/{sample.recipe_id()}/comments', None)),
+        # bcrypt в пуле процессов: вход ограничен CPU, а не БД
+        ('login', False, lambda: ('POST', '/login',
+                                  {'data': {'email': sample.email(), 'password': BENCH_PASSWORD}})),
+        ('favorites', True, lambda: ('GET', '/favorites', None)),
+        ('my_recipes', True, lambda: ('GET', '/my_recipes', None)),
+        ('account', True, lambda: ('GET', '/account', None)),
+        ('add_recipe_form', True, lambda: ('GET', '/add_recipe', None)),
+        ('export', True, lambda: ('GET', '/api/recipes/export?' +
+                                  q({'after': max(sample.max_recipe - EXPORT_TAIL, 0)}), None)),
+    ]
+    if include_writes:
+        items += [
+            ('rate_recipe', True, lambda: ('POST', '/rate_recipe',
+                                           {'json': {'recipe_id': sample.recipe_id(), 'rating': sample.rng.randint(1, 5)}})),
+            ('add_favorite', True, lambda: ('POST', f'/add_favorite/{sample.recipe_id()}', None)),
+            ('remove_favorite', True, lambda: ('POST', f'/remove_favorite/{sample.recipe_id()}', None)),
+            ('toggle_favorite', True, lambda: ('POST', f'/toggle_favorite/{sample.recipe_id()}',
+                                               {'json': {'favorite': sample.rng.random() < 0.5}})),
+            ('add_comment', True, lambda: ('POST', f'/add_comment/{sample.recipe_id()}',
+                                           {'data': {'content': 'Комментарий нагрузочного теста'}})),
+            ('register', False, lambda: ('POST', '/register', {'data': sample.new_user()})),
+            ('add_recipe', True, lambda: ('POST', '/add_recipe', {'data': sample.recipe_form()})),
+        ]
+    return items
+
+
+class FlaskClient:
+    """Запросы через тестовый клиент Flask (без сети)"""
+
+    def __init__(self, user_id=None):
+        self.client = app.test_client()
+        if user_id is not None:
+            with self.client.session_transaction() as sess:
+                sess['user_id'] = user_id
+
+    def request(self, method, path, kwargs):
+        response = self.client.open(path, method=method, **(kwargs or {}))
+        # Потоковый ответ (выгрузка) формируется только при чтении тела
+        response.get_data()
+        response.close()
+        return response.status_code, response.headers.get('Server-Timing', '')
+
+
+class HTTPClient:
+    """Запросы по HTTP к запущенному серверу; сессия хранится в cookie"""
+
+    def __init__(self, base_url, user_id=None):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect()
+        )
+        if user_id is not None:
+            with app.app_context():
+                email = db.session.get(User, user_id).email
+            self.request('POST', '/login', {'data': {'email': email, 'password': BENCH_PASSWORD}})
+
+    def request(self, method, path, kwargs):
+        kwargs = kwargs or {}
+        headers = {}
+        body = None
+        if 'json' in kwargs:
+            body = json.dumps(kwargs['json']).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif 'data' in kwargs:
+            body = urllib.parse.urlencode(kwargs['data'], doseq=True).encode('utf-8')
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(req) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('Server-Timing', '')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Редирект после POST считается ответом, а не новым запросом"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    # Метод ближайшего ранга
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _ms(seconds):
+    return seconds * 1000 if seconds is not None else None
+
+
+def run_scenario(needs_login, build, sample, make_client, requests, concurrency, warmup):
+    lock = threading.Lock()
+    latencies, queries = [], []
+    errors = 0
+    local = threading.local()
+
+    def one(record):
+        nonlocal errors
+        with lock:
+            user_id = sample.user_id() if needs_login and not hasattr(local, 'client') else None
+            method, path, kwargs = build()
+        if not hasattr(local, 'client'):
+            local.client = make_client(user_id)
+        start = time.perf_counter()
+        status, server_timing = local.client.request(method, path, kwargs)
+        elapsed = time.perf_counter() - start
+        if not record:
+            return
+        match = SERVER_TIMING_QUERIES.search(server_timing)
+        with lock:
+            latencies.append(elapsed)
+            if match:
+                queries.append(int(match.group(1)))
+            # Для GET редирект означает ошибку (например, на страницу входа)
+            if status >= 400 or (method == 'GET' and status >= 300):
+                errors += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda _: one(False), range(warmup)))
+        started = time.perf_counter()
+        list(executor.map(lambda _: one(True), range(requests)))
+        wall = time.perf_counter() - started
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        # Без записанных запросов (--requests 0) перцентилей нет
+        'p50_ms': _ms(percentile(latencies, 0.50)),
+        'p95_ms': _ms(percentile(latencies, 0.95)),
+        'p99_ms': _ms(percentile(latencies, 0.99)),
+        'throughput_rps': len(latencies) / wall if wall else 0,
+        'queries_per_request': sum(queries) / len(queries) if queries else None,
+    }
+
+
+def _format_delta(value, baseline):
+    if value is None or not baseline:
+        return ''
+    return f" ({(value - baseline) / baseline * 100:+.0f}%)"
+
+
+def _format_value(value):
+    return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
+
+
+def report(results, baseline=None):
+    baseline = baseline or {}
+    header = f"{'сценарий':<24}{'запросов':>9}{'ошибок':>8}{'p50, мс':>18}{'p95, мс':>18}{'p99, мс':>18}{'RPS':>18}{'SQL/запрос':>12}"
+    print(header)
+    print('-' * len(header))
+    for name, result in results.items():
+        base = baseline.get(name, {})
+        qpr = result['queries_per_request']
+        print(
+            f"{name:<24}{result['requests']:>9}{result['errors']:>8}"
+            f"{_format_value(result['p50_ms'])}{_format_delta(result['p50_ms'], base.get('p50_ms')):>9}"
+            f"{_format_value(result['p95_ms'])}{_format_delta(result['p95_ms'], base.get('p95_ms')):>9}"
+            f"{_format_value(result['p99_ms'])}{_format_delta(result['p99_ms'], base.get('p99_ms')):>9}"
+            f"{_format_value(result['throughput_rps'])}{_format_delta(result['throughput_rps'], base.get('throughput_rps')):>9}"
+            f"{(f'{qpr:.1f}' if qpr is not None else '-'):>12}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный прогон маршрутов Sweetie')
+    parser.add_argument('--url', help='адрес запущенного сервера; без него - тестовый клиент Flask')
+    parser.add_argument('--requests', type=int, default=200, help='запросов на сценарий')
+    parser.add_argument('--concurrency', type=int, default=1, help='параллельных потоков')
+    parser.add_argument('--warmup', type=int, default=20, help='запросов прогрева (не учитываются)')
+    parser.add_argument('--only', nargs='*', help='выполнить только указанные сценарии')
+    parser.add_argument('--writes', action='store_true', help='добавить изменяющие данные POST-сценарии')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='сохранить результаты в JSON')
+    parser.add_argument('--compare', help='сравнить с результатами из JSON')
+    args = parser.parse_args()
+
+    sample = Sample(args.seed)
+    if args.url:
+        def make_client(user_id):
+            return HTTPClient(args.url, user_id)
+    else:
+        def make_client(user_id):
+            return FlaskClient(user_id)
+
+    results = {}
+    for name, needs_login, build in scenarios(sample, args.writes):
+        if args.only and name not in args.only:
+            continue
+        print(f"{name}...", flush=True)
+        results[name] = run_scenario(needs_login, build, sample, make_client,
+                                     args.requests, args.concurrency, args.warmup)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print()
+    report(results, baseline)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'mode': 'http' if args.url else 'flask',
+                'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+                'requests': args.requests,
+                'concurrency': args.concurrency,
+                'results': results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены: {args.save}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Пакетные операции записи: многострочные INSERT с игнорированием конфликтов
+по уникальному ключу (INSERT IGNORE в MySQL, ON CONFLICT DO NOTHING в SQLite/PostgreSQL)
+и с обновлением при конфликте (ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE)
+"""
+
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from models import db, Ingredient
+
+
+def insert_ignore(model, rows, conflict_columns):
+    """
+    Вставляет строки одним многострочным INSERT, пропуская те, что нарушают
+    уникальность по conflict_columns. Возвращает число реально вставленных строк.
+    """
+    if not rows:
+        return 0
+    statement = _insert_ignore_statement(model, conflict_columns)
+    return db.session.execute(statement.values(rows)).rowcount
+
+
+def insert_ignore_from_select(model, columns, select, conflict_columns):
+    """
+    INSERT ... SELECT с тем же пропуском конфликтов, что и insert_ignore:
+    вставляются только строки, которые вернул select (например, если
+    существует родительская запись). Возвращает число вставленных строк.
+    """
+    statement = _insert_ignore_statement(model, conflict_columns)
+    return db.session.execute(statement.from_select(columns, select)).rowcount
+
+
+def insert_missing(model, rows, conflict_columns):
+    """
+    Вставляет строки, которых еще нет по conflict_columns, одним многострочным
+    INSERT. В отличие от insert_ignore, в MySQL используется ON DUPLICATE KEY
+    UPDATE id = id: INSERT IGNORE превращает в предупреждения и ошибки данных
+    (слишком длинная строка сохраняется обрезанной). Число вставленных строк
+    не возвращается - в MySQL rowcount учитывает и найденные дубликаты.
+    """
+    if not rows:
+        return
+    if db.session.get_bind().dialect.name == 'mysql':
+        table = model.__table__
+        statement = mysql.insert(table).values(rows)
+        primary_key = table.primary_key.columns.values()[0]
+        statement = statement.on_duplicate_key_update({primary_key.name: primary_key})
+    else:
+        statement = _insert_ignore_statement(model, conflict_columns).values(rows)
+    db.session.execute(statement)
+
+
+def _insert_ignore_statement(model, conflict_columns):
+    dialect = db.session.get_bind().dialect.name
+    table = model.__table__
+    if dialect == 'mysql':
+        return mysql.insert(table).prefix_with('IGNORE')
+    elif dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing(index_elements=conflict_columns)
+    elif dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing(index_elements=conflict_columns)
+    raise NotImplementedError(f"insert_ignore не поддерживается для {dialect}")
+
+
+def upsert(model, rows, conflict_columns, update_columns):
+    """
+    Вставляет строки одним атомарным INSERT; при нарушении уникальности по
+    conflict_columns обновляет у существующей строки update_columns значениями
+    из вставляемой. Блокируется только затронутая строка, без SELECT перед записью.
+    """
+    if not rows:
+        return 0
+    dialect = db.session.get_bind().dialect.name
+    table = model.__table__
+    if dialect == 'mysql':
+        statement = mysql.insert(table).values(rows)
+        statement = statement.on_duplicate_key_update(
+            {column: statement.inserted[column] for column in update_columns}
+        )
+    elif dialect in ('sqlite', 'postgresql'):
+        module = sqlite if dialect == 'sqlite' else postgresql
+        statement = module.insert(table).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={column: statement.excluded[column] for column in update_columns}
+        )
+    else:
+        raise NotImplementedError(f"upsert не поддерживается для {dialect}")
+    return db.session.execute(statement).rowcount
+
+
+def resolve_ingredient_ids(units_by_name):
+    """
+    Возвращает {название: id} для ингредиентов, создавая недостающие.
+
+    units_by_name - {название: единица измерения для нового ингредиента}.
+    Выполняет не больше трех запросов независимо от числа ингредиентов:
+    поиск существующих, вставка недостающих и чтение их id. Одновременное
+    создание того же ингредиента другим запросом не приводит к ошибке.
+    Название длиннее столбца или не найденное после вставки - ValueError.
+    """
+    if not units_by_name:
+        return {}
+    names = list(units_by_name)
+    max_length = Ingredient.name.type.length
+    too_long = [name for name in names if len(name) > max_length]
+    if too_long:
+        raise ValueError(
+            f"Название ингредиента длиннее {max_length} символов: «{too_long[0][:max_length]}…»"
+        )
+    query = db.select(Ingredient.name, Ingredient.id)
+
+    found = db.session.execute(query.where(Ingredient.name.in_(names))).all()
+    ids = dict(found)
+
+    missing = [name for name in names if name not in ids]
+    if missing:
+        insert_missing(
+            Ingredient,
+            [{'name': name, 'unit': units_by_name[name]} for name in missing],
+            ['name']
+        )
+        created = db.session.execute(query.where(Ingredient.name.in_(missing))).all()
+        ids.update(created)
+        found.extend(created)
+
+    # Сравнение строк в MySQL может не учитывать регистр: «мука» совпадет с «Мука»
+    folded = {name.casefold(): ingredient_id for name, ingredient_id in found}
+    for name in names:
+        if name not in ids and name.casefold() in folded:
+            ids[name] = folded[name.casefold()]
+
+    unresolved = [name for name in names if name not in ids]
+    if unresolved:
+        raise ValueError(f"Не удалось найти или создать ингредиенты: {', '.join(unresolved[:10])}")
+    return ids
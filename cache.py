@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш для отрендеренных фрагментов шаблонов и других редко меняющихся данных.
+
+Бэкенд выбирается параметром CACHE_TYPE:
+  - 'lru'   - LRU-кэш в памяти процесса (по умолчанию)
+  - 'file'  - файлы в каталоге CACHE_DIR, общий для процессов на одной машине
+  - 'redis' - Redis или совместимый сервер по адресу CACHE_REDIS_URL (нужен пакет redis)
+  - 'null'  - кэширование отключено
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class NullCache:
+    """Бэкенд, который ничего не хранит"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUCache(NullCache):
+    """Потокобезопасный LRU-кэш в памяти процесса с временем жизни записей"""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        expires = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FileCache(NullCache):
+    """Кэш в файлах: одна запись - один файл, запись через атомарную замену"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires and expires < time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, timeout):
+        expires = time.time() + timeout if timeout else None
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((expires, value), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def delete(self, *keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+class RedisCache(NullCache):
+    """Кэш в Redis (или совместимом сервере)"""
+
+    def __init__(self, url, prefix='sweetie:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, timeout):
+        self.client.set(self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                        ex=timeout or None)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class Cache:
+    """Обертка над бэкендом со счетчиками попаданий и промахов"""
+
+    def __init__(self, backend, default_timeout=300):
+        self.backend = backend
+        self.default_timeout = default_timeout
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, timeout=None):
+        self.backend.set(key, value, self.default_timeout if timeout is None else timeout)
+
+    def delete(self, *keys):
+        self.backend.delete(*keys)
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_or_set(self, key, create, timeout=None):
+        """Возвращает значение из кэша или вычисляет его через create() и сохраняет"""
+        value = self.get(key)
+        if value is None:
+            value = create()
+            self.set(key, value, timeout)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+def create_cache(config):
+    """Создает кэш по настройкам приложения"""
+    cache_type = config.get('CACHE_TYPE', 'lru')
+    if cache_type == 'lru':
+        backend = LRUCache(config.get('CACHE_LRU_MAX_ENTRIES', 2048))
+    elif cache_type == 'file':
+        backend = FileCache(config['CACHE_DIR'])
+    elif cache_type == 'redis':
+        backend = RedisCache(config['CACHE_REDIS_URL'])
+    elif cache_type == 'null':
+        backend = NullCache()
+    else:
+        raise ValueError(f"Неизвестный CACHE_TYPE: {cache_type}")
+    return Cache(backend, config.get('CACHE_DEFAULT_TIMEOUT', 300))
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш списка категорий в памяти процесса.
+
+Категории нужны на самых посещаемых страницах (фильтр каталога, форма
+рецепта, карточки рецептов), а меняются редко. Список хранится
+CATEGORY_CACHE_TIMEOUT секунд и сбрасывается после фиксации транзакции,
+изменившей таблицу categories через сессию: добавление/изменение/удаление
+объектов Category или db.session.execute(insert/update/delete(Category)).
+Изменения из других процессов (и прямые запросы мимо сессии) становятся
+видны не позже чем через CATEGORY_CACHE_TIMEOUT.
+
+В шаблонах доступны all_categories() и category_name(category_id).
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from models import db, Category
+
+# Неизменяемая копия строки: в отличие от объекта ORM не привязана к сессии
+CategoryItem = namedtuple('CategoryItem', 'id name description')
+
+CHANGED_FLAG = 'categories_changed'
+
+
+class CategoryCache:
+    """Список категорий с временем жизни; подключается к приложению через init_app"""
+
+    def __init__(self, app=None):
+        self.timeout = 300
+        self._lock = threading.Lock()
+        self._items = None
+        self._by_id = {}
+        self._expires = 0.0
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.timeout = app.config.get('CATEGORY_CACHE_TIMEOUT', 300)
+        app.add_template_global(self.all, 'all_categories')
+        app.add_template_global(self.name, 'category_name')
+
+        # Изменения помечают сессию, сброс - только после успешного COMMIT:
+        # иначе параллельный запрос успел бы закэшировать еще старые данные
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            if not event.contains(Category, name, _mark_changed_object):
+                event.listen(Category, name, _mark_changed_object)
+        if not event.contains(Session, 'do_orm_execute', _mark_changed_statement):
+            event.listen(Session, 'do_orm_execute', _mark_changed_statement)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', _clear_changed)
+
+    def _load(self):
+        with self._lock:
+            if self._items is not None and time.monotonic() < self._expires:
+                self.hits += 1
+                return self._items, self._by_id
+            self.misses += 1
+            generation = self._generation
+
+        rows = db.session.execute(
+            db.select(Category.id, Category.name, Category.description).order_by(Category.id)
+        ).all()
+        items = tuple(CategoryItem(*row) for row in rows)
+        by_id = {item.id: item for item in items}
+
+        with self._lock:
+            # Если кэш сбросили во время чтения, прочитанный список мог устареть
+            if generation == self._generation:
+                self._items, self._by_id = items, by_id
+                self._expires = time.monotonic() + self.timeout
+        return items, by_id
+
+    def all(self):
+        """Все категории (CategoryItem) в порядке id"""
+        return self._load()[0]
+
+    def get(self, category_id):
+        if category_id is None:
+            return None
+        return self._load()[1].get(category_id)
+
+    def name(self, category_id):
+        category = self.get(category_id)
+        return category.name if category else None
+
+    def invalidate(self):
+        with self._lock:
+            self._items = None
+            self._by_id = {}
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def _after_commit(self, session):
+        if session.info.pop(CHANGED_FLAG, False):
+            self.invalidate()
+
+
+def _mark_changed_object(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info[CHANGED_FLAG] = True
+
+
+def _mark_changed_statement(state):
+    if (state.is_insert or state.is_update or state.is_delete) \
+            and any(mapper.class_ is Category for mapper in state.all_mappers):
+        state.session.info[CHANGED_FLAG] = True
+
+
+def _clear_changed(session):
+    session.info.pop(CHANGED_FLAG, None)
+
+
+category_cache = CategoryCache()
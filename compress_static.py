@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Создание сжатых вариантов (gzip и, при установленном пакете brotli, br)
+статических файлов для отдачи без сжатия на лету.
+
+Приложение делает то же самое при запуске (STATIC_PRECOMPRESS); скрипт
+удобен при сборке образа или выкладке с STATIC_PRECOMPRESS=0. Подключение
+к базе данных не нужно.
+
+Запуск:
+    python compress_static.py
+"""
+
+import os
+
+from flask import Flask
+
+from config import config
+from static_assets import StaticAssets, brotli
+
+if __name__ == '__main__':
+    # Те же static и instance, что у app.py, но без инициализации БД
+    app = Flask('app')
+    app.config.from_object(config[os.environ.get('FLASK_ENV', 'development')])
+    app.config['STATIC_PRECOMPRESS'] = False
+
+    assets = StaticAssets(app)
+    created = assets.precompress_all()
+    for filename, encodings in created.items():
+        print(f"{filename}: {', '.join(encodings)}")
+    print(f"Сжато файлов: {len(created)} -> {assets.output_folder}")
+    if brotli is None:
+        print("Пакет brotli не установлен: созданы только варианты gzip")
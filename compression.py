@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Сжатие ответов приложения (HTML, JSON, NDJSON) на уровне WSGI.
+
+Кодировка выбирается по Accept-Encoding: br (если установлен пакет brotli)
+или gzip. Сжимаются ответы с типом из COMPRESS_MIMETYPES размером от
+COMPRESS_MIN_SIZE байт: для маленьких ответов (например, JSON оценки)
+заголовки и время сжатия дороже выигрыша.
+
+Потоковые ответы (выгрузка рецептов) сжимаются по частям, без сборки всего
+тела в памяти; если длина заранее неизвестна, для проверки минимального
+размера буферизуется только начало ответа. Не сжимаются: HEAD, 206 и 304,
+ответы с Content-Encoding (заранее сжатая статика) и с
+Cache-Control: no-transform.
+
+Если ответы сжимает обратный прокси, сжатие в приложении отключается
+через COMPRESS_ENABLED = 0. Сравнение уровней сжатия на страницах
+приложения: python -m benchmark.compression.
+"""
+
+import zlib
+
+from werkzeug.http import parse_accept_header, parse_options_header
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него используется только gzip
+    brotli = None
+
+DEFAULT_MIMETYPES = (
+    'text/html', 'application/json', 'application/x-ndjson', 'text/plain',
+    'text/css', 'text/javascript', 'application/javascript', 'image/svg+xml',
+)
+
+# Статусы без тела или с частью тела: сжатие к ним неприменимо
+SKIP_STATUSES = (204, 206, 304)
+
+
+class CompressionMiddleware:
+    """WSGI-обертка: app.wsgi_app = CompressionMiddleware(app.wsgi_app, ...)"""
+
+    def __init__(self, app, min_size=500, level=6, brotli_quality=4, mimetypes=DEFAULT_MIMETYPES):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.mimetypes = frozenset(mimetypes)
+        # Порядок предпочтения при одинаковом q в Accept-Encoding
+        self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    @classmethod
+    def from_config(cls, app, config):
+        """Обертка по настройкам приложения; при COMPRESS_ENABLED = 0 возвращает app"""
+        if not config.get('COMPRESS_ENABLED', True):
+            return app
+        return cls(
+            app,
+            min_size=config.get('COMPRESS_MIN_SIZE', 500),
+            level=config.get('COMPRESS_LEVEL', 6),
+            brotli_quality=config.get('COMPRESS_BROTLI_QUALITY', 4),
+            mimetypes=config.get('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES),
+        )
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ.get('REQUEST_METHOD') != 'HEAD':
+            encoding = self.negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return self.app(environ, start_response)
+        return _CompressingResponse(self, environ, start_response, encoding)
+
+    def negotiate(self, accept_encoding):
+        """Кодировка с наибольшим q из поддерживаемых или None"""
+        accepted = parse_accept_header(accept_encoding)
+        best, best_quality = None, 0
+        for encoding in self.encodings:
+            quality = accepted[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def should_compress(self, status, headers):
+        """Проверка по статусу и заголовкам ответа (без учета длины тела)"""
+        code = int(status.split(None, 1)[0])
+        if code < 200 or code in SKIP_STATUSES:
+            return False
+        values = {}
+        for name, value in headers:
+            values.setdefault(name.lower(), value)
+        if 'content-encoding' in values or 'content-range' in values:
+            return False
+        if 'no-transform' in values.get('cache-control', '').lower():
+            return False
+        mimetype = parse_options_header(values.get('content-type', ''))[0]
+        if mimetype not in self.mimetypes:
+            return False
+        length = values.get('content-length')
+        return length is None or not length.isdigit() or int(length) >= self.min_size
+
+    def compressor(self, encoding):
+        """Объект с compress(data) и flush() для выбранной кодировки"""
+        if encoding == 'br':
+            return _BrotliCompressor(self.brotli_quality)
+        # wbits=31: формат gzip (заголовок и CRC) вместо zlib
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+
+class _BrotliCompressor:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+class _CompressingResponse:
+    """
+    Тело ответа для WSGI-сервера. start_response приложения перехватывается:
+    решение о сжатии (и заголовки для сервера) принимается, когда известны
+    заголовки и, при неизвестной длине, первые min_size байт тела.
+    """
+
+    def __init__(self, middleware, environ, start_response, encoding):
+        self.middleware = middleware
+        self.start_response = start_response
+        self.encoding = encoding
+        self.status = None
+        self.headers = None
+        self.exc_info = None
+        self.started = False
+        self.written = []  # данные, переданные через write() из start_response
+        self.app_iter = middleware.app(environ, self._capture)
+
+    def _capture(self, status, headers, exc_info=None):
+        if exc_info is not None and self.started:
+            # Заголовки уже переданы серверу: ошибку пробрасываем как есть (PEP 3333)
+            raise exc_info[1].with_traceback(exc_info[2])
+        self.status, self.headers, self.exc_info = status, list(headers), exc_info
+        return self.written.append
+
+    def __iter__(self):
+        chunks = iter(self.app_iter)
+        buffered = self.written
+        # Приложение может вызвать start_response при первой итерации
+        while self.status is None:
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            buffered.append(chunk)
+        if self.status is None:
+            raise RuntimeError('WSGI-приложение не вызвало start_response')
+
+        compress = self.middleware.should_compress(self.status, self.headers)
+        if compress and not any(name.lower() == 'content-length' for name, _ in self.headers):
+            # Длина неизвестна (поток): читаем начало, чтобы проверить минимальный размер
+            size = sum(len(chunk) for chunk in buffered)
+            while size < self.middleware.min_size:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    compress = False
+                    break
+                buffered.append(chunk)
+                size += len(chunk)
+
+        self.started = True
+        if not compress:
+            self.start_response(self.status, self.headers, self.exc_info)
+            yield from buffered
+            yield from chunks
+            return
+
+        self.start_response(self.status, self._compressed_headers(), self.exc_info)
+        compressor = self.middleware.compressor(self.encoding)
+        for source in (buffered, chunks):
+            for chunk in source:
+                data = compressor.compress(chunk)
+                if data:
+                    yield data
+        yield compressor.flush()
+
+    def _compressed_headers(self):
+        headers = []
+        vary = []
+        for name, value in self.headers:
+            lower = name.lower()
+            if lower in ('content-length', 'accept-ranges'):
+                continue
+            if lower == 'vary':
+                vary.extend(item.strip() for item in value.split(',') if item.strip())
+                continue
+            if lower == 'etag' and not value.startswith('W/'):
+                # Сжатое тело отличается побайтно: сильный ETag становится слабым
+                value = 'W/' + value
+            headers.append((name, value))
+        if not any(item.lower() == 'accept-encoding' for item in vary):
+            vary.append('Accept-Encoding')
+        headers.append(('Vary', ', '.join(vary)))
+        headers.append(('Content-Encoding', self.encoding))
+        return headers
+
+    def close(self):
+        close = getattr(self.app_iter, 'close', None)
+        if close is not None:
+            close()
@@ -30,11 +30,16 @@ CREATE TABLE IF NOT EXISTS recipes (
     instructions TEXT NOT NULL,
     prep_time INT,
     cook_time INT,
+    total_time INT,
     servings INT,
     image_path VARCHAR(255),
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     is_published BOOLEAN DEFAULT TRUE,
+    rating_sum INT NOT NULL DEFAULT 0,
+    rating_count INT NOT NULL DEFAULT 0,
+    favorite_count INT NOT NULL DEFAULT 0,
+    comment_count INT NOT NULL DEFAULT 0,
     user_id INT NOT NULL,
     category_id INT,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
@@ -110,6 +115,15 @@ CREATE TABLE IF NOT EXISTS user_profiles (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
+-- Создание таблицы полнотекстового поиска по рецептам
+CREATE TABLE IF NOT EXISTS recipe_search (
+    recipe_id INT PRIMARY KEY,
+    title VARCHAR(200) NOT NULL,
+    body MEDIUMTEXT,
+    FULLTEXT KEY ft_recipe_search (title, body),
+    FOREIGN KEY (recipe_id) REFERENCES recipes(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- Вставка базовых категорий
 INSERT IGNORE INTO categories (name, description) VALUES
 ('Торты', 'Праздничные и повседневные торты'),
@@ -130,11 +144,16 @@ INSERT IGNORE INTO ingredients (name, unit) VALUES
 ('Какао-порошок', 'г'),
 ('Сметана', 'г');
 
--- Создание индексов для улучшения производительности
-CREATE INDEX idx_recipes_user_id ON recipes(user_id);
-CREATE INDEX idx_recipes_category_id ON recipes(category_id);
-CREATE INDEX idx_comments_recipe_id ON comments(recipe_id);
-CREATE INDEX idx_ratings_recipe_id ON ratings(recipe_id);
-CREATE INDEX idx_favorites_user_id ON favorites(user_id);
+-- Создание индексов для улучшения производительности (совпадают с объявленными в models.py).
+-- Составные индексы повторяют фильтр и ORDER BY запросов; выборки избранного
+-- и оценок по user_id обслуживают уникальные ключи (user_id, recipe_id)
+CREATE INDEX idx_recipes_created_at ON recipes(created_at, id);
+CREATE INDEX idx_recipes_category_created_at ON recipes(category_id, created_at, id);
+CREATE INDEX idx_recipes_user_created_at ON recipes(user_id, created_at);
+CREATE INDEX idx_recipes_category_total_time ON recipes(category_id, total_time);
+CREATE INDEX idx_recipe_ingredients_recipe ON recipe_ingredients(recipe_id, ingredient_id);
+CREATE INDEX idx_comments_recipe_created_at ON comments(recipe_id, created_at, id);
+CREATE INDEX idx_ratings_recipe_rating ON ratings(recipe_id, rating);
+CREATE INDEX idx_favorites_recipe_id ON favorites(recipe_id);
 
 
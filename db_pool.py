@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Пул соединений с MySQL: расчет параметров по окружению и метрики выдачи соединений
+"""
+
+import os
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+def _env_int(name, default=None):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return int(value)
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def wsgi_concurrency():
+    """Число процессов и потоков WSGI-сервера (переменные gunicorn/uwsgi)"""
+    workers = _env_int('WEB_CONCURRENCY') or _env_int('GUNICORN_WORKERS') or 1
+    threads = _env_int('WSGI_THREADS') or _env_int('GUNICORN_THREADS') or 1
+    return workers, threads
+
+
+def pool_settings():
+    """
+    Параметры пула для одного процесса.
+
+    Пул создается в каждом процессе отдельно, а каждому потоку одновременно
+    нужно не более одного соединения, поэтому по умолчанию pool_size не
+    меньше числа потоков. Если задан DB_MAX_CONNECTIONS, запас (max_overflow)
+    ограничивается так, чтобы все процессы вместе не превышали этот лимит.
+    """
+    workers, threads = wsgi_concurrency()
+    pool_size = _env_int('DB_POOL_SIZE', max(threads, 5))
+
+    max_overflow = _env_int('DB_MAX_OVERFLOW')
+    if max_overflow is None:
+        max_connections = _env_int('DB_MAX_CONNECTIONS')
+        if max_connections:
+            max_overflow = max(0, max_connections // workers - pool_size)
+        else:
+            max_overflow = pool_size
+
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        # Меньше wait_timeout MySQL, чтобы не получать закрытые сервером соединения
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+    }
+
+
+def engine_options(database_uri):
+    """SQLALCHEMY_ENGINE_OPTIONS для строки подключения (пул настраивается только для MySQL)"""
+    if not database_uri.startswith('mysql'):
+        return {}
+    options = pool_settings()
+    options['poolclass'] = InstrumentedQueuePool
+    return options
+
+
+class PoolMetrics:
+    """Счетчики выдачи соединений из пула (на процесс)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_checkout(self, waited):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool=None):
+        with self._lock:
+            data = {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_seconds_total': self.wait_seconds_total,
+                'wait_seconds_max': self.wait_seconds_max,
+            }
+        if isinstance(pool, QueuePool):
+            data.update({
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+                'checked_in': pool.checkedin(),
+            })
+        return data
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, измеряющий время ожидания свободного соединения"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record_timeout()
+            raise
+        pool_metrics.record_checkout(time.perf_counter() - start)
+        return connection
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Аудит индексов: выполняет маршруты приложения через тестовый клиент,
+собирает выполненные SELECT и показывает их план (EXPLAIN в MySQL,
+EXPLAIN QUERY PLAN в SQLite). Полные сканы таблиц помечаются как
+проблемы (скрипт завершается с кодом 1), полные проходы по индексу и
+сортировки без индекса - как предупреждения.
+
+Запуск:
+    python explain_queries.py            # только GET-маршруты, данные не меняются
+    python explain_queries.py --writes   # плюс POST-маршруты на временном рецепте
+
+На маленьких таблицах оптимизатор MySQL может предпочесть полный скан
+индексу, поэтому аудит имеет смысл запускать на базе с реальным объемом данных.
+"""
+
+import argparse
+import re
+import sys
+
+from flask import url_for
+from sqlalchemy import event
+
+from app import app, db, fragment_cache
+from models import User, Recipe, Ingredient
+from pagination import encode_cursor
+
+# Маршруты, которые нельзя или бессмысленно вызывать при аудите
+SKIP_ENDPOINTS = {'static', 'logout'}
+
+AUDIT_RECIPE_TITLE = 'Аудит индексов (временный рецепт)'
+
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+SQLITE_INDEX_SCAN = re.compile(r'^SCAN (?:TABLE )?\w+(?: AS \w+)? USING (?:COVERING )?INDEX ')
+
+
+class QueryCollector:
+    """Собирает SELECT, выполненные во время запроса к приложению"""
+
+    def __init__(self):
+        self.statements = None
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.statements is not None and statement.lstrip().upper().startswith('SELECT'):
+            self.statements.append((statement, parameters))
+
+    def collect(self, func):
+        """Вызывает func(); возвращает ее результат и список (запрос, параметры)"""
+        self.statements = []
+        try:
+            result = func()
+            # Одинаковые запросы (например, в цикле) показываем один раз
+            unique = {}
+            for statement, parameters in self.statements:
+                unique.setdefault(statement, parameters)
+            return result, list(unique.items())
+        finally:
+            self.statements = None
+
+
+def explain(statement, parameters):
+    """
+    Возвращает (строки плана, проблемы, предупреждения) для запроса.
+    Проблема - полный скан таблицы в запросе с условием WHERE; предупреждения -
+    полный проход по индексу, сортировка без индекса и чтение всей таблицы
+    запросом без условий (например, список категорий).
+    """
+    dialect = db.engine.dialect.name
+    filtered = ' WHERE ' in ' '.join(statement.split()).upper()
+    scans, index_scans, sorts = [], [], []
+
+    with db.engine.connect() as conn:
+        if dialect == 'mysql':
+            rows = conn.exec_driver_sql('EXPLAIN ' + statement, parameters).mappings().all()
+            plan = [
+                f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row['Extra'] or ''}".rstrip()
+                for row in rows
+            ]
+            for row in rows:
+                if row['type'] == 'ALL':
+                    scans.append(row['table'])
+                elif row['type'] == 'index':
+                    index_scans.append(f"{row['table']} ({row['key']})")
+                if row['Extra'] and 'Using filesort' in row['Extra']:
+                    sorts.append(row['table'])
+        elif dialect == 'sqlite':
+            rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+            plan = [row[3] for row in rows]
+            for detail in plan:
+                match = SQLITE_SCAN.match(detail)
+                if match:
+                    scans.append(match.group(1))
+                elif SQLITE_INDEX_SCAN.match(detail):
+                    index_scans.append(detail[len('SCAN '):])
+                if detail.startswith('USE TEMP B-TREE FOR ORDER BY'):
+                    sorts.append('ORDER BY')
+        else:
+            raise NotImplementedError(f"EXPLAIN не поддерживается для {dialect}")
+
+    problems, warnings = [], []
+    for table in scans:
+        if filtered:
+            problems.append(f"полный скан таблицы {table}")
+        else:
+            warnings.append(f"чтение всей таблицы {table} (запрос без WHERE)")
+    warnings.extend(f"полный проход по индексу {name}" for name in index_scans)
+    warnings.extend(f"сортировка без индекса ({name})" for name in sorts)
+    return plan, problems, warnings
+
+
+def read_requests(recipe):
+    """GET-запросы: каждый маршрут без параметров плюс варианты ленты рецептов"""
+    requests = []
+    with app.test_request_context():
+        for rule in app.url_map.iter_rules():
+            if rule.endpoint in SKIP_ENDPOINTS or 'GET' not in rule.methods:
+                continue
+            values = {}
+            if 'recipe_id' in rule.arguments:
+                values['recipe_id'] = recipe.id
+            if set(rule.arguments) - set(values):
+                print(f"⚠️  Пропущен маршрут {rule.rule}: неизвестные параметры")
+                continue
+            requests.append(('GET', url_for(rule.endpoint, **values), None))
+
+        # Фильтры и вторая страница ленты используют другие индексы
+        cursor = encode_cursor(recipe.created_at, recipe.id)
+        word = recipe.title.split()[0]
+        requests.extend([
+            ('GET', url_for('recipes', after=cursor), None),
+            ('GET', url_for('recipes', category=recipe.category_id or 1), None),
+            ('GET', url_for('recipes', category=recipe.category_id or 1, time=60), None),
+            ('GET', url_for('recipes', time=60), None),
+            ('GET', url_for('recipes', search=word), None),
+            ('GET', url_for('recipe_comments', recipe_id=recipe.id, after=cursor), None),
+        ])
+    return requests
+
+
+def write_requests(client):
+    """
+    POST-маршруты на временном рецепте: он создается, получает оценку,
+    комментарий и отметку избранного и затем удаляется вместе с ними
+    """
+    ingredient = Ingredient.query.first()
+    with app.test_request_context():
+        add_url = url_for('add_recipe')
+    data = {
+        'title': AUDIT_RECIPE_TITLE,
+        'description': '',
+        'instructions': '-',
+        'prep_time': '1',
+        'cook_time': '1',
+        'servings': '1',
+        'ingredient_name[]': [ingredient.name if ingredient else 'Мука'],
+        'ingredient_quantity[]': ['1'],
+        'ingredient_unit[]': [ingredient.unit if ingredient else 'г'],
+    }
+    yield 'POST', add_url, {'data': data}
+
+    recipe = Recipe.query.filter_by(title=AUDIT_RECIPE_TITLE).order_by(Recipe.id.desc()).first()
+    if recipe is None:
+        print("⚠️  Временный рецепт не создан, остальные POST-маршруты пропущены")
+        return
+    with app.test_request_context():
+        requests = [
+            ('POST', url_for('add_favorite', recipe_id=recipe.id), None),
+            ('POST', url_for('remove_favorite', recipe_id=recipe.id), None),
+            ('POST', url_for('rate_recipe'), {'json': {'recipe_id': recipe.id, 'rating': 5}}),
+            ('POST', url_for('add_comment', recipe_id=recipe.id), {'data': {'content': 'аудит'}}),
+            ('POST', url_for('delete_recipe', recipe_id=recipe.id), None),
+        ]
+    yield from requests
+
+
+def audit(include_writes=False):
+    """Выполняет маршруты и печатает планы запросов; возвращает число проблем"""
+    with app.app_context():
+        recipe = Recipe.query.order_by(Recipe.id).first()
+        if recipe is None:
+            print("⚠️  В базе данных нет рецептов!")
+            print("Запустите: python init_data.py")
+            return 0
+        user = db.session.get(User, recipe.user_id)
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user.id
+            sess['username'] = user.username
+
+        collector = QueryCollector()
+        event.listen(db.engine, 'before_cursor_execute', collector)
+
+        total_problems = 0
+        print(f"=== Аудит запросов ({db.engine.dialect.name}) ===")
+
+        def run(method, url, kwargs):
+            nonlocal total_problems
+            # Кэш фрагментов скрывает запросы, поэтому каждый маршрут выполняется с пустым кэшем
+            fragment_cache.clear()
+            response, statements = collector.collect(
+                lambda: client.open(url, method=method, **(kwargs or {}))
+            )
+            db.session.remove()
+            print(f"\n{method} {url} -> {response.status_code}, запросов: {len(statements)}")
+            for statement, parameters in statements:
+                plan, problems, warnings = explain(statement, parameters)
+                marker = '❌' if problems else '⚠️ ' if warnings else '✅'
+                print(f"  {marker} {' '.join(statement.split())[:160]}")
+                for line in plan:
+                    print(f"      {line}")
+                for problem in problems:
+                    print(f"      ❌ {problem}")
+                for warning in warnings:
+                    print(f"      ⚠️  {warning}")
+                total_problems += len(problems)
+
+        try:
+            for item in read_requests(recipe):
+                run(*item)
+            if include_writes:
+                # Запросы строятся по ходу: id временного рецепта известен после его создания
+                for item in write_requests(client):
+                    run(*item)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', collector)
+
+        print(f"\nНайдено проблем: {total_problems}")
+        return total_problems
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='EXPLAIN для запросов всех маршрутов')
+    parser.add_argument('--writes', action='store_true',
+                        help='выполнить и POST-маршруты на временном рецепте (база будет изменена и восстановлена)')
+    args = parser.parse_args()
+    sys.exit(1 if audit(include_writes=args.writes) else 0)
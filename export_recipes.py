@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Выгрузка каталога рецептов в NDJSON для переноса в другое окружение.
+
+Рецепты читаются серверным курсором и пишутся в файл по мере чтения.
+С --resume выгрузка продолжается после последней полной строки
+существующего файла (недописанная строка отбрасывается).
+
+Запуск:
+    python export_recipes.py export.ndjson
+    python export_recipes.py export.ndjson --resume
+Загрузка в другом окружении:
+    python seed.py export.ndjson --update --checkpoint export.ndjson.checkpoint
+"""
+
+import argparse
+import json
+import os
+import time
+
+from app import app, db
+from transfer import EXPORT_CHUNK_SIZE, export_records, to_ndjson
+
+
+def last_exported_id(path):
+    """id последней полной записи; обрезает файл после нее"""
+    if not os.path.exists(path):
+        return 0
+    last_id, good_size = 0, 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                last_id = json.loads(line)['id']
+            except (ValueError, KeyError):
+                break
+            good_size = f.tell()
+    with open(path, 'r+b') as f:
+        f.truncate(good_size)
+    return last_id
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Выгрузка рецептов в NDJSON')
+    parser.add_argument('path', help='файл для выгрузки')
+    parser.add_argument('--resume', action='store_true', help='продолжить прерванную выгрузку')
+    parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                        help='строк, читаемых из БД за раз')
+    args = parser.parse_args()
+
+    after_id = last_exported_id(args.path) if args.resume else 0
+    if after_id:
+        print(f"Продолжение после рецепта id={after_id}")
+
+    started = time.perf_counter()
+    exported = 0
+    with app.app_context(), db.engine.connect() as connection, \
+            open(args.path, 'a' if args.resume else 'w', encoding='utf-8') as f:
+        for record in export_records(connection, after_id=after_id, chunk_size=args.chunk_size):
+            f.write(to_ndjson(record))
+            exported += 1
+    print(f"Выгружено рецептов: {exported} за {time.perf_counter() - started:.1f} с")
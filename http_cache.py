@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP-кэширование страниц: ETag, Last-Modified и ответы 304.
+
+Маршрут описывает версию страницы данными, которые у него уже есть после
+легких запросов (updated_at и счетчики рецепта, id и updated_at рецептов
+страницы и т.п.), и проверяет условный запрос до рендеринга шаблонов:
+
+    page = http_cache.page('recipe', recipe.id, recipe.updated_at, ...)
+    if page.not_modified():
+        return page.not_modified_response()
+    return page.response(render_template(...))
+
+В версию должно входить все, от чего зависит HTML: имена авторов и
+комментаторов, готовность изображений и т.п. last_modified передается,
+только если страница целиком определяется датированными значениями -
+иначе If-Modified-Since даст 304 для изменившейся страницы.
+
+ETag слабый: в него входят переданные значения, версия шаблонов и
+статических файлов, а для вошедшего пользователя - его id и имя.
+
+Cache-Control:
+- гость: public, max-age=HTTP_CACHE_MAX_AGE, s-maxage=HTTP_CACHE_SHARED_MAX_AGE -
+  обратный прокси может отдавать страницу сам, браузер переспрашивает с ETag;
+- вошедший пользователь: private, no-cache - страница хранится только в
+  браузере и всегда проверяется (обычно ответом 304);
+- страница с flash-сообщениями: no-store, без ETag и без 304.
+Все ответы содержат Vary: Cookie. If-Modified-Since учитывается только
+для гостей: персональные части страницы не имеют даты изменения.
+"""
+
+import hashlib
+import os
+import threading
+
+from flask import Response, make_response, request, session
+from werkzeug.http import is_resource_modified
+
+# Каталоги static, содержимое которых не влияет на разметку страниц
+IGNORED_STATIC_DIRS = ('uploads',)
+
+
+class HttpCache:
+    """Политики Cache-Control и валидаторы страниц; подключается через init_app"""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.max_age = 0
+        self.shared_max_age = 30
+        self.version = ''
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('HTTP_CACHE_ENABLED', True)
+        self.max_age = app.config.get('HTTP_CACHE_MAX_AGE', 0)
+        self.shared_max_age = app.config.get('HTTP_CACHE_SHARED_MAX_AGE', 30)
+        # После выкладки новых шаблонов или CSS/JS старые ETag не подходят
+        self.version = app.config.get('HTTP_CACHE_VERSION') or _content_version(app)
+        app.after_request(self._protect_cookies)
+
+    def page(self, *parts, last_modified=None):
+        """Валидаторы текущей страницы по значениям, определяющим ее содержимое"""
+        return CachedPage(self, parts, last_modified)
+
+    def stats(self):
+        # Попадание - ответ 304 без рендеринга
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @staticmethod
+    def _protect_cookies(response):
+        # Ответ с Set-Cookie не должен попасть в общий кэш прокси
+        if response.cache_control.public and 'Set-Cookie' in response.headers:
+            response.cache_control.public = False
+            response.cache_control.private = True
+            response.cache_control.s_maxage = None
+        return response
+
+
+class CachedPage:
+    """ETag, Last-Modified и Cache-Control одной страницы"""
+
+    def __init__(self, cache, parts, last_modified):
+        self.cache = cache
+        user_id = session.get('user_id')
+        self.personal = user_id is not None
+        # flash-сообщение показывается один раз: такую страницу нельзя
+        # ни сохранять, ни подтверждать ответом 304
+        self.cacheable = cache.enabled and not session.get('_flashes')
+        self.last_modified = last_modified.replace(microsecond=0) if last_modified else None
+
+        key = [cache.version, request.full_path, *parts]
+        if self.personal:
+            key += [user_id, session.get('username')]
+        self.etag = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).hexdigest()
+
+    def not_modified(self):
+        """True, если у клиента актуальная копия (условный GET/HEAD)"""
+        if not self.cacheable or request.method not in ('GET', 'HEAD'):
+            return False
+        unmodified = not is_resource_modified(
+            request.environ, etag=self.etag,
+            last_modified=None if self.personal else self.last_modified
+        )
+        self.cache._count(unmodified)
+        return unmodified
+
+    def not_modified_response(self):
+        return self._apply(Response(status=304))
+
+    def response(self, body):
+        """Ответ со страницей и заголовками кэширования"""
+        return self._apply(make_response(body))
+
+    def _apply(self, response):
+        response.vary.add('Cookie')
+        if not self.cacheable:
+            response.cache_control.no_store = True
+            return response
+
+        response.set_etag(self.etag, weak=True)
+        if self.last_modified:
+            response.last_modified = self.last_modified
+        if self.personal:
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+        else:
+            response.cache_control.public = True
+            response.cache_control.max_age = self.cache.max_age
+            response.cache_control.s_maxage = self.cache.shared_max_age
+        return response
+
+
+def _content_version(app):
+    """Хеш содержимого шаблонов и статических файлов (без загрузок пользователей)"""
+    digest = hashlib.blake2b(digest_size=8)
+    folders = [os.path.join(app.root_path, app.template_folder), app.static_folder]
+    for folder in folders:
+        for root, dirs, files in os.walk(folder):
+            if root == app.static_folder:
+                dirs[:] = [name for name in dirs if name not in IGNORED_STATIC_DIRS]
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, folder).encode('utf-8'))
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+http_cache = HttpCache()
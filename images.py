@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Обработка загруженных изображений рецептов.
+
+Оригинал сохраняется в UPLOAD_FOLDER, а фоновый пул потоков очищает его от
+метаданных (EXIF, GPS, цветовой профиль, комментарии) и создает уменьшенные варианты в
+UPLOAD_FOLDER/variants: <имя>_<ширина>.webp и <имя>_<ширина>.jpg.
+Шаблоны выбирают подходящий вариант через srcset.
+
+Файлы удаленных рецептов удаляются тем же пулом после фиксации транзакции
+(schedule_image_cleanup): запрос не ждет файловую систему, а неудачное
+удаление повторяется с растущей задержкой до IMAGE_CLEANUP_RETRIES раз.
+"""
+
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, url_for
+from PIL import Image, ImageOps, JpegImagePlugin, UnidentifiedImageError
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+
+from cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'variants'
+
+# Блоки image.info, которые Pillow записывает в файл без явной передачи:
+# цветовой профиль в PNG, комментарий в JPEG и т.п.
+METADATA_KEYS = ('exif', 'icc_profile', 'xmp', 'comment')
+EXIF_ORIENTATION = 0x0112
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Готовые варианты не меняются, поэтому найденные наборы запоминаются;
+# размер ограничен, чтобы кэш не рос вместе с числом изображений
+VARIANTS_CACHE_SIZE = 4096
+_variants_cache = LRUCache(VARIANTS_CACHE_SIZE)
+
+
+def allowed_file(filename):
+    return '.' in filename and \
+        filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config['IMAGE_WORKERS'],
+                thread_name_prefix='image-worker'
+            )
+        return _executor
+
+
+def _variant_path(upload_folder, image_path, width, ext):
+    stem = os.path.splitext(image_path)[0]
+    return os.path.join(upload_folder, VARIANTS_DIR, f"{stem}_{width}.{ext}")
+
+
+def save_upload(file):
+    """
+    Проверяет и сохраняет загруженный файл, ставит обработку в очередь.
+    Возвращает имя сохраненного файла или None, если файл не является
+    допустимым изображением.
+    """
+    if not file or not file.filename or not allowed_file(file.filename):
+        return None
+
+    # Проверяем, что содержимое действительно изображение (читается только заголовок)
+    try:
+        with Image.open(file.stream) as image:
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+        return None
+    file.stream.seek(0)
+
+    filename = secure_filename(file.filename)
+    # Добавляем timestamp для уникальности имени файла
+    name, ext = os.path.splitext(filename)
+    filename = f"{name}_{int(time.time())}{ext.lower()}"
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    file.save(os.path.join(upload_folder, filename))
+
+    _get_executor().submit(
+        process_image, upload_folder, filename,
+        current_app.config['IMAGE_VARIANT_WIDTHS'], current_app.config['IMAGE_QUALITY']
+    )
+    return filename
+
+
+def stored_upload_name(image_path):
+    """
+    Имя изображения из внешних данных (загрузка рецептов), если это файл в
+    UPLOAD_FOLDER с допустимым именем, иначе None: путь из записи потом
+    используется при удалении файлов.
+    """
+    if not isinstance(image_path, str) or not image_path or secure_filename(image_path) != image_path:
+        return None
+    if not os.path.isfile(os.path.join(current_app.config['UPLOAD_FOLDER'], image_path)):
+        return None
+    return image_path
+
+
+def process_image(upload_folder, image_path, widths, quality):
+    """Удаляет метаданные из оригинала и создает варианты (выполняется в фоне)"""
+    source = os.path.join(upload_folder, image_path)
+    try:
+        os.makedirs(os.path.join(upload_folder, VARIANTS_DIR), exist_ok=True)
+        with Image.open(source) as original:
+            fmt = original.format
+            original.load()
+            # Поворачиваем по EXIF до удаления метаданных
+            rotated = original.getexif().get(EXIF_ORIENTATION, 1) != 1
+            image = ImageOps.exif_transpose(original) if rotated else original.copy()
+            for info in (original.info, image.info):
+                for key in METADATA_KEYS:
+                    info.pop(key, None)
+
+            # Перезаписываем оригинал без метаданных. JPEG сохраняется с таблицами
+            # квантования оригинала, чтобы повторное сжатие не ухудшало качество.
+            # GIF сохраняется со всеми кадрами (длительности и повтор берутся из
+            # файла); комментарий сбрасывается явно - при переходе к первому
+            # кадру Pillow заново читает его из файла. Кадры читаются из
+            # исходного файла во время записи, поэтому GIF сначала пишется в память
+            if fmt == 'JPEG' and not rotated:
+                original.save(source, format=fmt, quality='keep')
+            elif fmt == 'JPEG':
+                # quality='keep' требует исходный объект JPEG, а не повернутую копию
+                image.save(source, format=fmt, qtables=original.quantization,
+                           subsampling=JpegImagePlugin.get_sampling(original))
+            elif fmt == 'GIF':
+                buffer = io.BytesIO()
+                original.save(buffer, format=fmt, save_all=True, comment=b'')
+                with open(source, 'wb') as f:
+                    f.write(buffer.getvalue())
+            else:
+                image.save(source, format=fmt)
+
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+        # Самый маленький вариант пишется последним и служит признаком готовности
+        for width in sorted(_target_widths(image.width, widths), reverse=True):
+            variant = image.copy()
+            variant.thumbnail((width, width * 4), Image.LANCZOS)
+            variant.save(_variant_path(upload_folder, image_path, width, 'webp'),
+                         'WEBP', quality=quality, method=4)
+            # JPEG для браузеров без WebP: прозрачность заменяем белым фоном
+            if variant.mode == 'RGBA':
+                background = Image.new('RGB', variant.size, (255, 255, 255))
+                background.paste(variant, mask=variant.split()[3])
+                variant = background
+            variant.save(_variant_path(upload_folder, image_path, width, 'jpg'),
+                         'JPEG', quality=quality, optimize=True, progressive=True)
+    except Exception:
+        logger.exception("Не удалось обработать изображение %s", image_path)
+
+
+def _target_widths(source_width, widths):
+    """Ширины вариантов без увеличения; самый маленький вариант создается всегда"""
+    targets = [width for width in widths if width <= source_width]
+    return targets or [min(widths)]
+
+
+def image_variants(image_path):
+    """Список (ширина, webp, jpg) готовых вариантов изображения или пустой список"""
+    if not image_path:
+        return []
+    variants = _variants_cache.get(image_path)
+    if variants is not None:
+        return variants
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    widths = sorted(current_app.config['IMAGE_VARIANT_WIDTHS'])
+    # Пока фоновая обработка не закончена, вариантов нет и кэшировать нечего
+    if not os.path.exists(_variant_path(upload_folder, image_path, widths[0], 'jpg')):
+        return []
+
+    variants = []
+    for width in widths:
+        if os.path.exists(_variant_path(upload_folder, image_path, width, 'jpg')):
+            stem = os.path.splitext(image_path)[0]
+            variants.append((
+                width,
+                f"uploads/{VARIANTS_DIR}/{stem}_{width}.webp",
+                f"uploads/{VARIANTS_DIR}/{stem}_{width}.jpg",
+            ))
+    _variants_cache.set(image_path, variants, None)
+    return variants
+
+
+def recipe_image(image_path):
+    """Данные для <picture>: src и srcset для WebP и JPEG"""
+    variants = image_variants(image_path)
+    if not variants:
+        return {
+            'src': url_for('static', filename='uploads/' + image_path),
+            'webp_srcset': None,
+            'srcset': None,
+        }
+    return {
+        'src': url_for('static', filename=variants[0][2]),
+        'webp_srcset': ', '.join(f"{url_for('static', filename=webp)} {width}w" for width, webp, _ in variants),
+        'srcset': ', '.join(f"{url_for('static', filename=jpg)} {width}w" for width, _, jpg in variants),
+    }
+
+
+def schedule_image_cleanup(image_paths):
+    """Ставит удаление файлов изображений (оригиналы и варианты) в очередь"""
+    image_paths = [path for path in image_paths if path]
+    if not image_paths:
+        return
+    config = current_app.config
+    job = {
+        'upload_folder': config['UPLOAD_FOLDER'],
+        'widths': tuple(config['IMAGE_VARIANT_WIDTHS']),
+        'retries': config['IMAGE_CLEANUP_RETRIES'],
+        'delay': config['IMAGE_CLEANUP_RETRY_DELAY'],
+    }
+    # Варианты больше не нужны шаблонам, даже если файлы удалятся не сразу
+    _variants_cache.delete(*image_paths)
+    _get_executor().submit(_cleanup_images, job, image_paths, 1)
+
+
+def _cleanup_images(job, image_paths, attempt):
+    """Удаляет файлы; изображения с ошибкой удаления ставит на повтор"""
+    failed = []
+    for image_path in image_paths:
+        try:
+            delete_image_files(job['upload_folder'], image_path, job['widths'])
+        except OSError as e:
+            failed.append(image_path)
+            error = e
+    if not failed:
+        return
+
+    if attempt > job['retries']:
+        logger.error("Не удалось удалить изображения %s после %d попыток: %s",
+                     ', '.join(failed), attempt, error)
+        return
+    delay = job['delay'] * 2 ** (attempt - 1)
+    logger.warning("Не удалось удалить изображения %s (%s), повтор через %.1f с",
+                   ', '.join(failed), error, delay)
+    timer = threading.Timer(delay, _executor.submit, (_cleanup_images, job, failed, attempt + 1))
+    timer.daemon = True
+    timer.start()
+
+
+def delete_image_files(upload_folder, image_path, widths):
+    """Удаляет оригинал и все варианты изображения; отсутствующие файлы пропускаются"""
+    _variants_cache.delete(image_path)
+    # Имя берется из БД: пути за пределами папки загрузок не удаляются
+    stem = os.path.splitext(image_path)[0]
+    paths = [safe_join(upload_folder, image_path)]
+    for width in widths:
+        paths.append(safe_join(upload_folder, VARIANTS_DIR, f"{stem}_{width}.webp"))
+        paths.append(safe_join(upload_folder, VARIANTS_DIR, f"{stem}_{width}.jpg"))
+    if None in paths:
+        logger.warning("Путь изображения %r выходит за пределы папки загрузок, файлы не удаляются", image_path)
+        return
+    error = None
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            error = e
+    # Остальные файлы удаляются, даже если один не удалось удалить
+    if error is not None:
+        raise error
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Метрики запросов: число SQL-запросов, время в БД, время рендеринга шаблонов
+и общее время обработки по каждому маршруту.
+
+Для каждого ответа добавляется заголовок Server-Timing (виден в DevTools
+браузера), а сводные счетчики отдаются по /metrics в текстовом формате
+Prometheus - только с токеном METRICS_TOKEN или с адресов из
+METRICS_ALLOWED_IPS. SQL-запросы дольше SLOW_QUERY_THRESHOLD_MS пишутся в
+журнал. Запрос учитывается в teardown_request, поэтому в метрики попадают
+и необработанные исключения (статус 500).
+
+Счетчики хранятся в памяти процесса: при нескольких процессах WSGI-сервера
+каждый отдает свои значения.
+"""
+
+import hmac
+import ipaddress
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from flask import (Response, abort, g, has_request_context, request,
+                   before_render_template, template_rendered)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from db_pool import pool_metrics
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы времени ответа, секунды
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+class EndpointStats:
+    """Накопленные значения для одного маршрута"""
+
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.count = 0
+        self.duration = 0.0
+        self.db_statements = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+    def observe(self, duration, db_statements, db_time, template_time):
+        self.count += 1
+        self.duration += duration
+        self.db_statements += db_statements
+        self.db_time += db_time
+        self.template_time += template_time
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                self.buckets[i] += 1
+
+
+class RequestMetrics:
+    """Сбор метрик запросов; подключается к приложению через init_app"""
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(EndpointStats)
+        self._responses = defaultdict(int)
+        self._slow_queries = 0
+        self._caches = {}
+        self.slow_query_threshold = 0.2
+        self.server_timing = True
+        self.token = None
+        self.allowed_networks = ()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.slow_query_threshold = app.config.get('SLOW_QUERY_THRESHOLD_MS', 200) / 1000
+        self.server_timing = app.config.get('SERVER_TIMING_ENABLED', True)
+        self.token = app.config.get('METRICS_TOKEN') or None
+        self.allowed_networks = tuple(
+            ipaddress.ip_network(item.strip(), strict=False)
+            for item in (app.config.get('METRICS_ALLOWED_IPS') or '').split(',') if item.strip()
+        )
+
+        # Слушаем класс Engine, чтобы не зависеть от момента создания движка
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        before_render_template.connect(self._before_render_template, app)
+        template_rendered.connect(self._template_rendered, app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+        if app.config.get('METRICS_ENABLED', True):
+            app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def register_cache(self, name, cache):
+        """Добавляет счетчики попаданий/промахов кэша (cache.stats()) в /metrics"""
+        self._caches[name] = cache
+
+    # --- SQL ---
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['metrics_query_start'] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop('metrics_query_start', None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        if has_request_context() and 'metrics_start' in g:
+            g.metrics_db_statements += 1
+            g.metrics_db_time += elapsed
+        if elapsed >= self.slow_query_threshold:
+            with self._lock:
+                self._slow_queries += 1
+            endpoint = request.endpoint if has_request_context() else None
+            logger.warning("Медленный запрос %.1f мс (%s): %s",
+                           elapsed * 1000, endpoint or '-', ' '.join(statement.split()))
+
+    # --- Шаблоны ---
+
+    def _before_render_template(self, sender, template, context, **extra):
+        if not has_request_context() or 'metrics_start' not in g:
+            return
+        # Вложенные рендеры (фрагменты внутри страницы) входят во внешний
+        if g.metrics_template_depth == 0:
+            g.metrics_template_start = time.perf_counter()
+        g.metrics_template_depth += 1
+
+    def _template_rendered(self, sender, template, context, **extra):
+        if not has_request_context() or 'metrics_start' not in g:
+            return
+        g.metrics_template_depth -= 1
+        if g.metrics_template_depth == 0:
+            g.metrics_template_time += time.perf_counter() - g.metrics_template_start
+
+    # --- Запросы ---
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_db_statements = 0
+        g.metrics_db_time = 0.0
+        g.metrics_template_time = 0.0
+        g.metrics_template_depth = 0
+
+    def _after_request(self, response):
+        if 'metrics_start' not in g:
+            return response
+        # Учет - в _teardown_request: after_request не вызывается, если
+        # исключение пробрасывается дальше (отладка) или упал другой обработчик
+        g.metrics_status = response.status_code
+        if self.server_timing:
+            duration = time.perf_counter() - g.metrics_start
+            response.headers.add('Server-Timing', ', '.join([
+                f'db;dur={g.metrics_db_time * 1000:.1f};desc="{g.metrics_db_statements} queries"',
+                f'tpl;dur={g.metrics_template_time * 1000:.1f}',
+                f'total;dur={duration * 1000:.1f}',
+            ]))
+        return response
+
+    def _teardown_request(self, exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        status = g.get('metrics_status')
+        if status is None or exc is not None:
+            status = 500
+        endpoint = request.endpoint or 'unknown'
+        with self._lock:
+            self._endpoints[endpoint].observe(
+                duration, g.metrics_db_statements, g.metrics_db_time, g.metrics_template_time
+            )
+            self._responses[(endpoint, request.method, status)] += 1
+
+    # --- Prometheus ---
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus"""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{labels} {value}')
+
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            responses = sorted(self._responses.items())
+            slow_queries = self._slow_queries
+
+            metric('sweetie_http_requests_total', 'counter', 'Обработанные запросы',
+                   [(_labels(endpoint=e, method=m, status=s), n) for (e, m, s), n in responses])
+
+            histogram = []
+            for endpoint, stats in endpoints:
+                for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                    histogram.append((f'_bucket{_labels(endpoint=endpoint, le=bound)}', count))
+                histogram.append((f'_bucket{_labels(endpoint=endpoint, le="+Inf")}', stats.count))
+                histogram.append((f'_sum{_labels(endpoint=endpoint)}', stats.duration))
+                histogram.append((f'_count{_labels(endpoint=endpoint)}', stats.count))
+            metric('sweetie_http_request_duration_seconds', 'histogram',
+                   'Время обработки запроса', histogram)
+
+            metric('sweetie_db_statements_total', 'counter', 'SQL-запросы, выполненные при обработке',
+                   [(_labels(endpoint=e), s.db_statements) for e, s in endpoints])
+            metric('sweetie_db_duration_seconds_total', 'counter', 'Время выполнения SQL-запросов',
+                   [(_labels(endpoint=e), s.db_time) for e, s in endpoints])
+            metric('sweetie_template_duration_seconds_total', 'counter', 'Время рендеринга шаблонов',
+                   [(_labels(endpoint=e), s.template_time) for e, s in endpoints])
+
+        metric('sweetie_db_slow_queries_total', 'counter',
+               'SQL-запросы дольше SLOW_QUERY_THRESHOLD_MS', [('', slow_queries)])
+
+        snapshot = pool_metrics.snapshot(db.engine.pool)
+        metric('sweetie_db_pool_checkouts_total', 'counter', 'Выдачи соединений из пула',
+               [('', snapshot['checkouts'])])
+        metric('sweetie_db_pool_timeouts_total', 'counter', 'Таймауты ожидания соединения',
+               [('', snapshot['timeouts'])])
+        metric('sweetie_db_pool_wait_seconds_total', 'counter', 'Суммарное ожидание соединения',
+               [('', snapshot['wait_seconds_total'])])
+        metric('sweetie_db_pool_wait_seconds_max', 'gauge', 'Максимальное ожидание соединения',
+               [('', snapshot['wait_seconds_max'])])
+        for key in ('size', 'checked_out', 'overflow', 'checked_in'):
+            if key in snapshot:
+                metric(f'sweetie_db_pool_{key}', 'gauge', f'Состояние пула: {key}', [('', snapshot[key])])
+
+        if self._caches:
+            stats = {name: cache.stats() for name, cache in sorted(self._caches.items())}
+            metric('sweetie_cache_hits_total', 'counter', 'Попадания в кэш',
+                   [(_labels(cache=name), s['hits']) for name, s in stats.items()])
+            metric('sweetie_cache_misses_total', 'counter', 'Промахи кэша',
+                   [(_labels(cache=name), s['misses']) for name, s in stats.items()])
+
+        return '\n'.join(lines) + '\n'
+
+    def allowed(self):
+        """Доступ к /metrics по токену или адресу клиента"""
+        if self.token:
+            scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+            if scheme.lower() == 'bearer' and hmac.compare_digest(
+                    token.strip().encode('utf-8'), self.token.encode('utf-8')):
+                return True
+        if not self.allowed_networks or not request.remote_addr:
+            return False
+        try:
+            address = ipaddress.ip_address(request.remote_addr)
+        except ValueError:
+            return False
+        return any(address in network for network in self.allowed_networks)
+
+    def metrics_view(self):
+        if not self.allowed():
+            abort(403)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Скрипт для добавления действий ON DELETE (CASCADE / SET NULL) во внешние ключи
+таблиц, созданных через db.create_all() до их появления в моделях.
+
+Удаление рецепта - один DELETE: ингредиенты, комментарии, оценки и избранное
+удаляет сама БД. Скрипт сравнивает внешние ключи в БД с моделями и
+пересоздает только отличающиеся. Схема из create_database.sql уже содержит
+нужные действия.
+
+В SQLite изменение внешнего ключа требует пересоздания таблицы, поэтому для
+нее скрипт только сообщает о расхождениях (базу для разработки проще
+создать заново).
+
+Запуск:
+    python migrate_foreign_keys.py
+"""
+
+from app import app, db
+from sqlalchemy import inspect, text
+
+
+def _ondelete(value):
+    return (value or 'NO ACTION').upper()
+
+
+def mismatched_foreign_keys():
+    """Список (таблица, имя ключа в БД или None, ForeignKeyConstraint модели)"""
+    inspector = inspect(db.engine)
+    result = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {
+            tuple(fk['constrained_columns']): fk
+            for fk in inspector.get_foreign_keys(table.name)
+        }
+        for constraint in table.foreign_key_constraints:
+            if constraint.ondelete is None:
+                continue
+            fk = existing.get(tuple(constraint.column_keys))
+            current = fk['options'].get('ondelete') if fk else None
+            if _ondelete(current) != _ondelete(constraint.ondelete):
+                result.append((table.name, fk['name'] if fk else None, constraint))
+    return result
+
+
+def migrate_foreign_keys():
+    with app.app_context():
+        try:
+            mismatched = mismatched_foreign_keys()
+            if not mismatched:
+                print("Внешние ключи уже соответствуют моделям")
+                return
+
+            if db.engine.dialect.name != 'mysql':
+                for table, name, constraint in mismatched:
+                    print(f"{table}({', '.join(constraint.column_keys)}): "
+                          f"нужно ON DELETE {constraint.ondelete}")
+                print("Изменение внешних ключей поддерживается только для MySQL")
+                return
+
+            for table, name, constraint in mismatched:
+                columns = ', '.join(constraint.column_keys)
+                referred = constraint.referred_table.name
+                referred_columns = ', '.join(element.column.name for element in constraint.elements)
+                if name:
+                    db.session.execute(text(f"ALTER TABLE {table} DROP FOREIGN KEY {name}"))
+                else:
+                    name = f"fk_{table}_{'_'.join(constraint.column_keys)}"
+                db.session.execute(text(
+                    f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({columns}) "
+                    f"REFERENCES {referred} ({referred_columns}) ON DELETE {constraint.ondelete}"
+                ))
+                print(f"{table}({columns}) -> {referred}: ON DELETE {constraint.ondelete}")
+
+            db.session.commit()
+            print("Миграция завершена успешно!")
+        except Exception as e:
+            print(f"Ошибка при выполнении миграции: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    migrate_foreign_keys()
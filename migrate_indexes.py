@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Скрипт для создания составных индексов, объявленных в models.py,
+и удаления одностолбцовых индексов, которые они заменяют
+"""
+
+from app import app, db
+from sqlalchemy import inspect, text
+
+# Индексы из прежней версии create_database.sql, покрытые составными (таблица, индекс)
+SUPERSEDED_INDEXES = [
+    ('recipes', 'idx_recipes_user_id'),
+    ('recipes', 'idx_recipes_category_id'),
+    ('comments', 'idx_comments_recipe_id'),
+    ('favorites', 'idx_favorites_user_id'),
+    ('ratings', 'idx_ratings_recipe_id'),
+]
+
+def migrate_indexes():
+    """Создает недостающие индексы моделей и удаляет устаревшие"""
+    with app.app_context():
+        try:
+            inspector = inspect(db.engine)
+
+            for table in db.metadata.sorted_tables:
+                if not inspector.has_table(table.name):
+                    continue
+                existing = [index['name'] for index in inspector.get_indexes(table.name)]
+                for index in table.indexes:
+                    if index.name in existing:
+                        print(f"Индекс {index.name} уже существует")
+                        continue
+                    index.create(bind=db.engine)
+                    print(f"Создан индекс: {index.name}")
+
+            # Удаляем только после создания замены: MySQL не даст удалить
+            # индекс внешнего ключа, пока нет другого подходящего
+            is_mysql = db.engine.dialect.name == 'mysql'
+            for table_name, index_name in SUPERSEDED_INDEXES:
+                existing = [index['name'] for index in inspector.get_indexes(table_name)]
+                if index_name not in existing:
+                    continue
+                if is_mysql:
+                    db.session.execute(text(f"DROP INDEX {index_name} ON {table_name}"))
+                else:
+                    db.session.execute(text(f"DROP INDEX {index_name}"))
+                print(f"Удален индекс: {index_name}")
+
+            db.session.commit()
+            print("Миграция завершена успешно!")
+
+        except Exception as e:
+            print(f"Ошибка при выполнении миграции: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    migrate_indexes()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Скрипт для добавления агрегатов оценок (rating_sum, rating_count) в таблицу recipes
+и их пересчета по таблице ratings.
+
+Приложение пересчитывает агрегаты рецептов с новыми голосами (ratings.py);
+повторный запуск скрипта пересчитывает все рецепты (например, после
+аварийной остановки процесса с несохраненным буфером).
+"""
+
+from app import app, db
+from sqlalchemy import inspect, text
+
+RATING_COLUMNS = ('rating_sum', 'rating_count')
+
+def add_rating_columns():
+    """Добавляет столбцы агрегатов, если их еще нет"""
+    columns = [column['name'] for column in inspect(db.engine).get_columns('recipes')]
+    print(f"Текущие столбцы в recipes: {columns}")
+
+    for column in RATING_COLUMNS:
+        if column not in columns:
+            db.session.execute(text(f"ALTER TABLE recipes ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"))
+            print(f"Добавлен столбец: {column}")
+        else:
+            print(f"Столбец {column} уже существует")
+
+    db.session.commit()
+
+def backfill_rating_aggregates():
+    """Пересчитывает агрегаты для всех рецептов одним запросом"""
+    result = db.session.execute(text("""
+        UPDATE recipes SET
+            rating_sum = COALESCE((SELECT SUM(ratings.rating) FROM ratings
+                                   WHERE ratings.recipe_id = recipes.id), 0),
+            rating_count = (SELECT COUNT(*) FROM ratings
+                            WHERE ratings.recipe_id = recipes.id)
+    """))
+    db.session.commit()
+    print(f"Пересчитаны агрегаты оценок для {result.rowcount} рецептов")
+
+def migrate_rating_aggregates():
+    """Добавляет столбцы и заполняет их по существующим оценкам"""
+    with app.app_context():
+        try:
+            add_rating_columns()
+            backfill_rating_aggregates()
+            print("Миграция завершена успешно!")
+        except Exception as e:
+            print(f"Ошибка при выполнении миграции: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    migrate_rating_aggregates()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Скрипт для добавления счетчиков избранного и комментариев (favorite_count,
+comment_count) в таблицу recipes и их пересчета по таблицам favorites и comments.
+
+Повторный запуск сверяет счетчики с данными и исправляет расхождения
+(например, после ручных правок в БД). Пересчет идет диапазонами id с
+фиксацией после каждого, поэтому на большой таблице строки не блокируются надолго.
+
+Запуск:
+    python migrate_recipe_counters.py [--chunk-size 5000]
+"""
+
+import argparse
+
+from app import app, db
+from sqlalchemy import inspect, text
+from models import Recipe, Favorite, Comment
+
+COUNTER_COLUMNS = ('favorite_count', 'comment_count')
+
+def add_counter_columns():
+    """Добавляет столбцы счетчиков, если их еще нет"""
+    columns = [column['name'] for column in inspect(db.engine).get_columns('recipes')]
+
+    for column in COUNTER_COLUMNS:
+        if column not in columns:
+            db.session.execute(text(f"ALTER TABLE recipes ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"))
+            print(f"Добавлен столбец: {column}")
+        else:
+            print(f"Столбец {column} уже существует")
+
+    db.session.commit()
+
+def reconcile_counters(chunk_size=5000):
+    """Пересчитывает счетчики диапазонами id; возвращает число исправленных рецептов"""
+    favorites = (
+        db.select(db.func.count(Favorite.id)).where(Favorite.recipe_id == Recipe.id).scalar_subquery()
+    )
+    comments = (
+        db.select(db.func.count(Comment.id)).where(Comment.recipe_id == Recipe.id).scalar_subquery()
+    )
+    max_id = db.session.execute(db.select(db.func.max(Recipe.id))).scalar() or 0
+
+    fixed = 0
+    for start in range(0, max_id + 1, chunk_size):
+        in_range = Recipe.id.between(start, start + chunk_size - 1)
+        # Обновляются только расходящиеся строки; updated_at сохраняется,
+        # чтобы не сбрасывать кэш фрагментов
+        result = db.session.execute(
+            db.update(Recipe)
+            .where(in_range, db.or_(Recipe.favorite_count != favorites, Recipe.comment_count != comments))
+            .values(favorite_count=favorites, comment_count=comments, updated_at=Recipe.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        fixed += result.rowcount
+    return fixed
+
+def migrate_recipe_counters(chunk_size):
+    """Добавляет столбцы и сверяет их с данными"""
+    with app.app_context():
+        try:
+            add_counter_columns()
+            fixed = reconcile_counters(chunk_size)
+            print(f"Исправлены счетчики для {fixed} рецептов")
+            print("Миграция завершена успешно!")
+        except Exception as e:
+            print(f"Ошибка при выполнении миграции: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Пересчет счетчиков избранного и комментариев')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='рецептов в одной транзакции')
+    args = parser.parse_args()
+    migrate_recipe_counters(args.chunk_size)
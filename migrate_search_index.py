@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Скрипт для создания и полной перестройки поискового индекса рецептов
+"""
+
+from app import app, db
+from search import ensure_search_index, rebuild_search_index
+
+def migrate_search_index():
+    """Создает таблицу recipe_search (если нужно) и заполняет ее заново"""
+    with app.app_context():
+        try:
+            if ensure_search_index():
+                print("Создана таблица поискового индекса recipe_search")
+            count = rebuild_search_index()
+            print(f"Проиндексировано рецептов: {count}")
+            print("Миграция завершена успешно!")
+        except Exception as e:
+            print(f"Ошибка при построении поискового индекса: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    migrate_search_index()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Скрипт для добавления хранимого столбца total_time в таблицу recipes,
+его заполнения и создания индекса (category_id, total_time)
+"""
+
+from app import app, db
+from sqlalchemy import inspect, text
+
+INDEX_NAME = 'idx_recipes_category_total_time'
+
+def migrate_total_time():
+    """Добавляет total_time, заполняет его по prep_time/cook_time и создает индекс"""
+    with app.app_context():
+        try:
+            inspector = inspect(db.engine)
+            columns = [column['name'] for column in inspector.get_columns('recipes')]
+
+            if 'total_time' not in columns:
+                db.session.execute(text("ALTER TABLE recipes ADD COLUMN total_time INTEGER"))
+                print("Добавлен столбец: total_time")
+            else:
+                print("Столбец total_time уже существует")
+
+            # Сумма заданных слагаемых, NULL если не задано ни одно
+            result = db.session.execute(text("""
+                UPDATE recipes SET total_time = CASE
+                    WHEN prep_time IS NULL AND cook_time IS NULL THEN NULL
+                    ELSE COALESCE(prep_time, 0) + COALESCE(cook_time, 0)
+                END
+            """))
+            print(f"Заполнено строк: {result.rowcount}")
+
+            indexes = [index['name'] for index in inspector.get_indexes('recipes')]
+            if INDEX_NAME not in indexes:
+                db.session.execute(text(f"CREATE INDEX {INDEX_NAME} ON recipes (category_id, total_time)"))
+                print(f"Создан индекс: {INDEX_NAME}")
+            else:
+                print(f"Индекс {INDEX_NAME} уже существует")
+
+            db.session.commit()
+            print("Миграция завершена успешно!")
+
+        except Exception as e:
+            print(f"Ошибка при выполнении миграции: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    migrate_total_time()
@@ -1,9 +1,24 @@
+import sqlite3
+
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 # Создаем экземпляр db, который будет инициализирован в app.py
 db = SQLAlchemy()
 
+# Связанные строки удаляет сама БД (ON DELETE CASCADE во внешних ключах, как в
+# create_database.sql), а связи объявлены с passive_deletes: ORM не загружает
+# их перед удалением. SQLite выполняет ON DELETE только с включенной проверкой
+# внешних ключей, ее нужно включать для каждого соединения
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys = ON')
+        cursor.close()
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -13,11 +28,11 @@ class User(db.Model):
     password = db.Column(db.String(255), nullable=False)
     
     # Связи
-    recipes = db.relationship('Recipe', backref='author', lazy=True)
-    comments = db.relationship('Comment', backref='author', lazy=True)
-    ratings = db.relationship('Rating', backref='user', lazy=True)
-    favorites = db.relationship('Favorite', backref='user', lazy=True)
-    profile = db.relationship('UserProfile', backref='user', uselist=False)
+    recipes = db.relationship('Recipe', backref='author', lazy=True, passive_deletes=True)
+    comments = db.relationship('Comment', backref='author', lazy=True, passive_deletes=True)
+    ratings = db.relationship('Rating', backref='user', lazy=True, passive_deletes=True)
+    favorites = db.relationship('Favorite', backref='user', lazy=True, passive_deletes=True)
+    profile = db.relationship('UserProfile', backref='user', uselist=False, passive_deletes=True)
 
 class Category(db.Model):
     __tablename__ = 'categories'
@@ -28,7 +43,7 @@ class Category(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Связи
-    recipes = db.relationship('Recipe', backref='category', lazy=True)
+    recipes = db.relationship('Recipe', backref='category', lazy=True, passive_deletes=True)
 
 class Recipe(db.Model):
     __tablename__ = 'recipes'
@@ -39,21 +54,58 @@ class Recipe(db.Model):
     instructions = db.Column(db.Text, nullable=False)
     prep_time = db.Column(db.Integer)  # в минутах
     cook_time = db.Column(db.Integer)  # в минутах
+    total_time = db.Column(db.Integer)  # prep_time + cook_time, хранится для фильтрации по индексу
     servings = db.Column(db.Integer)
     image_path = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_published = db.Column(db.Boolean, default=True)
     
-    # Внешние ключи
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
+    # Агрегаты оценок (пересчитываются пакетно после голосов, см. ratings.py, и migrate_rating_aggregates.py)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
-    # Связи
-    ingredients = db.relationship('RecipeIngredient', backref='recipe', lazy=True)
-    comments = db.relationship('Comment', backref='recipe', lazy=True)
-    ratings = db.relationship('Rating', backref='recipe', lazy=True)
-    favorites = db.relationship('Favorite', backref='recipe', lazy=True)
+    # Счетчики избранного и комментариев (обновляются вместе с записями,
+    # пересчитываются migrate_recipe_counters.py)
+    favorite_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # Внешние ключи
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id', ondelete='SET NULL'))
+    
+    # Связи (строки удаляются вместе с рецептом каскадом в БД)
+    ingredients = db.relationship('RecipeIngredient', backref='recipe', lazy=True,
+                                  cascade='all, delete-orphan', passive_deletes=True)
+    comments = db.relationship('Comment', backref='recipe', lazy=True,
+                               cascade='all, delete-orphan', passive_deletes=True)
+    ratings = db.relationship('Rating', backref='recipe', lazy=True,
+                              cascade='all, delete-orphan', passive_deletes=True)
+    favorites = db.relationship('Favorite', backref='recipe', lazy=True,
+                                cascade='all, delete-orphan', passive_deletes=True)
+    
+    # Индексы повторяют фильтр и ORDER BY представлений:
+    # лента рецептов (keyset по created_at, id), лента категории,
+    # «Мои рецепты» и фильтр «категория + время приготовления»
+    __table_args__ = (
+        db.Index('idx_recipes_created_at', 'created_at', 'id'),
+        db.Index('idx_recipes_category_created_at', 'category_id', 'created_at', 'id'),
+        db.Index('idx_recipes_user_created_at', 'user_id', 'created_at'),
+        db.Index('idx_recipes_category_total_time', 'category_id', 'total_time'),
+    )
+    
+    @staticmethod
+    def calculate_total_time(prep_time, cook_time):
+        """Общее время: сумма заданных слагаемых или None, если не задано ни одно"""
+        parts = [int(value) for value in (prep_time, cook_time) if value not in (None, '')]
+        return sum(parts) if parts else None
+    
+    @property
+    def average_rating(self):
+        """Средняя оценка по хранимым агрегатам, без загрузки оценок"""
+        if not self.rating_count:
+            return 0
+        return self.rating_sum / self.rating_count
 
 class Ingredient(db.Model):
     __tablename__ = 'ingredients'
@@ -64,7 +116,7 @@ class Ingredient(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Связи
-    recipe_ingredients = db.relationship('RecipeIngredient', backref='ingredient', lazy=True)
+    recipe_ingredients = db.relationship('RecipeIngredient', backref='ingredient', lazy=True, passive_deletes=True)
 
 class RecipeIngredient(db.Model):
     __tablename__ = 'recipe_ingredients'
@@ -74,8 +126,10 @@ class RecipeIngredient(db.Model):
     notes = db.Column(db.String(255))  # дополнительные заметки
     
     # Внешние ключи
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False)
-    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id'), nullable=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id', ondelete='CASCADE'), nullable=False)
+    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id', ondelete='CASCADE'), nullable=False)
+    
+    __table_args__ = (db.Index('idx_recipe_ingredients_recipe', 'recipe_id', 'ingredient_id'),)
 
 class Comment(db.Model):
     __tablename__ = 'comments'
@@ -86,8 +140,11 @@ class Comment(db.Model):
     is_approved = db.Column(db.Boolean, default=True)
     
     # Внешние ключи
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id', ondelete='CASCADE'), nullable=False)
+    
+    # Комментарии рецепта в порядке публикации
+    __table_args__ = (db.Index('idx_comments_recipe_created_at', 'recipe_id', 'created_at', 'id'),)
 
 class Rating(db.Model):
     __tablename__ = 'ratings'
@@ -97,11 +154,17 @@ class Rating(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Внешние ключи
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id', ondelete='CASCADE'), nullable=False)
     
     # Уникальность: один пользователь может оценить рецепт только один раз
-    __table_args__ = (db.UniqueConstraint('user_id', 'recipe_id', name='unique_user_recipe_rating'),)
+    # Выборки по user_id обслуживает уникальный ключ, по recipe_id - отдельный
+    # индекс; в нем есть и оценка, поэтому пересчет агрегатов рецепта
+    # (SUM/COUNT, ratings.py) читает только индекс
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'recipe_id', name='unique_user_recipe_rating'),
+        db.Index('idx_ratings_recipe_rating', 'recipe_id', 'rating'),
+    )
 
 class Favorite(db.Model):
     __tablename__ = 'favorites'
@@ -110,11 +173,15 @@ class Favorite(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Внешние ключи
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id', ondelete='CASCADE'), nullable=False)
     
     # Уникальность: один пользователь может добавить рецепт в избранное только один раз
-    __table_args__ = (db.UniqueConstraint('user_id', 'recipe_id', name='unique_user_recipe_favorite'),)
+    # Выборки по user_id обслуживает уникальный ключ, по recipe_id - отдельный индекс
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'recipe_id', name='unique_user_recipe_favorite'),
+        db.Index('idx_favorites_recipe_id', 'recipe_id'),
+    )
 
 class UserProfile(db.Model):
     __tablename__ = 'user_profiles'
@@ -128,6 +195,6 @@ class UserProfile(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Внешний ключ
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, unique=True)
 
 
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Keyset-пагинация (по курсору) для списков, отсортированных по (created_at, id)
+или по другому значению сортировки (например, релевантности поиска) и id
+"""
+
+import base64
+import binascii
+import math
+from datetime import datetime
+
+from werkzeug.exceptions import BadRequest
+
+# Курсор с id вне диапазона BIGINT не дойдет до СУБД
+MAX_ITEM_ID = 2 ** 63 - 1
+
+
+class InvalidCursor(BadRequest):
+    """Курсор из URL не разбирается: ответ 400 вместо произвольной страницы"""
+    description = 'Неверный курсор страницы'
+
+
+def encode_cursor(sort_value, item_id):
+    """Кодирует позицию (значение сортировки, id) в строку для URL"""
+    if isinstance(sort_value, datetime):
+        value = 'd' + sort_value.isoformat()
+    else:
+        value = 'f' + repr(float(sort_value))
+    raw = f"{value}|{item_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(value):
+    """Декодирует курсор из URL, возвращает (значение сортировки, id) или None"""
+    if not value:
+        return None
+    try:
+        padded = value + '=' * (-len(value) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        sort_part, id_part = raw.split('|', 1)
+        if sort_part.startswith('d'):
+            sort_value = datetime.fromisoformat(sort_part[1:])
+        elif sort_part.startswith('f'):
+            sort_value = float(sort_part[1:])
+            if not math.isfinite(sort_value):
+                return None
+        else:
+            return None
+        item_id = int(id_part)
+        if not 0 <= item_id <= MAX_ITEM_ID:
+            return None
+        return sort_value, item_id
+    except (ValueError, UnicodeError, binascii.Error):
+        return None
+
+
+def _parse_cursor(value):
+    if not value:
+        return None
+    cursor = decode_cursor(value)
+    if cursor is None:
+        raise InvalidCursor()
+    return cursor
+
+
+class KeysetPage:
+    """Страница результатов с курсорами на соседние страницы"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_paginate(query, sort_col, id_col, per_page, after=None, before=None, row_key=None):
+    """
+    Возвращает страницу query, отсортированную по (sort_col, id_col) по убыванию.
+
+    after  - курсор последнего элемента предыдущей страницы (листаем вперед)
+    before - курсор первого элемента следующей страницы (листаем назад)
+    row_key - функция, возвращающая (значение сортировки, id) для строки результата
+    Неразборчивый курсор - InvalidCursor (400).
+    Вместо OFFSET используется условие по ключу, поэтому стоимость запроса
+    не зависит от номера страницы. Избыточное условие sort_col <= значение
+    (>= при листании назад) позволяет СУБД начать диапазонный скан индекса:
+    условие с OR сам оптимизатор для этого не использует.
+    """
+    if row_key is None:
+        def row_key(row):
+            return getattr(row, sort_col.key), getattr(row, id_col.key)
+
+    after = _parse_cursor(after)
+    before = _parse_cursor(before)
+
+    if before:
+        sort_value, item_id = before
+        query = query.filter(
+            sort_col >= sort_value,
+            (sort_col > sort_value) |
+            ((sort_col == sort_value) & (id_col > item_id))
+        ).order_by(sort_col.asc(), id_col.asc())
+    else:
+        if after:
+            sort_value, item_id = after
+            query = query.filter(
+                sort_col <= sort_value,
+                (sort_col < sort_value) |
+                ((sort_col == sort_value) & (id_col < item_id))
+            )
+        query = query.order_by(sort_col.desc(), id_col.desc())
+
+    # Берем на одну запись больше, чтобы понять, есть ли еще страница
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if before:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, after is not None
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_next:
+            next_cursor = encode_cursor(*row_key(rows[-1]))
+        if has_prev:
+            prev_cursor = encode_cursor(*row_key(rows[0]))
+
+    return KeysetPage(rows, next_cursor=next_cursor, prev_cursor=prev_cursor)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Хеширование и проверка паролей bcrypt в отдельном пуле процессов.
+
+Каждый вызов bcrypt занимает сотни миллисекунд CPU, поэтому он выполняется
+вне потоков WSGI-сервера, а число одновременных задач ограничено: при
+переполнении очереди сразу выбрасывается PasswordHasherBusy, и представление
+отвечает 503 вместо того, чтобы занимать поток ожиданием.
+
+Процессы пула запускаются через forkserver (spawn там, где его нет): они не
+наследуют потоки и блокировки веб-процесса. Запуск процесса не бесплатен -
+multiprocessing импортирует в нем главный модуль (__main__) процесса, который
+создал пул. Поэтому run.py создает приложение только при прямом запуске, а
+сервер forkserver заранее импортирует этот модуль и bcrypt, и новые процессы
+пула создаются fork-ом уже подготовленного процесса. Пул создается при первом
+обращении и затем переиспользуется.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+import bcrypt
+
+
+# Модули, которые сервер forkserver импортирует один раз для всех процессов пула
+FORKSERVER_PRELOAD = ['passwords', 'bcrypt']
+
+
+class PasswordHasherBusy(Exception):
+    """Пул перегружен или не ответил вовремя"""
+
+
+def hash_password(password, rounds=12):
+    """Хеш bcrypt в текущем потоке (скрипты наполнения базы, задачи пула)"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check_password(password_hash, password):
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        # Поврежденный или не-bcrypt хеш
+        return False
+
+
+def hash_rounds(password_hash):
+    """Стоимость (log2 числа раундов), с которой создан хеш вида $2b$12$..."""
+    try:
+        return int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """Ограниченный пул процессов для bcrypt"""
+
+    def __init__(self, rounds=12, workers=2, max_pending=8, timeout=5):
+        self.rounds = rounds
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            rounds=config['BCRYPT_LOG_ROUNDS'],
+            workers=config['PASSWORD_HASH_WORKERS'],
+            max_pending=config['PASSWORD_HASH_MAX_PENDING'],
+            timeout=config['PASSWORD_HASH_TIMEOUT'],
+        )
+
+    def _get_executor(self):
+        with self._lock:
+            # После fork (например, в gunicorn) пул родителя недоступен - создаем свой
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=_pool_context()
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, func, *args):
+        if self.workers <= 0:
+            # Пул отключен (скрипты, отладка): считаем в текущем потоке
+            return func(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Слот занят, пока задача не завершена или не отменена, а не пока ее
+        # ждет запрос: иначе после таймаутов в пуле копятся задачи сверх лимита
+        future.add_done_callback(self._release_slot)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Задача из очереди снимается; уже начатую bcrypt досчитает
+            future.cancel()
+            raise PasswordHasherBusy()
+
+    def _release_slot(self, future):
+        self._slots.release()
+
+    def hash(self, password):
+        return self._run(hash_password, password, self.rounds)
+
+    def check(self, password_hash, password):
+        return self._run(_check_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return hash_rounds(password_hash) != self.rounds
+
+
+def _pool_context():
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(FORKSERVER_PRELOAD)
+    return context
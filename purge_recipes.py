@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Пакетное удаление рецептов: все рецепты пользователя (например, при удалении
+аккаунта) или заданный список id.
+
+Рецепты удаляются пачками по --chunk-size, каждая пачка - один DELETE и
+отдельная транзакция; связанные строки удаляет каскад внешних ключей
+(для старых схем MySQL сначала выполните migrate_foreign_keys.py).
+Прерванный запуск можно просто повторить.
+
+Запуск:
+    python purge_recipes.py --user user@example.com
+    python purge_recipes.py --ids 10 11 12 [--chunk-size 500]
+"""
+
+import argparse
+import time
+
+from app import app, db, delete_recipes
+from models import User, Recipe
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Пакетное удаление рецептов')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--user', metavar='EMAIL', help='удалить все рецепты пользователя')
+    target.add_argument('--ids', type=int, nargs='+', help='id удаляемых рецептов')
+    parser.add_argument('--chunk-size', type=int, help='рецептов в одной транзакции')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.chunk_size:
+            app.config['RECIPE_DELETE_CHUNK_SIZE'] = args.chunk_size
+
+        if args.user:
+            user_id = db.session.execute(
+                db.select(User.id).where(User.email == args.user)
+            ).scalar()
+            if user_id is None:
+                raise SystemExit(f"Пользователь {args.user} не найден")
+            criteria = Recipe.user_id == user_id
+        else:
+            criteria = Recipe.id.in_(args.ids)
+
+        started = time.perf_counter()
+        deleted = delete_recipes(criteria)
+        print(f"Удалено рецептов: {deleted} за {time.perf_counter() - started:.1f} с")
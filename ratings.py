@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Отложенный пересчет агрегатов оценок (rating_sum, rating_count).
+
+Оценка записывается сразу (атомарный upsert по unique_user_recipe_rating),
+а строка рецепта обновляется не на каждый голос: рецепты с новыми голосами
+копятся в буфере процесса и пересчитываются фоновым потоком раз в
+RATING_FLUSH_INTERVAL_MS или сразу после RATING_FLUSH_MAX_VOTES голосов.
+Популярный рецепт получает одно UPDATE на интервал вместо UPDATE на каждый
+голос, и запросы не ждут блокировку его строки.
+
+Агрегаты пересчитываются по таблице ratings (SUM/COUNT по индексу
+idx_ratings_recipe_rating, без чтения строк таблицы), а не прибавлением
+разниц: разница, вычисленная запросом до записи оценки, неверна при
+параллельных голосах одного пользователя. Пересчет точен при любом числе
+процессов и повторном сбросе. Если процесс завершится аварийно до сброса,
+агрегаты рецепта поправятся при следующем голосе за него или через
+migrate_rating_aggregates.py. Разницы в буфере нужны только для ответа
+на голос (оценка агрегатов до сброса).
+
+RATING_FLUSH_INTERVAL_MS = 0 - пересчет сразу в запросе, без фонового потока.
+"""
+
+import atexit
+import logging
+import os
+import threading
+
+from models import db, Recipe, Rating
+
+logger = logging.getLogger(__name__)
+
+# Рецептов в одном UPDATE ... WHERE id IN (...)
+FLUSH_CHUNK_SIZE = 500
+
+
+class RatingAggregator:
+    """Буфер рецептов с новыми голосами; подключается к приложению через init_app"""
+
+    def __init__(self, app=None):
+        self.interval = 0.25
+        self.max_votes = 100
+        self._app = None
+        self._lock = threading.Lock()
+        self._pending = {}  # recipe_id -> [изменение суммы, изменение числа голосов]
+        self._votes = 0
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._app = app
+        self.interval = app.config.get('RATING_FLUSH_INTERVAL_MS', 250) / 1000
+        self.max_votes = app.config.get('RATING_FLUSH_MAX_VOTES', 100)
+        # Не оставляем несохраненные агрегаты при штатной остановке
+        atexit.register(self.flush)
+
+    def add(self, recipe_id, delta_sum, delta_count, rating_sum, rating_count):
+        """
+        Учитывает голос и возвращает оценку агрегатов (сумма, число) с его учетом:
+        rating_sum/rating_count из строки рецепта плюс еще не сохраненные голоса.
+        """
+        with self._lock:
+            pending = self._pending.setdefault(recipe_id, [0, 0])
+            pending[0] += delta_sum
+            pending[1] += delta_count
+            self._votes += 1
+            estimate = (rating_sum + pending[0], rating_count + pending[1])
+            full = self._votes >= self.max_votes
+
+        if self.interval <= 0:
+            self.flush()
+        else:
+            self._ensure_thread()
+            if full:
+                self._wakeup.set()
+        return estimate
+
+    def flush(self):
+        """Пересчитывает агрегаты рецептов из буфера. Возвращает число рецептов"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._votes = 0
+        if not pending:
+            return 0
+
+        # Один порядок обновления строк во всех процессах исключает взаимные блокировки
+        recipe_ids = sorted(pending)
+        with self._app.app_context():
+            try:
+                for start in range(0, len(recipe_ids), FLUSH_CHUNK_SIZE):
+                    chunk = recipe_ids[start:start + FLUSH_CHUNK_SIZE]
+                    db.session.execute(
+                        db.update(Recipe)
+                        .where(Recipe.id.in_(chunk))
+                        .values(
+                            rating_sum=db.func.coalesce(
+                                db.select(db.func.sum(Rating.rating))
+                                .where(Rating.recipe_id == Recipe.id).scalar_subquery(), 0),
+                            rating_count=db.select(db.func.count()).select_from(Rating)
+                            .where(Rating.recipe_id == Recipe.id).scalar_subquery(),
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.exception("Не удалось пересчитать агрегаты оценок для %d рецептов", len(recipe_ids))
+                # Вернем рецепты в буфер: они будут пересчитаны при следующем сбросе
+                with self._lock:
+                    for recipe_id, (delta_sum, delta_count) in pending.items():
+                        current = self._pending.setdefault(recipe_id, [0, 0])
+                        current[0] += delta_sum
+                        current[1] += delta_count
+                return 0
+        return len(recipe_ids)
+
+    def _ensure_thread(self):
+        # После fork поток родителя в дочернем процессе не работает
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='rating-aggregator', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+rating_aggregator = RatingAggregator()
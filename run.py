@@ -5,12 +5,15 @@
 """
 
 import os
-from app import app
 
 if __name__ == '__main__':
     # Устанавливаем переменную окружения для конфигурации
     os.environ.setdefault('FLASK_ENV', 'development')
-    
+
+    # Приложение создается только при прямом запуске: процессы пула паролей
+    # импортируют этот файл как главный модуль и не должны поднимать приложение
+    from app import app
+
     # Запускаем приложение
     app.run(
         host='0.0.0.0',
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Полнотекстовый поиск по рецептам.
+
+Индекс хранится в отдельной таблице recipe_search (название + описание,
+инструкции и названия ингредиентов):
+  - MySQL: обычная таблица с индексом FULLTEXT, поиск через MATCH ... AGAINST
+  - SQLite: виртуальная таблица FTS5, ранжирование через bm25()
+Для остальных СУБД используется прежний поиск через LIKE.
+"""
+
+import re
+
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects.mysql import match
+
+from models import db, Recipe, Ingredient, RecipeIngredient
+
+SEARCH_TABLE = 'recipe_search'
+
+MYSQL_DDL = """
+CREATE TABLE IF NOT EXISTS recipe_search (
+    recipe_id INT PRIMARY KEY,
+    title VARCHAR(200) NOT NULL,
+    body MEDIUMTEXT,
+    FULLTEXT KEY ft_recipe_search (title, body),
+    FOREIGN KEY (recipe_id) REFERENCES recipes(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+SQLITE_DDL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS recipe_search
+USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')
+"""
+
+
+def _dialect():
+    return db.engine.dialect.name
+
+
+def _key_column():
+    """Столбец с id рецепта: в FTS5 это rowid виртуальной таблицы"""
+    return 'rowid' if _dialect() == 'sqlite' else 'recipe_id'
+
+
+def _search_table():
+    return db.table(SEARCH_TABLE, db.column(_key_column()), db.column('title'), db.column('body'))
+
+
+def search_supported():
+    return _dialect() in ('mysql', 'sqlite')
+
+
+def ensure_search_index():
+    """Создает таблицу индекса, если ее нет. Возвращает True, если таблица создана"""
+    if not search_supported():
+        return False
+    if inspect(db.engine).has_table(SEARCH_TABLE):
+        return False
+    ddl = MYSQL_DDL if _dialect() == 'mysql' else SQLITE_DDL
+    with db.engine.begin() as connection:
+        connection.execute(text(ddl))
+    return True
+
+
+def _recipe_body(recipe, ingredient_names):
+    parts = [recipe.description or '', recipe.instructions or '']
+    parts.extend(ingredient_names)
+    return ' '.join(part for part in parts if part)
+
+
+def index_recipe(recipe, ingredient_names=None):
+    """Добавляет или обновляет запись индекса для рецепта (в текущей транзакции)"""
+    if not search_supported():
+        return
+    if ingredient_names is None:
+        ingredient_names = db.session.execute(
+            db.select(Ingredient.name)
+            .join(RecipeIngredient, RecipeIngredient.ingredient_id == Ingredient.id)
+            .where(RecipeIngredient.recipe_id == recipe.id)
+        ).scalars().all()
+    key = _key_column()
+    db.session.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE {key} = :id"), {'id': recipe.id})
+    db.session.execute(
+        text(f"INSERT INTO {SEARCH_TABLE} ({key}, title, body) VALUES (:id, :title, :body)"),
+        {'id': recipe.id, 'title': recipe.title, 'body': _recipe_body(recipe, ingredient_names)}
+    )
+
+
+def unindex_recipes(recipe_ids):
+    """
+    Удаляет рецепты из индекса (в текущей транзакции). В MySQL строки индекса
+    удаляются каскадом вместе с рецептами; виртуальная таблица FTS5 внешних
+    ключей не поддерживает, поэтому в SQLite они удаляются явно.
+    """
+    if not recipe_ids or _dialect() != 'sqlite':
+        return
+    table = _search_table()
+    db.session.execute(db.delete(table).where(table.c[_key_column()].in_(recipe_ids)))
+
+
+def _index_select():
+    """SELECT (id, title, body) рецептов для заполнения индекса"""
+    names = (
+        db.select(
+            RecipeIngredient.recipe_id.label('recipe_id'),
+            db.func.group_concat(Ingredient.name).label('names')
+        )
+        .join(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id)
+        .group_by(RecipeIngredient.recipe_id)
+        .subquery()
+    )
+    body = (
+        db.func.coalesce(Recipe.description, '') + ' ' +
+        db.func.coalesce(Recipe.instructions, '') + ' ' +
+        db.func.coalesce(names.c.names, '')
+    )
+    return (
+        db.select(Recipe.id, Recipe.title, body)
+        .outerjoin(names, names.c.recipe_id == Recipe.id)
+    )
+
+
+def rebuild_search_index():
+    """Полностью перестраивает индекс одним INSERT ... SELECT"""
+    if not search_supported():
+        return 0
+    ensure_search_index()
+    db.session.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    result = db.session.execute(
+        db.insert(_search_table()).from_select([_key_column(), 'title', 'body'], _index_select())
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def index_recipes(recipe_ids):
+    """
+    Индексирует набор рецептов одним INSERT ... SELECT (для пакетной загрузки).
+    Выполняется в текущей транзакции, фиксирует ее вызывающий код.
+    """
+    if not recipe_ids or not search_supported():
+        return 0
+    table = _search_table()
+    key = table.c[_key_column()]
+    db.session.execute(db.delete(table).where(key.in_(recipe_ids)))
+    result = db.session.execute(
+        db.insert(table).from_select(
+            [_key_column(), 'title', 'body'],
+            _index_select().where(Recipe.id.in_(recipe_ids))
+        )
+    )
+    return result.rowcount
+
+
+def _tokens(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def search_subquery(query):
+    """
+    Подзапрос (recipe_id, score) с рецептами, подходящими под запрос.
+    Чем больше score, тем выше релевантность. Возвращает None, если
+    полнотекстовый поиск недоступен, или пустой результат, если в запросе нет слов.
+    """
+    if not search_supported():
+        return None
+
+    tokens = _tokens(query)
+    if not tokens:
+        return db.select(
+            db.literal(None).label('recipe_id'), db.literal(0.0).label('score')
+        ).where(db.false()).subquery()
+
+    table = _search_table()
+    if _dialect() == 'mysql':
+        score = match(table.c.title, table.c.body, against=' '.join(tokens)).in_natural_language_mode()
+        return (
+            db.select(table.c.recipe_id.label('recipe_id'), score.label('score'))
+            .where(score > 0)
+            .subquery()
+        )
+
+    # FTS5: каждое слово как префикс, bm25() меньше для более релевантных строк
+    fts_query = ' '.join(f'"{token}"*' for token in tokens)
+    fts = db.literal_column(SEARCH_TABLE)
+    return (
+        db.select(table.c.rowid.label('recipe_id'), (-db.func.bm25(fts)).label('score'))
+        .where(fts.op('MATCH')(fts_query))
+        .subquery()
+    )
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Пакетная загрузка рецептов из JSON Lines (NDJSON) или CSV.
+
+Файл читается потоково, рецепты записываются пакетами (--batch-size):
+на каждый пакет - одна транзакция и несколько многострочных INSERT, поэтому
+память и число запросов не зависят от размера файла. Загрузка идемпотентна:
+рецепт с тем же автором и названием повторно не добавляется, а с --update
+обновляется (поля рецепта и ингредиенты). Формат записи описан в transfer.py,
+его же выдает export_recipes.py.
+
+В CSV те же поля - столбцы; ingredients, comments и ratings - JSON-массивы в ячейке.
+Автор и категория ищутся по email и названию, недостающие категории и
+ингредиенты создаются. Если автор не указан, используется --author.
+
+С --checkpoint после каждого пакета в файл записывается число загруженных
+записей; повторный запуск с тем же файлом продолжает с места остановки.
+
+Запуск:
+    python seed.py seed_data/recipes.jsonl data/export.csv --batch-size 2000
+    python seed.py export.ndjson --update --checkpoint export.ndjson.checkpoint
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from app import app
+from transfer import DEFAULT_BATCH_SIZE, RecipeLoader, read_records
+
+
+def _read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_checkpoint(path, state):
+    # Запись через временный файл: прерывание не оставит его наполовину записанным
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_files(paths, batch_size=DEFAULT_BATCH_SIZE, default_author=None, update_existing=False,
+               checkpoint=None):
+    """
+    Загружает файлы по очереди; вызывается внутри контекста приложения.
+    checkpoint - путь к файлу контрольных точек {путь к данным: загружено записей}.
+    """
+    loader = RecipeLoader(batch_size=batch_size, default_author=default_author,
+                          update_existing=update_existing)
+    state = _read_checkpoint(checkpoint)
+    for path in paths:
+        done = state.get(path, 0)
+        loader.committed = done
+
+        def save(committed, path=path):
+            state[path] = committed
+            if checkpoint:
+                _write_checkpoint(checkpoint, state)
+
+        loader.load(islice(read_records(path), done, None), on_batch=save)
+    return loader.stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Пакетная загрузка рецептов из JSON Lines/CSV')
+    parser.add_argument('paths', nargs='+', help='файлы .jsonl/.ndjson или .csv')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--author', help='email автора для записей без поля author')
+    parser.add_argument('--update', action='store_true', help='обновлять уже загруженные рецепты')
+    parser.add_argument('--checkpoint', help='файл контрольных точек для продолжения загрузки')
+    args = parser.parse_args()
+
+    for path in args.paths:
+        if not os.path.exists(path):
+            print(f"Файл не найден: {path}")
+            sys.exit(1)
+
+    started = time.perf_counter()
+    with app.app_context():
+        try:
+            stats = load_files(args.paths, args.batch_size, args.author, args.update, args.checkpoint)
+        except (ValueError, KeyError) as e:
+            print(f"Ошибка загрузки: {e}")
+            if args.checkpoint:
+                print(f"Загруженные пакеты сохранены в {args.checkpoint}, повторный запуск продолжит загрузку")
+            sys.exit(1)
+    print(f"Добавлено рецептов: {stats['recipes']}, обновлено: {stats['updated']}, "
+          f"пропущено (уже есть): {stats['skipped']}")
+    print(f"Ингредиентов в рецептах: {stats['ingredients']}, комментариев: {stats['comments']}, "
+          f"оценок: {stats['ratings']}")
+    print(f"Готово за {time.perf_counter() - started:.1f} с")
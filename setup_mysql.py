@@ -9,7 +9,6 @@ import sys
 import pymysql
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
 from datetime import datetime
 
 def setup_mysql_database():
@@ -139,10 +138,10 @@ def create_test_data():
     
     # Инициализируем расширения
     db = SQLAlchemy(app)
-    bcrypt = Bcrypt(app)
     
     # Импортируем модели
     from models import User, Category, Recipe, Ingredient, RecipeIngredient, Comment, Rating
+    from passwords import hash_password
     
     with app.app_context():
         try:
@@ -152,7 +151,7 @@ def create_test_data():
                 return True
             
             # Создаем тестового пользователя
-            hashed_password = bcrypt.generate_password_hash('password123').decode('utf-8')
+            hashed_password = hash_password('password123')
             test_user = User(
                 username='testuser',
                 email='test@example.com',
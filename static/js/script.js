@@ -348,6 +348,115 @@ function initComponents() {
     
     // Инициализация аккордеонов
     initAccordions();
+    
+    // Избранное без перезагрузки страницы
+    initFavoriteForms();
+    
+    // Подгрузка комментариев
+    initLoadMoreComments();
+}
+
+// «Показать еще» под комментариями: следующая страница добавляется в список
+function initLoadMoreComments() {
+    const link = document.querySelector('.load-more-comments');
+    const list = document.querySelector('.comments-list');
+    if (!link || !list) {
+        return;
+    }
+    
+    link.addEventListener('click', function(e) {
+        e.preventDefault();
+        if (link.classList.contains('loading')) {
+            return;
+        }
+        link.classList.add('loading');
+        
+        fetch(`${link.dataset.url}?after=${encodeURIComponent(link.dataset.cursor)}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    showError('Не удалось загрузить комментарии');
+                    return;
+                }
+                list.insertAdjacentHTML('beforeend', data.html);
+                if (data.next_cursor) {
+                    link.dataset.cursor = data.next_cursor;
+                    link.href = link.href.replace(/comments_after=[^&#]*/, `comments_after=${encodeURIComponent(data.next_cursor)}`);
+                } else {
+                    link.parentElement.remove();
+                }
+            })
+            .catch(error => {
+                console.error('Ошибка:', error);
+                showError('Произошла ошибка при загрузке комментариев');
+            })
+            .finally(() => {
+                link.classList.remove('loading');
+            });
+    });
+}
+
+// Избранное: формы добавления/удаления отправляются через /toggle_favorite.
+// В запросе передается нужное состояние, поэтому повторный клик не переключает его обратно
+function initFavoriteForms() {
+    document.querySelectorAll('.favorite-form').forEach(form => {
+        form.addEventListener('submit', function(e) {
+            e.preventDefault();
+            if (form.dataset.confirm && !confirm(form.dataset.confirm)) {
+                return;
+            }
+            
+            const button = form.querySelector('button');
+            const favorite = form.dataset.favorite !== '1';
+            button.disabled = true;
+            
+            fetch(`/toggle_favorite/${form.dataset.recipeId}`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ favorite: favorite })
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    showError('Не удалось обновить избранное: ' + data.message);
+                    return;
+                }
+                if (!data.favorite && form.dataset.removeCard) {
+                    const card = form.closest('.recipe-card');
+                    if (card) {
+                        card.remove();
+                    }
+                    return;
+                }
+                updateFavoriteForm(form, data.favorite);
+            })
+            .catch(error => {
+                console.error('Ошибка:', error);
+                showError('Произошла ошибка при обновлении избранного');
+            })
+            .finally(() => {
+                button.disabled = false;
+            });
+        });
+    });
+}
+
+// Кнопка избранного в соответствии с состоянием
+function updateFavoriteForm(form, favorite) {
+    const button = form.querySelector('button');
+    const icon = button.querySelector('i');
+    const label = button.querySelector('.favorite-label');
+    
+    form.dataset.favorite = favorite ? '1' : '0';
+    form.action = `/${favorite ? 'remove_favorite' : 'add_favorite'}/${form.dataset.recipeId}`;
+    button.classList.toggle('btn-primary', !favorite);
+    button.classList.toggle('btn-outline', favorite);
+    icon.className = `fas ${favorite ? 'fa-heart-broken' : 'fa-heart'}`;
+    if (label) {
+        label.textContent = favorite ? 'Удалить из избранного' : 'Добавить в избранное';
+    }
 }
 
 // Звездный рейтинг
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Статические файлы с отпечатком содержимого и предварительным сжатием.
+
+url_for('static', filename=...) добавляет к адресу ?v=<хеш содержимого>.
+Ответ на адрес с актуальным хешем кэшируется на год (public, immutable):
+после изменения файла у него будет другой адрес, поэтому браузер не
+переспрашивает сервер на каждой странице. Без хеша или со старым хешем
+файл отдается как обычно (с проверкой по ETag).
+
+Текстовые файлы (CSS, JS, SVG и т.п.) заранее сжимаются gzip и, если
+установлен пакет brotli, br в STATIC_PRECOMPRESSED_FOLDER (по умолчанию
+instance/static): при запуске приложения (STATIC_PRECOMPRESS) или скриптом
+compress_static.py. Вариант выбирается по Accept-Encoding запроса.
+
+Загрузки пользователей (static/uploads) обслуживаются без изменений.
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import tempfile
+from collections import namedtuple
+
+from flask import current_app, request, send_file, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него отдается только gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.xml', '.ico')
+# Выигрыш от сжатия файлов меньше этого размера не окупает лишний файл
+MIN_COMPRESS_SIZE = 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Кодировки в порядке предпочтения: (Content-Encoding, расширение файла)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Версия файла запоминается вместе с mtime и размером: измененный файл
+# получает новый хеш без перезапуска
+Asset = namedtuple('Asset', 'mtime size version')
+
+
+class StaticAssets:
+    """Отпечатки и сжатые варианты статических файлов; подключается через init_app"""
+
+    def __init__(self, app=None):
+        self.static_folder = None
+        self.output_folder = None
+        self.excluded = ('uploads/',)
+        self._assets = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.output_folder = app.config.get('STATIC_PRECOMPRESSED_FOLDER') or \
+            os.path.join(app.instance_path, 'static')
+        self.excluded = tuple(app.config.get('STATIC_FINGERPRINT_EXCLUDE', self.excluded))
+        app.url_defaults(self._add_version)
+        app.view_functions['static'] = self.send_static_file
+        if app.config.get('STATIC_PRECOMPRESS', True):
+            self.precompress_all()
+
+    def is_fingerprinted(self, filename):
+        return not filename.replace('\\', '/').startswith(self.excluded)
+
+    def version(self, filename):
+        """Хеш содержимого файла или None, если файла нет"""
+        path = safe_join(self.static_folder, filename)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        asset = self._assets.get(filename)
+        if asset is None or (asset.mtime, asset.size) != (stat.st_mtime_ns, stat.st_size):
+            with open(path, 'rb') as f:
+                version = hashlib.blake2b(f.read(), digest_size=6).hexdigest()
+            asset = self._assets[filename] = Asset(stat.st_mtime_ns, stat.st_size, version)
+        return asset.version
+
+    def _add_version(self, endpoint, values):
+        if endpoint != 'static' or 'v' in values:
+            return
+        filename = values.get('filename')
+        if filename and self.is_fingerprinted(filename):
+            version = self.version(filename)
+            if version:
+                values['v'] = version
+
+    def _compressed_path(self, filename, version, suffix):
+        return os.path.join(self.output_folder, f"{filename}.{version}{suffix}")
+
+    def send_static_file(self, filename):
+        """Замена стандартного обработчика static: кэширование и сжатые варианты"""
+        version = self.version(filename) if self.is_fingerprinted(filename) else None
+        if version is None:
+            return send_from_directory(self.static_folder, filename,
+                                       max_age=current_app.get_send_file_max_age(filename))
+
+        immutable = request.args.get('v') == version
+        max_age = IMMUTABLE_MAX_AGE if immutable else current_app.get_send_file_max_age(filename)
+        compressible = filename.lower().endswith(COMPRESSIBLE_EXTENSIONS)
+
+        response = None
+        if compressible:
+            for encoding, suffix in ENCODINGS:
+                if not request.accept_encodings[encoding]:
+                    continue
+                path = self._compressed_path(filename, version, suffix)
+                if os.path.isfile(path):
+                    # Тип содержимого - исходного файла, а не архива
+                    response = send_file(path, mimetype=_mimetype(filename), max_age=max_age)
+                    response.headers['Content-Encoding'] = encoding
+                    break
+        if response is None:
+            response = send_from_directory(self.static_folder, filename, max_age=max_age)
+
+        if compressible:
+            response.vary.add('Accept-Encoding')
+        if immutable:
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        return response
+
+    def precompress(self, filename):
+        """
+        Создает сжатые варианты файла, если их еще нет, и удаляет варианты
+        прежних версий. Возвращает список созданных кодировок.
+        """
+        version = self.version(filename)
+        if version is None:
+            return []
+        with open(os.path.join(self.static_folder, filename), 'rb') as f:
+            data = f.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return []
+
+        created = []
+        for encoding, suffix in ENCODINGS:
+            path = self._compressed_path(filename, version, suffix)
+            if os.path.exists(path):
+                continue
+            if encoding == 'br':
+                if brotli is None:
+                    continue
+                compressed = brotli.compress(data, quality=11)
+            else:
+                # mtime=0: одинаковое содержимое дает одинаковый архив
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) >= len(data):
+                continue
+            _write_atomic(path, compressed)
+            created.append(encoding)
+
+        self._remove_stale(filename, version)
+        return created
+
+    def precompress_all(self):
+        """Сжимает все подходящие файлы static; возвращает {файл: [кодировки]}"""
+        result = {}
+        for root, dirs, files in os.walk(self.static_folder):
+            prefix = os.path.relpath(root, self.static_folder).replace(os.sep, '/') + '/'
+            if prefix == './':
+                prefix = ''
+            # Каталоги загрузок не обходятся
+            dirs[:] = sorted(name for name in dirs if self.is_fingerprinted(prefix + name + '/'))
+            for name in sorted(files):
+                filename = prefix + name
+                if not name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                    continue
+                try:
+                    created = self.precompress(filename)
+                except OSError:
+                    logger.exception("Не удалось сжать %s", filename)
+                    continue
+                if created:
+                    result[filename] = created
+        return result
+
+    def _remove_stale(self, filename, version):
+        folder, name = os.path.split(self._compressed_path(filename, version, ''))
+        prefix = os.path.basename(filename) + '.'
+        try:
+            entries = os.listdir(folder)
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.startswith(prefix) and not entry.startswith(name) \
+                    and entry.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+                try:
+                    os.remove(os.path.join(folder, entry))
+                except OSError:
+                    pass
+
+
+def _mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def _write_atomic(path, data):
+    # Несколько процессов могут сжимать одновременно: файл появляется целиком
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+static_assets = StaticAssets()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Общие фикстуры тестов: приложение на SQLite в памяти.
+
+Настройки окружения задаются до импорта app: config.py читает их при импорте.
+Пароли хешируются в потоке запроса, агрегаты оценок пересчитываются сразу,
+статические файлы не сжимаются при запуске.
+"""
+
+import os
+
+os.environ['FLASK_ENV'] = 'development'
+os.environ['DEV_DATABASE_URL'] = 'sqlite://'
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+os.environ['RATING_FLUSH_INTERVAL_MS'] = '0'
+os.environ['STATIC_PRECOMPRESS'] = '0'
+os.environ['CACHE_TYPE'] = 'lru'
+os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+
+import pytest
+from sqlalchemy import text
+
+from app import app as flask_app, db, fragment_cache
+from categories import category_cache
+from search import SEARCH_TABLE, ensure_search_index
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Приложение с пустой базой и отдельной папкой загрузок для каждого теста"""
+    flask_app.config.update(TESTING=True, UPLOAD_FOLDER=str(tmp_path))
+    with flask_app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.session.execute(text(f"DROP TABLE IF EXISTS {SEARCH_TABLE}"))
+        db.session.commit()
+        db.create_all()
+        ensure_search_index()
+    fragment_cache.clear()
+    category_cache.invalidate()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Создание тестовых данных и вход пользователя без формы логина"""
+
+from models import db, User, Recipe, Comment, Rating, Favorite
+
+
+def create_user(username='user', password='x'):
+    user = User(username=username, email=f'{username}@example.com', password=password)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def create_recipe(user, title='Рецепт', **values):
+    recipe = Recipe(title=title, instructions='Смешать', user_id=user.id, **values)
+    db.session.add(recipe)
+    db.session.commit()
+    return recipe
+
+
+def add_activity(recipe, users):
+    """Комментарий, оценка и избранное от каждого пользователя (счетчики рецепта тоже)"""
+    for user in users:
+        db.session.add_all([
+            Comment(recipe_id=recipe.id, user_id=user.id, content=f'Комментарий {user.username}'),
+            Rating(recipe_id=recipe.id, user_id=user.id, rating=4),
+            Favorite(recipe_id=recipe.id, user_id=user.id),
+        ])
+    recipe.comment_count += len(users)
+    recipe.favorite_count += len(users)
+    recipe.rating_sum += 4 * len(users)
+    recipe.rating_count += len(users)
+    db.session.commit()
+
+
+def login(client, user):
+    with client.session_transaction() as session:
+        session['user_id'] = user.id
+        session['username'] = user.username
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Страницы комментариев: одинаковое время создания, курсоры, ссылка без JavaScript"""
+
+import base64
+import re
+from datetime import datetime
+
+from models import db, Comment
+from tests.helpers import create_user, create_recipe
+
+COMMENTS = 25
+CREATED_AT = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def _setup(app):
+    with app.app_context():
+        user = create_user()
+        recipe = create_recipe(user)
+        # Все комментарии в одну секунду: порядок задает только id
+        db.session.add_all(
+            Comment(recipe_id=recipe.id, user_id=user.id, content=f'Комментарий №{i}', created_at=CREATED_AT)
+            for i in range(COMMENTS)
+        )
+        recipe.comment_count = COMMENTS
+        db.session.commit()
+        return recipe.id
+
+
+def _numbers(html):
+    return [int(number) for number in re.findall(r'Комментарий №(\d+)', html)]
+
+
+def _cursor(raw):
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def test_tied_created_at_pages_have_no_gaps_or_duplicates(app, client):
+    recipe_id = _setup(app)
+    per_page = app.config['COMMENTS_PER_PAGE']
+
+    seen = []
+    after = None
+    while True:
+        data = client.get(f'/recipe/{recipe_id}/comments', query_string={'after': after} if after else {}).get_json()
+        assert data['success']
+        numbers = _numbers(data['html'])
+        assert 0 < len(numbers) <= per_page
+        seen += numbers
+        after = data['next_cursor']
+        if after is None:
+            break
+
+    # Новые первыми: при равном времени - по убыванию id
+    assert seen == list(reversed(range(COMMENTS)))
+
+
+def test_malformed_cursor_is_bad_request(app, client):
+    recipe_id = _setup(app)
+    for after in ('not-a-cursor', _cursor('x1|1'), _cursor('f1.0|' + '9' * 30), _cursor('fnan|1')):
+        response = client.get(f'/recipe/{recipe_id}/comments', query_string={'after': after})
+        assert response.status_code == 400, after
+        assert response.get_json()['success'] is False
+
+    response = client.get(f'/recipe/{recipe_id}', query_string={'comments_after': 'not-a-cursor'})
+    assert response.status_code == 400
+
+
+def test_comments_after_link_without_javascript(app, client):
+    recipe_id = _setup(app)
+    per_page = app.config['COMMENTS_PER_PAGE']
+
+    page = client.get(f'/recipe/{recipe_id}').get_data(as_text=True)
+    assert _numbers(page) == list(reversed(range(COMMENTS - per_page, COMMENTS)))
+    link = re.search(r'href="([^"]*comments_after=[^"#]*)', page).group(1).replace('&amp;', '&')
+
+    page = client.get(link).get_data(as_text=True)
+    assert _numbers(page) == list(reversed(range(COMMENTS - 2 * per_page, COMMENTS - per_page)))
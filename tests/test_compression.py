@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Сжатие ответов: выбор кодировки, пропускаемые ответы, ETag и потоковые тела"""
+
+import gzip
+import json
+from types import SimpleNamespace
+
+from werkzeug.test import Client
+
+from compression import CompressionMiddleware
+from tests.helpers import create_user, create_recipe, login
+
+BODY = b'<p>' + b'sweet ' * 200 + b'</p>'
+
+
+def _app(body=BODY, status='200 OK', mimetype='text/html', **headers):
+    def app(environ, start_response):
+        response_headers = [('Content-Type', f'{mimetype}; charset=utf-8'),
+                            ('Content-Length', str(len(body)))]
+        response_headers += [(name.replace('_', '-'), value) for name, value in headers.items()]
+        start_response(status, response_headers)
+        return [body]
+    return app
+
+
+def _get(app, accept='gzip', method='GET', **kwargs):
+    client = Client(CompressionMiddleware(app, min_size=100))
+    return client.open('/', method=method, headers={'Accept-Encoding': accept}, **kwargs)
+
+
+def test_gzip_when_accepted():
+    response = _get(_app())
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.get_data()) == BODY
+
+
+def test_negotiation():
+    middleware = CompressionMiddleware(None)
+    assert middleware.negotiate('gzip, deflate') == 'gzip'
+    assert middleware.negotiate('*') == middleware.encodings[0]
+    assert middleware.negotiate('gzip;q=0') is None
+    assert middleware.negotiate('identity') is None
+    assert middleware.negotiate('') is None
+
+
+def test_uncompressed_responses():
+    cases = [
+        _get(_app(), accept='gzip;q=0'),
+        _get(_app(b'{}', mimetype='application/json')),
+        _get(_app(mimetype='image/png')),
+        _get(_app(Cache_Control='public, no-transform')),
+        # Заранее сжатая статика
+        _get(_app(Content_Encoding='br')),
+    ]
+    for response in cases:
+        assert response.headers.get('Content-Encoding') != 'gzip'
+        assert response.get_data() in (BODY, b'{}')
+
+    head = _get(_app(), method='HEAD')
+    assert 'Content-Encoding' not in head.headers
+    assert head.headers['Content-Length'] == str(len(BODY))
+    not_modified = _get(_app(b'', status='304 Not Modified'))
+    assert 'Content-Encoding' not in not_modified.headers
+
+
+def test_strong_etag_becomes_weak_and_vary_is_merged():
+    response = _get(_app(ETag='"abc"', Vary='Cookie'))
+    assert response.headers['ETag'] == 'W/"abc"'
+    assert response.headers['Vary'] == 'Cookie, Accept-Encoding'
+
+    response = _get(_app(ETag='W/"abc"'))
+    assert response.headers['ETag'] == 'W/"abc"'
+
+
+def test_lazy_start_response():
+    # Генератор вызывает start_response только при первой итерации
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        yield BODY
+
+    response = _get(app)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == BODY
+
+
+def test_stream_is_compressed_in_chunks_and_closed():
+    closed = []
+
+    class Stream:
+        def __iter__(self):
+            return iter([b'{"n": %d}\n' % i for i in range(100)])
+
+        def close(self):
+            closed.append(True)
+
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'application/x-ndjson')])
+        return Stream()
+
+    headers = {}
+    body = CompressionMiddleware(app, min_size=100)(
+        {'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT_ENCODING': 'gzip'},
+        lambda status, response_headers, exc_info=None: headers.update(response_headers)
+    )
+    chunks = list(body)
+    body.close()
+
+    assert headers['Content-Encoding'] == 'gzip'
+    assert len(chunks) > 1
+    assert gzip.decompress(b''.join(chunks)).count(b'\n') == 100
+    assert closed == [True]
+
+
+def test_short_stream_is_not_compressed():
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'application/x-ndjson')])
+        return iter([b'{"n": 1}\n'])
+
+    response = _get(app)
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == b'{"n": 1}\n'
+
+
+def test_recipe_export_is_streamed_compressed(app, client):
+    with app.app_context():
+        user = create_user()
+        for i in range(20):
+            create_recipe(user, title=f'Рецепт {i}', description='Описание ' * 10)
+        login(client, SimpleNamespace(id=user.id, username=user.username))
+
+    response = client.get('/api/recipes/export', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'application/x-ndjson'
+    lines = gzip.decompress(response.get_data()).decode('utf-8').splitlines()
+    assert [json.loads(line)['title'] for line in lines] == [f'Рецепт {i}' for i in range(20)]
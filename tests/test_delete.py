@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Удаление рецептов: связанные строки удаляет каскад внешних ключей"""
+
+from types import SimpleNamespace
+
+from sqlalchemy import text
+
+from app import delete_recipes
+from models import db, Comment, Favorite, Ingredient, Rating, Recipe, RecipeIngredient
+from search import SEARCH_TABLE, index_recipe
+from tests.helpers import create_user, create_recipe, add_activity, login
+
+CHILDREN = (RecipeIngredient, Comment, Rating, Favorite)
+
+
+def _with_children(owner, users, title):
+    recipe = create_recipe(owner, title=title)
+    ingredient = Ingredient(name=f'Мука для {title}', unit='г')
+    db.session.add(ingredient)
+    db.session.flush()
+    db.session.add(RecipeIngredient(recipe_id=recipe.id, ingredient_id=ingredient.id, quantity=200))
+    add_activity(recipe, users)
+    index_recipe(recipe)
+    db.session.commit()
+    return recipe
+
+
+def _child_counts(recipe_id):
+    counts = [
+        db.session.scalar(db.select(db.func.count()).select_from(model).where(model.recipe_id == recipe_id))
+        for model in CHILDREN
+    ]
+    counts.append(db.session.scalar(
+        text(f"SELECT count(*) FROM {SEARCH_TABLE} WHERE rowid = :id"), {'id': recipe_id}
+    ))
+    return counts
+
+
+def test_delete_recipe_removes_related_rows(app, client):
+    with app.app_context():
+        owner = create_user('owner')
+        users = [create_user(f'user{i}') for i in range(2)]
+        deleted_id = _with_children(owner, users, 'Торт').id
+        kept = _with_children(owner, users, 'Пирог')
+        kept_id, kept_counters = kept.id, (kept.comment_count, kept.favorite_count, kept.rating_count)
+        owner = SimpleNamespace(id=owner.id, username=owner.username)
+
+    login(client, owner)
+    assert client.post(f'/delete_recipe/{deleted_id}').get_json()['success']
+
+    with app.app_context():
+        # Каскад в SQLite работает только с включенной проверкой внешних ключей
+        assert db.session.scalar(text('PRAGMA foreign_keys')) == 1
+        assert db.session.get(Recipe, deleted_id) is None
+        assert _child_counts(deleted_id) == [0] * 5
+        assert _child_counts(kept_id) == [1, 2, 2, 2, 1]
+        kept = db.session.get(Recipe, kept_id)
+        assert (kept.comment_count, kept.favorite_count, kept.rating_count) == kept_counters
+        # Ингредиенты - общий справочник, они остаются
+        assert db.session.scalar(db.select(db.func.count(Ingredient.id))) == 2
+
+
+def test_delete_recipe_of_another_user_is_refused(app, client):
+    with app.app_context():
+        owner = create_user('owner')
+        other = create_user('other')
+        recipe_id = _with_children(owner, [other], 'Торт').id
+        other = SimpleNamespace(id=other.id, username=other.username)
+
+    login(client, other)
+    assert client.post(f'/delete_recipe/{recipe_id}').get_json()['success'] is False
+    with app.app_context():
+        assert _child_counts(recipe_id) == [1, 1, 1, 1, 1]
+
+
+def test_delete_recipes_in_chunks(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'RECIPE_DELETE_CHUNK_SIZE', 2)
+    with app.app_context():
+        owner = create_user('owner')
+        other = create_user('other')
+        ids = [_with_children(owner, [other], f'Торт {i}').id for i in range(5)]
+        kept_id = _with_children(other, [owner], 'Пирог').id
+
+        assert delete_recipes(Recipe.user_id == owner.id) == 5
+        remaining = db.session.execute(db.select(Recipe.id)).scalars().all()
+        assert remaining == [kept_id]
+        for recipe_id in ids:
+            assert _child_counts(recipe_id) == [0] * 5
+        assert _child_counts(kept_id) == [1, 1, 1, 1, 1]
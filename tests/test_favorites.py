@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Избранное: повторные запросы и несуществующий рецепт"""
+
+from types import SimpleNamespace
+
+from models import db, Favorite, Recipe
+from tests.helpers import create_user, create_recipe, login
+
+
+def _setup(app, client):
+    with app.app_context():
+        user = create_user()
+        recipe_id = create_recipe(user).id
+        login(client, SimpleNamespace(id=user.id, username=user.username))
+    return recipe_id
+
+
+def _state(app, recipe_id):
+    with app.app_context():
+        return (db.session.get(Recipe, recipe_id).favorite_count,
+                db.session.scalar(db.select(db.func.count(Favorite.id))))
+
+
+def test_set_favorite_is_idempotent(app, client):
+    recipe_id = _setup(app, client)
+    for _ in range(2):
+        response = client.post(f'/toggle_favorite/{recipe_id}', json={'favorite': True})
+        assert response.get_json() == {'success': True, 'favorite': True}
+    assert _state(app, recipe_id) == (1, 1)
+
+    # Переключение без тела снимает отметку
+    response = client.post(f'/toggle_favorite/{recipe_id}')
+    assert response.get_json() == {'success': True, 'favorite': False}
+    assert _state(app, recipe_id) == (0, 0)
+
+
+def test_missing_recipe_is_not_found(app, client):
+    recipe_id = _setup(app, client)
+    missing = recipe_id + 100
+
+    response = client.post(f'/toggle_favorite/{missing}', json={'favorite': True})
+    assert response.status_code == 404
+    assert response.get_json()['success'] is False
+
+    response = client.post(f'/toggle_favorite/{missing}')
+    assert response.status_code == 404
+
+    assert client.post(f'/add_favorite/{missing}').status_code == 404
+    assert _state(app, recipe_id) == (0, 0)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Кэш фрагментов: ключи меняются вместе с данными, которые показывает фрагмент"""
+
+from types import SimpleNamespace
+
+from models import db, Category, Comment, Recipe
+from tests.helpers import create_user, create_recipe, login
+
+
+def _setup(app):
+    with app.app_context():
+        author = create_user('marzipan')
+        category = Category(name='Торты')
+        db.session.add(category)
+        db.session.commit()
+        recipe = create_recipe(author, category_id=category.id)
+        db.session.add(Comment(recipe_id=recipe.id, user_id=author.id, content='Вкусно'))
+        recipe.comment_count = 1
+        db.session.commit()
+        return SimpleNamespace(id=author.id, username=author.username), category.id, recipe.id
+
+
+def test_card_follows_counters_with_same_updated_at(app, client):
+    _, _, recipe_id = _setup(app)
+    assert 'Нет оценок' in client.get('/recipes').get_data(as_text=True)
+
+    with app.app_context():
+        # Голос в ту же секунду: updated_at (в MySQL - с точностью до секунды) прежний
+        db.session.execute(
+            db.update(Recipe).where(Recipe.id == recipe_id)
+            .values(rating_sum=5, rating_count=1, updated_at=Recipe.updated_at)
+        )
+        db.session.commit()
+    page = client.get('/recipes').get_data(as_text=True)
+    assert 'Нет оценок' not in page
+    assert '5.0 (1)' in page
+
+
+def test_card_follows_category_name(app, client):
+    _, category_id, _ = _setup(app)
+    assert 'Торты' in client.get('/recipes').get_data(as_text=True)
+
+    with app.app_context():
+        db.session.get(Category, category_id).name = 'Пироги'
+        db.session.commit()
+    page = client.get('/recipes').get_data(as_text=True)
+    assert 'Пироги' in page
+    assert 'Торты' not in page
+
+
+def test_rename_updates_cards_and_comments(app, client):
+    author, _, recipe_id = _setup(app)
+    login(client, author)
+    assert 'marzipan' in client.get('/recipes').get_data(as_text=True)
+    assert 'marzipan' in client.get(f'/recipe/{recipe_id}').get_data(as_text=True)
+
+    response = client.post('/account', data={'username': 'baker', 'email': 'baker@example.com'})
+    assert response.status_code == 302
+
+    card = client.get('/recipes').get_data(as_text=True)
+    detail = client.get(f'/recipe/{recipe_id}').get_data(as_text=True)
+    assert 'marzipan' not in card
+    assert 'baker' in card
+    # Имя в кэшированном фрагменте комментариев тоже новое
+    assert 'marzipan' not in detail
+    assert detail.count('baker') >= 2
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Условные GET: 304 только пока содержимое страницы не изменилось"""
+
+from types import SimpleNamespace
+
+from PIL import Image
+
+from images import process_image
+from models import db
+from tests.helpers import create_user, create_recipe, add_activity, login
+
+
+def _revalidate(client, path, response):
+    return client.get(path, headers={'If-None-Match': response.headers['ETag']})
+
+
+def _detail(app, commenter='commenter'):
+    with app.app_context():
+        author = create_user('author')
+        users = [create_user(commenter), create_user('fan')]
+        recipe = create_recipe(author)
+        add_activity(recipe, users[:1])
+        return recipe.id, [SimpleNamespace(id=user.id, username=user.username) for user in users]
+
+
+def test_detail_revalidates_to_304(app, client):
+    recipe_id, _ = _detail(app)
+    path = f'/recipe/{recipe_id}'
+
+    response = client.get(path)
+    assert response.status_code == 200
+    assert _revalidate(client, path, response).status_code == 304
+
+
+def test_detail_has_no_last_modified(app, client):
+    recipe_id, _ = _detail(app)
+    path = f'/recipe/{recipe_id}'
+
+    response = client.get(path)
+    assert 'Last-Modified' not in response.headers
+    # Дата не подтверждает актуальность: избранное не меняет updated_at
+    response = client.get(path, headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+    assert response.status_code == 200
+
+
+def test_detail_changes_after_favorite(app, client):
+    recipe_id, (_, fan) = _detail(app)
+    path = f'/recipe/{recipe_id}'
+    cached = client.get(path)
+
+    member = app.test_client()
+    login(member, fan)
+    assert member.post(f'/toggle_favorite/{recipe_id}', json={'favorite': True}).status_code == 200
+
+    assert _revalidate(client, path, cached).status_code == 200
+
+
+def test_detail_changes_after_commenter_rename(app, client):
+    recipe_id, (commenter, _) = _detail(app, commenter='marzipan')
+    path = f'/recipe/{recipe_id}'
+    cached = client.get(path)
+    assert 'marzipan' in cached.get_data(as_text=True)
+
+    member = app.test_client()
+    login(member, commenter)
+    member.post('/account', data={'username': 'nougat', 'email': 'marzipan@example.com'})
+
+    response = _revalidate(client, path, cached)
+    assert response.status_code == 200
+    assert 'nougat' in response.get_data(as_text=True)
+
+
+def test_catalog_changes_when_image_variants_are_ready(app, client):
+    with app.app_context():
+        author = create_user('author')
+        create_recipe(author, image_path='http-cache-cake.png')
+    Image.new('RGB', (300, 200), 'red').save(f"{app.config['UPLOAD_FOLDER']}/http-cache-cake.png")
+
+    cached = client.get('/recipes')
+    assert _revalidate(client, '/recipes', cached).status_code == 304
+
+    process_image(app.config['UPLOAD_FOLDER'], 'http-cache-cake.png',
+                  app.config['IMAGE_VARIANT_WIDTHS'], app.config['IMAGE_QUALITY'])
+
+    response = _revalidate(client, '/recipes', cached)
+    assert response.status_code == 200
+    # Карточка из кэша фрагментов тоже обновилась: в ней появился srcset
+    assert 'variants/http-cache-cake_' in response.get_data(as_text=True)
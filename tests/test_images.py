@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Обработка загруженных изображений: проверка, метаданные, качество JPEG, кэш вариантов"""
+
+import io
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+import images
+from cache import LRUCache
+from images import image_variants, process_image, save_upload
+
+WIDTHS = (100, 200)
+# Любые байты годятся: профиль не разбирается при сохранении
+ICC_PROFILE = b'\0\0\0\x20fake-icc-profile-for-tests\0\0\0'
+
+
+def _exif(orientation=1):
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'  # Make
+    exif[0x0112] = orientation
+    return exif
+
+
+def test_png_loses_icc_profile_and_exif(tmp_path):
+    Image.new('RGB', (300, 200), 'red').save(
+        tmp_path / 'cake.png', icc_profile=ICC_PROFILE, exif=_exif()
+    )
+    process_image(str(tmp_path), 'cake.png', WIDTHS, 80)
+
+    with Image.open(tmp_path / 'cake.png') as image:
+        assert 'icc_profile' not in image.info
+        assert 'exif' not in image.info
+    assert (tmp_path / 'variants' / 'cake_200.webp').exists()
+
+
+def test_jpeg_keeps_quantization_without_metadata(tmp_path):
+    Image.new('RGB', (300, 200), 'blue').save(
+        tmp_path / 'pie.jpg', quality=95, exif=_exif(), icc_profile=ICC_PROFILE, comment=b'secret'
+    )
+    with Image.open(tmp_path / 'pie.jpg') as image:
+        quantization = image.quantization
+
+    process_image(str(tmp_path), 'pie.jpg', WIDTHS, 80)
+
+    with Image.open(tmp_path / 'pie.jpg') as image:
+        assert image.quantization == quantization
+        for key in ('exif', 'icc_profile', 'comment'):
+            assert key not in image.info
+
+
+def test_rotated_jpeg_is_transposed_with_original_quantization(tmp_path):
+    # Orientation 6: снимок повернут на 90 градусов
+    Image.new('RGB', (300, 200), 'green').save(tmp_path / 'tart.jpg', quality=95, exif=_exif(6))
+    with Image.open(tmp_path / 'tart.jpg') as image:
+        quantization = image.quantization
+
+    process_image(str(tmp_path), 'tart.jpg', WIDTHS, 80)
+
+    with Image.open(tmp_path / 'tart.jpg') as image:
+        assert image.size == (200, 300)
+        assert image.quantization == quantization
+        assert 'exif' not in image.info
+
+
+def test_animated_gif_loses_comment_and_keeps_frames(tmp_path):
+    frames = [Image.new('RGB', (300, 200), color) for color in ('red', 'green', 'blue')]
+    frames[0].save(tmp_path / 'jelly.gif', save_all=True, append_images=frames[1:],
+                   duration=[100, 200, 300], loop=0, comment=b'secret')
+
+    process_image(str(tmp_path), 'jelly.gif', WIDTHS, 80)
+
+    assert b'secret' not in (tmp_path / 'jelly.gif').read_bytes()
+    with Image.open(tmp_path / 'jelly.gif') as image:
+        assert image.n_frames == 3
+        assert image.info['loop'] == 0
+        durations = []
+        for frame in range(image.n_frames):
+            image.seek(frame)
+            durations.append(image.info['duration'])
+    assert durations == [100, 200, 300]
+
+
+def test_decompression_bomb_is_rejected(app, monkeypatch):
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+    data = io.BytesIO()
+    Image.new('RGB', (300, 200)).save(data, 'PNG')
+    data.seek(0)
+
+    with app.test_request_context():
+        assert save_upload(FileStorage(data, filename='bomb.png')) is None
+
+
+def test_variants_cache_is_bounded(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'IMAGE_VARIANT_WIDTHS', WIDTHS)
+    monkeypatch.setattr(images, '_variants_cache', LRUCache(2))
+    names = [f'img{i}.png' for i in range(4)]
+    for name in names:
+        Image.new('RGB', (300, 200)).save(tmp_path / name)
+        process_image(str(tmp_path), name, WIDTHS, 80)
+
+    with app.test_request_context():
+        for name in names:
+            assert [width for width, _, _ in image_variants(name)] == [100, 200]
+    assert list(images._variants_cache._data) == names[-2:]
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Пакетное создание ингредиентов: повторы, регистр и слишком длинные названия"""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import mysql
+
+import bulk
+from bulk import insert_missing, resolve_ingredient_ids
+from models import db, Ingredient, Recipe
+from tests.helpers import create_user, login
+
+
+def _recipe_form(*names):
+    return {
+        'title': 'Пирог', 'description': '', 'instructions': 'Испечь',
+        'prep_time': '10', 'cook_time': '20', 'servings': '4',
+        'ingredient_name[]': list(names),
+        'ingredient_quantity[]': ['1'] * len(names),
+        'ingredient_unit[]': ['г'] * len(names),
+    }
+
+
+def test_resolve_creates_missing_once(app):
+    with app.app_context():
+        db.session.add(Ingredient(name='Мука', unit='г'))
+        db.session.commit()
+
+        ids = resolve_ingredient_ids({'Мука': 'кг', 'Сахар': 'г'})
+        again = resolve_ingredient_ids({'Сахар': 'г'})
+
+        assert again['Сахар'] == ids['Сахар']
+        assert db.session.execute(db.select(db.func.count()).select_from(Ingredient)).scalar() == 2
+
+
+def test_resolve_rejects_name_longer_than_column(app):
+    with app.app_context():
+        with pytest.raises(ValueError, match='длиннее 100'):
+            resolve_ingredient_ids({'я' * 101: 'г'})
+
+
+def test_mysql_insert_does_not_ignore_data_errors(monkeypatch):
+    # INSERT IGNORE сохранил бы обрезанное название вместо ошибки
+    statements = []
+    session = SimpleNamespace(get_bind=lambda: SimpleNamespace(dialect=mysql.dialect()),
+                              execute=statements.append)
+    monkeypatch.setattr(bulk, 'db', SimpleNamespace(session=session))
+    insert_missing(Ingredient, [{'name': 'Мука', 'unit': 'г'}], ['name'])
+
+    sql = str(statements[0].compile(dialect=mysql.dialect()))
+    assert 'IGNORE' not in sql
+    assert 'ON DUPLICATE KEY UPDATE id = ingredients.id' in sql
+
+
+def test_add_recipe_with_too_long_ingredient_is_rejected(app, client):
+    with app.app_context():
+        user = create_user()
+        login(client, SimpleNamespace(id=user.id, username=user.username))
+
+    response = client.post('/add_recipe', data=_recipe_form('Мука', 'я' * 101))
+
+    assert response.status_code == 400
+    assert 'длиннее 100' in response.get_data(as_text=True)
+    with app.app_context():
+        assert db.session.execute(db.select(Recipe)).first() is None
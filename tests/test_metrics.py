@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""/metrics: доступ по токену или адресу и учет необработанных ошибок"""
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import request_metrics
+from metrics import RequestMetrics
+
+OUTSIDE = {'REMOTE_ADDR': '203.0.113.5'}
+
+
+def test_metrics_allowed_from_listed_address(client):
+    # В конфигурации разработки разрешен только локальный адрес
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics', environ_base=OUTSIDE).status_code == 403
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(request_metrics, 'token', 'secret')
+    assert client.get('/metrics', environ_base=OUTSIDE,
+                      headers={'Authorization': 'Bearer secret'}).status_code == 200
+    assert client.get('/metrics', environ_base=OUTSIDE,
+                      headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    assert client.get('/metrics', environ_base=OUTSIDE,
+                      headers={'Authorization': 'Bearer пароль'}).status_code == 403
+
+
+@pytest.fixture
+def failing_app():
+    app = Flask(__name__)
+    metrics = RequestMetrics(app)
+
+    @app.route('/boom')
+    def boom():
+        raise RuntimeError('boom')
+
+    yield app, metrics
+    event.remove(Engine, 'before_cursor_execute', metrics._before_cursor_execute)
+    event.remove(Engine, 'after_cursor_execute', metrics._after_cursor_execute)
+
+
+@pytest.mark.parametrize('propagate', [False, True])
+def test_unhandled_exception_is_counted(failing_app, propagate):
+    app, metrics = failing_app
+    app.config['PROPAGATE_EXCEPTIONS'] = propagate
+    client = app.test_client()
+
+    if propagate:
+        # Отладка: исключение уходит дальше, after_request не вызывается
+        with pytest.raises(RuntimeError):
+            client.get('/boom')
+    else:
+        assert client.get('/boom').status_code == 500
+
+    assert metrics._responses == {('boom', 'GET', 500): 1}
+    assert metrics._endpoints['boom'].count == 1
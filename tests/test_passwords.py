@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Пул bcrypt: ограничение очереди, таймаут и освобождение слотов"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from passwords import PasswordHasher, PasswordHasherBusy, hash_password, hash_rounds
+
+
+@pytest.fixture
+def gate():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def _hasher(max_pending, executor):
+    # Пул потоков вместо процессов: задачи можно придержать событием
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=max_pending, timeout=0.05)
+    hasher._get_executor = lambda: executor
+    return hasher
+
+
+def test_timed_out_job_keeps_slot_until_finished(gate):
+    executor = ThreadPoolExecutor(max_workers=1)
+    hasher = _hasher(1, executor)
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run(gate.wait)
+    # Задача еще выполняется: новая не ставится в очередь
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run(int, 5)
+
+    gate.set()
+    # Единственный поток пула берет следующую задачу после завершения первой
+    executor.submit(int).result()
+    assert hasher._run(int, 5) == 5
+
+
+def test_timed_out_queued_job_is_cancelled(gate):
+    executor = ThreadPoolExecutor(max_workers=1)
+    hasher = _hasher(2, executor)
+    calls = []
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run(gate.wait)
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run(calls.append, 'queued')
+
+    gate.set()
+    executor.shutdown(wait=True)
+    assert calls == []
+    # Оба слота свободны: и после отмены, и после завершения задачи
+    assert hasher._slots.acquire(blocking=False)
+    assert hasher._slots.acquire(blocking=False)
+
+
+def test_process_pool_hashes_and_checks():
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=2, timeout=30)
+    try:
+        password_hash = hasher.hash('secret')
+        assert hasher.check(password_hash, 'secret')
+        assert not hasher.check(password_hash, 'wrong')
+    finally:
+        hasher._get_executor().shutdown()
+
+
+def test_hash_password_matches_pool_check():
+    password_hash = hash_password('secret', rounds=4)
+    assert hash_rounds(password_hash) == 4
+    assert PasswordHasher(rounds=4, workers=0).check(password_hash, 'secret')
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Число запросов к БД на страницах не зависит от объема данных"""
+
+from types import SimpleNamespace
+
+from sqlalchemy import event
+
+from app import fragment_cache
+from models import db, Category, Comment, Ingredient, RecipeIngredient, User
+from tests.helpers import create_user, create_recipe, add_activity, login
+
+PAGES = ('/recipes', '/favorites', '/my_recipes', '/recipe/{detail_id}')
+
+
+def _add_recipes(owner, users, categories, count):
+    """Рецепты владельца с ингредиентами, комментариями, оценками и избранным"""
+    ingredients = db.session.execute(db.select(Ingredient)).scalars().all()
+    recipes = []
+    for i in range(count):
+        recipe = create_recipe(owner, title=f'Рецепт {i}', category_id=categories[i % len(categories)].id)
+        db.session.add_all(
+            RecipeIngredient(recipe_id=recipe.id, ingredient_id=ingredient.id, quantity=100)
+            for ingredient in ingredients
+        )
+        add_activity(recipe, [owner, *users])
+        recipes.append(recipe)
+    return recipes
+
+
+def _statement_counts(app, client, paths):
+    counts = {}
+    with app.app_context():
+        engine = db.engine
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counts[current] += 1
+
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        for current in paths:
+            counts[current] = 0
+            response = client.get(current)
+            assert response.status_code == 200, current
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    return counts
+
+
+def test_page_queries_do_not_grow_with_data(app, client):
+    with app.app_context():
+        owner = create_user('owner')
+        users = [create_user(f'user{i}') for i in range(3)]
+        categories = [Category(name=f'Категория {i}') for i in range(3)]
+        db.session.add_all(categories)
+        db.session.add_all(Ingredient(name=f'Ингредиент {i}', unit='г') for i in range(4))
+        db.session.commit()
+        detail_id = _add_recipes(owner, users, categories, 5)[0].id
+        viewer = SimpleNamespace(id=owner.id, username=owner.username)
+
+    login(client, viewer)
+    paths = [page.format(detail_id=detail_id) for page in PAGES]
+    # Прогрев: кэш категорий и т.п. заполняются до измерения
+    _statement_counts(app, client, paths)
+    fragment_cache.clear()
+    small = _statement_counts(app, client, paths)
+
+    with app.app_context():
+        owner = db.session.get(User, viewer.id)
+        users = db.session.execute(db.select(User).where(User.id != viewer.id)).scalars().all()
+        categories = db.session.execute(db.select(Category)).scalars().all()
+        _add_recipes(owner, users, categories, 45)
+        # У открытого рецепта - несколько страниц комментариев
+        db.session.add_all(
+            Comment(recipe_id=detail_id, user_id=users[i % len(users)].id, content=f'Еще {i}')
+            for i in range(30)
+        )
+        db.session.commit()
+    fragment_cache.clear()
+    large = _statement_counts(app, client, paths)
+
+    assert large == small
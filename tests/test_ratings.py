@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Агрегаты оценок рецепта после сброса буфера"""
+
+from types import SimpleNamespace
+
+import app as app_module
+
+from models import db, Recipe, Rating
+from ratings import RatingAggregator
+from tests.helpers import create_user, create_recipe, login
+
+
+def _aggregates(recipe_id):
+    recipe = db.session.get(Recipe, recipe_id)
+    db.session.refresh(recipe)
+    return recipe.rating_sum, recipe.rating_count
+
+
+def _from_ratings(recipe_id):
+    return db.session.execute(
+        db.select(db.func.coalesce(db.func.sum(Rating.rating), 0), db.func.count(Rating.id))
+        .where(Rating.recipe_id == recipe_id)
+    ).one()
+
+
+def _rate(client, recipe_id, rating):
+    response = client.post('/rate_recipe', json={'recipe_id': recipe_id, 'rating': rating})
+    assert response.get_json()['success']
+    return response.get_json()
+
+
+def test_votes_and_revotes_match_ratings_table(app, client):
+    with app.app_context():
+        users = [create_user(f'user{i}') for i in range(3)]
+        recipe_id = create_recipe(users[0]).id
+        users = [SimpleNamespace(id=user.id, username=user.username) for user in users]
+
+    for user, rating in zip(users, (5, 3, 4)):
+        login(client, user)
+        _rate(client, recipe_id, rating)
+    # Повторный голос меняет сумму, но не число голосов
+    data = _rate(client, recipe_id, 1)
+    assert data['total_ratings'] == 3
+    assert data['average_rating'] == (5 + 3 + 1) / 3
+    _rate(client, recipe_id, 1)
+
+    with app.app_context():
+        assert _aggregates(recipe_id) == (9, 3)
+        assert tuple(_from_ratings(recipe_id)) == (9, 3)
+
+
+def test_concurrent_first_votes_count_once(app, client, monkeypatch):
+    with app.app_context():
+        user = create_user()
+        recipe_id = create_recipe(user).id
+        user = SimpleNamespace(id=user.id, username=user.username)
+    login(client, user)
+
+    # Второй голос того же пользователя приходит, когда первый запрос уже
+    # прочитал прежнюю оценку (ее нет), но еще не записал свою
+    original_upsert = app_module.upsert
+    calls = []
+
+    def racing_upsert(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            with app.test_client() as second:
+                login(second, user)
+                _rate(second, recipe_id, 3)
+        return original_upsert(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, 'upsert', racing_upsert)
+    _rate(client, recipe_id, 5)
+
+    with app.app_context():
+        assert _aggregates(recipe_id) == (5, 1)
+        assert tuple(_from_ratings(recipe_id)) == (5, 1)
+
+
+def test_flush_recomputes_from_ratings(app):
+    aggregator = RatingAggregator()
+    aggregator._app = app
+    aggregator.interval = 60
+    with app.app_context():
+        users = [create_user(f'user{i}') for i in range(2)]
+        # Сохраненные агрегаты разошлись с таблицей ratings
+        first = create_recipe(users[0], rating_sum=10, rating_count=3).id
+        untouched = create_recipe(users[0], rating_sum=7, rating_count=2).id
+        db.session.add_all([
+            Rating(user_id=users[0].id, recipe_id=first, rating=5),
+            Rating(user_id=users[1].id, recipe_id=first, rating=2),
+        ])
+        db.session.commit()
+
+    # Разницы в буфере неверны (два "первых" голоса) - на результат они не влияют
+    aggregator._pending = {first: [9, 3]}
+    assert aggregator.flush() == 1
+    assert aggregator._pending == {}
+    with app.app_context():
+        assert _aggregates(first) == (7, 2)
+        assert _aggregates(untouched) == (7, 2)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Статические файлы: адреса с хешем, кэширование и заранее сжатые варианты"""
+
+import gzip
+
+import pytest
+from flask import Flask, url_for
+
+from static_assets import IMMUTABLE_MAX_AGE, StaticAssets
+
+CSS = 'body { color: #333; }\n' * 200
+
+
+@pytest.fixture
+def site(tmp_path):
+    static = tmp_path / 'static'
+    (static / 'css').mkdir(parents=True)
+    (static / 'uploads').mkdir()
+    (static / 'css' / 'style.css').write_text(CSS)
+    (static / 'uploads' / 'cake.jpg').write_bytes(b'jpg')
+
+    app = Flask(__name__, static_folder=str(static))
+    app.config.update(STATIC_PRECOMPRESS=False, STATIC_PRECOMPRESSED_FOLDER=str(tmp_path / 'compressed'))
+    assets = StaticAssets(app)
+    with app.test_request_context():
+        url = url_for('static', filename='css/style.css')
+    return app, assets, url
+
+
+def test_url_carries_content_hash(site):
+    app, assets, url = site
+    assert url == f"/static/css/style.css?v={assets.version('css/style.css')}"
+    with app.test_request_context():
+        # Загрузки пользователей не получают хеш
+        assert url_for('static', filename='uploads/cake.jpg') == '/static/uploads/cake.jpg'
+
+
+def test_current_hash_is_immutable_plain_url_is_revalidated(site):
+    app, assets, url = site
+    client = app.test_client()
+
+    response = client.get(url)
+    assert response.cache_control.immutable
+    assert response.cache_control.public
+    assert response.cache_control.max_age == IMMUTABLE_MAX_AGE
+
+    for stale in ('/static/css/style.css', '/static/css/style.css?v=old'):
+        response = client.get(stale)
+        assert response.status_code == 200
+        assert not response.cache_control.immutable
+        assert response.cache_control.no_cache
+
+
+def test_changed_file_gets_new_hash(site):
+    app, assets, url = site
+    with open(app.static_folder + '/css/style.css', 'a') as f:
+        f.write('a { color: red; }\n')
+    with app.test_request_context():
+        assert url_for('static', filename='css/style.css') != url
+    assert not app.test_client().get(url).cache_control.immutable
+
+
+def test_precompressed_variant_is_negotiated(site):
+    app, assets, url = site
+    # br создается, только если установлен пакет brotli
+    assert 'gzip' in assets.precompress('css/style.css')
+    client = app.test_client()
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'text/css'
+    assert 'Accept-Encoding' in response.vary
+    assert gzip.decompress(response.get_data()).decode() == CSS
+
+    for accept in ('gzip;q=0', 'identity', ''):
+        response = client.get(url, headers={'Accept-Encoding': accept})
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_data(as_text=True) == CSS
+        assert 'Accept-Encoding' in response.vary
+
+
+def test_head_and_conditional_requests(site):
+    app, assets, url = site
+    assets.precompress('css/style.css')
+    client = app.test_client()
+
+    head = client.head(url, headers={'Accept-Encoding': 'gzip'})
+    assert head.headers['Content-Encoding'] == 'gzip'
+    assert head.get_data() == b''
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    revalidated = client.get(url, headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']
+    })
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b''
+
+
+def test_precompress_skips_small_files_and_removes_stale_variants(site, tmp_path):
+    app, assets, url = site
+    (tmp_path / 'static' / 'css' / 'tiny.css').write_text('a{}')
+    assert assets.precompress('css/tiny.css') == []
+
+    assets.precompress('css/style.css')
+    old = list((tmp_path / 'compressed' / 'css').iterdir())
+    with open(app.static_folder + '/css/style.css', 'a') as f:
+        f.write('p { margin: 0; }\n')
+    assert 'gzip' in assets.precompress('css/style.css')
+
+    version = assets.version('css/style.css')
+    current = list((tmp_path / 'compressed' / 'css').iterdir())
+    assert current and all(f'.{version}.' in path.name for path in current)
+    assert not set(current) & set(old)
+
+
+def test_pages_link_fingerprinted_assets(client):
+    html = client.get('/').get_data(as_text=True)
+    assert '/static/css/style.css?v=' in html
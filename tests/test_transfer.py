@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Загрузка рецептов: путь к изображению из внешних данных и повторные оценки"""
+
+import json
+
+from images import delete_image_files
+from models import db, Rating, Recipe
+from transfer import RecipeLoader
+from tests.helpers import create_user, login
+
+
+def _ndjson(*records):
+    return '\n'.join(json.dumps(record) for record in records).encode('utf-8')
+
+
+def test_http_import_ignores_image_path(app, client, tmp_path):
+    victim = tmp_path.parent / 'victim.txt'
+    victim.write_text('data')
+    with app.app_context():
+        user = create_user()
+        login(client, user)
+
+    response = client.post('/api/recipes/import', data=_ndjson(
+        {'title': 'evil', 'instructions': 'x', 'image_path': str(victim)},
+        {'title': 'evil2', 'instructions': 'x', 'image_path': '../victim.txt'},
+    ))
+    assert response.get_json()['success']
+
+    with app.app_context():
+        recipes = db.session.execute(db.select(Recipe)).scalars().all()
+        assert [recipe.image_path for recipe in recipes] == [None, None]
+        delete_ids = [recipe.id for recipe in recipes]
+    for recipe_id in delete_ids:
+        assert client.post(f'/delete_recipe/{recipe_id}').get_json()['success']
+    assert victim.exists()
+
+
+def test_loader_accepts_only_existing_upload_names(app, tmp_path):
+    (tmp_path / 'cake_1.jpg').write_bytes(b'jpg')
+    with app.app_context():
+        user = create_user()
+        loader = RecipeLoader(default_author=user.email)
+        loader.load([
+            {'title': 'ok', 'instructions': 'x', 'image_path': 'cake_1.jpg'},
+            {'title': 'missing', 'instructions': 'x', 'image_path': 'missing.jpg'},
+            {'title': 'absolute', 'instructions': 'x', 'image_path': '/etc/passwd'},
+            {'title': 'parent', 'instructions': 'x', 'image_path': '../cake_1.jpg'},
+        ])
+        images = dict(db.session.execute(db.select(Recipe.title, Recipe.image_path)).all())
+    assert images == {'ok': 'cake_1.jpg', 'missing': None, 'absolute': None, 'parent': None}
+
+
+def test_delete_image_files_stays_inside_upload_folder(tmp_path):
+    uploads = tmp_path / 'uploads'
+    (uploads / 'variants').mkdir(parents=True)
+    victim = tmp_path / 'victim.txt'
+    victim.write_text('data')
+
+    delete_image_files(str(uploads), '../victim.txt', (400,))
+    delete_image_files(str(uploads), str(victim), (400,))
+    assert victim.exists()
+
+    (uploads / 'cake.jpg').write_bytes(b'jpg')
+    (uploads / 'variants' / 'cake_400.jpg').write_bytes(b'jpg')
+    delete_image_files(str(uploads), 'cake.jpg', (400,))
+    assert list(uploads.rglob('*.jpg')) == []
+
+
+def test_loader_counts_one_rating_per_user(app):
+    with app.app_context():
+        author = create_user('author')
+        fan = create_user('fan')
+        loader = RecipeLoader(default_author=author.email)
+        stats = loader.load([{'title': 'Торт', 'instructions': 'x', 'ratings': [
+            {'author': fan.email, 'rating': 2},
+            {'rating': 4},
+            {'author': fan.email, 'rating': 5},
+        ]}])
+        recipe = db.session.execute(db.select(Recipe)).scalar_one()
+        ratings = dict(db.session.execute(db.select(Rating.user_id, Rating.rating)).all())
+        assert (recipe.rating_sum, recipe.rating_count) == (9, 2)
+        assert ratings == {fan.id: 5, author.id: 4}
+        assert stats['ratings'] == 2
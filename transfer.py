@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Перенос каталога рецептов между окружениями в формате NDJSON (JSON Lines).
+
+Одна строка - один рецепт с категорией, автором и ингредиентами:
+    {"id": 17, "title": "Тирамису", "description": "...", "instructions": "...",
+     "prep_time": 45, "cook_time": 0, "servings": 6, "category": "Десерты",
+     "author": "test@example.com",
+     "ingredients": [{"name": "Маскарпоне", "quantity": 500, "unit": "г", "notes": "..."}],
+     "comments": [{"author": "test@example.com", "content": "..."}],
+     "ratings": [{"author": "test@example.com", "rating": 5}]}
+
+Экспорт (export_records) читает рецепты одним запросом через серверный
+курсор и отдает записи по одной, поэтому память не зависит от размера
+таблицы. Записи идут по возрастанию id: для продолжения прерванной
+выгрузки достаточно передать id последней полученной записи.
+
+Загрузка (RecipeLoader) пишет записи пакетами: на каждый пакет одна
+транзакция и несколько многострочных INSERT/UPDATE. Рецепт определяется
+автором и названием (id из файла не используется): существующие рецепты
+пропускаются или, с update_existing, обновляются вместе с ингредиентами.
+После каждого пакета вызывается on_batch с числом зафиксированных записей -
+это контрольная точка для продолжения загрузки.
+"""
+
+import csv
+import json
+from datetime import datetime
+from itertools import groupby, islice
+
+from bulk import insert_ignore, resolve_ingredient_ids
+from images import stored_upload_name
+from models import db, User, Recipe, Category, Ingredient, RecipeIngredient, Comment, Rating
+from search import index_recipes
+
+DEFAULT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 1000
+INTEGER_FIELDS = ('prep_time', 'cook_time', 'servings')
+JSON_FIELDS = ('ingredients', 'comments', 'ratings')
+
+
+def _int_or_none(value):
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+def read_records(path):
+    """Потоково читает рецепты из .jsonl/.ndjson/.json (по строке) или .csv"""
+    if path.lower().endswith('.csv'):
+        with open(path, encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                record = {key: value for key, value in row.items() if value not in (None, '')}
+                for field in JSON_FIELDS:
+                    if field in record:
+                        record[field] = json.loads(record[field])
+                yield record
+    else:
+        with open(path, encoding='utf-8') as f:
+            yield from parse_ndjson(f)
+
+
+def parse_ndjson(lines):
+    """Разбирает строки NDJSON (str или bytes), пропуская пустые"""
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Строка {number}: некорректный JSON ({e.msg})")
+        if not isinstance(record, dict):
+            raise ValueError(f"Строка {number}: ожидается объект рецепта")
+        yield record
+
+
+def batched(records, size):
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class RecipeLoader:
+    """
+    Пакетная загрузка рецептов. Справочники (пользователи, категории,
+    ингредиенты) запоминаются между пакетами, поэтому каждый известный id
+    ищется один раз.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, default_author=None, update_existing=False):
+        self.batch_size = batch_size
+        self.default_author = default_author
+        self.update_existing = update_existing
+        self.user_ids = {}
+        self.category_ids = {}
+        self.ingredient_ids = {}
+        self.committed = 0
+        self.stats = {'recipes': 0, 'updated': 0, 'skipped': 0, 'ingredients': 0, 'comments': 0, 'ratings': 0}
+
+    def load(self, records, on_batch=None):
+        for batch in batched(records, self.batch_size):
+            try:
+                self._load_batch(batch)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            self.committed += len(batch)
+            if on_batch:
+                on_batch(self.committed)
+        return self.stats
+
+    # --- Справочники ---
+
+    def _resolve_users(self, emails):
+        missing = [email for email in emails if email not in self.user_ids]
+        if missing:
+            self.user_ids.update(db.session.execute(
+                db.select(User.email, User.id).where(User.email.in_(missing))
+            ).all())
+        unknown = [email for email in emails if email not in self.user_ids]
+        if unknown:
+            raise ValueError(f"Пользователи не найдены: {', '.join(sorted(unknown)[:10])}")
+
+    def _resolve_categories(self, names):
+        missing = [name for name in names if name not in self.category_ids]
+        if not missing:
+            return
+        query = db.select(Category.name, Category.id).where(Category.name.in_(missing))
+        self.category_ids.update(db.session.execute(query).all())
+        # У категорий нет уникального ключа по названию: создаем только отсутствующие
+        new = [name for name in missing if name not in self.category_ids]
+        if new:
+            db.session.execute(db.insert(Category), [{'name': name} for name in new])
+            self.category_ids.update(db.session.execute(query).all())
+
+    def _resolve_ingredients(self, units_by_name):
+        missing = {name: unit for name, unit in units_by_name.items() if name not in self.ingredient_ids}
+        if missing:
+            self.ingredient_ids.update(resolve_ingredient_ids(missing))
+
+    # --- Пакет ---
+
+    def _author(self, record):
+        author = record.get('author') or self.default_author
+        if not author:
+            raise ValueError(f"Не указан автор рецепта «{record.get('title')}» (используйте --author)")
+        return author
+
+    def _recipe_values(self, record):
+        if not record.get('title'):
+            raise ValueError("Запись без названия рецепта")
+        values = {field: _int_or_none(record.get(field)) for field in INTEGER_FIELDS}
+        return {
+            'description': record.get('description'),
+            'instructions': record.get('instructions') or '',
+            'total_time': Recipe.calculate_total_time(values['prep_time'], values['cook_time']),
+            'category_id': self.category_ids.get(record.get('category')),
+            **values,
+        }
+
+    def _load_batch(self, batch):
+        emails, categories, units_by_name = set(), set(), {}
+        for record in batch:
+            emails.add(self._author(record))
+            if record.get('category'):
+                categories.add(record['category'])
+            for ingredient in record.get('ingredients') or []:
+                units_by_name.setdefault(ingredient['name'], ingredient.get('unit'))
+            for item in (record.get('comments') or []) + (record.get('ratings') or []):
+                emails.add(item.get('author') or self._author(record))
+        self._resolve_users(emails)
+        self._resolve_categories(categories)
+        self._resolve_ingredients(units_by_name)
+
+        # Рецепт определяется автором и названием
+        keys = {(self.user_ids[self._author(record)], record.get('title')) for record in batch}
+        existing = self._recipe_ids(keys)
+
+        new_records, updated_records, seen = {}, {}, set()
+        for record in batch:
+            key = (self.user_ids[self._author(record)], record.get('title'))
+            if key in seen or (key in existing and not self.update_existing):
+                self.stats['skipped'] += 1
+                continue
+            seen.add(key)
+            if key in existing:
+                updated_records[existing[key]] = record
+            else:
+                new_records[key] = record
+
+        if updated_records:
+            self._update_recipes(updated_records)
+        recipe_ids = self._insert_recipes(new_records) if new_records else {}
+
+        # Ингредиенты пишутся заново для новых и обновленных рецептов;
+        # комментарии и оценки - только для новых, чтобы не дублировать их
+        ingredient_rows, comment_rows, rating_rows = [], [], []
+        records_by_id = dict(updated_records)
+        records_by_id.update((recipe_ids[key], record) for key, record in new_records.items())
+        for recipe_id, record in records_by_id.items():
+            for ingredient in record.get('ingredients') or []:
+                ingredient_rows.append({
+                    'recipe_id': recipe_id,
+                    'ingredient_id': self.ingredient_ids[ingredient['name']],
+                    'quantity': float(ingredient.get('quantity') or 0),
+                    'notes': ingredient.get('notes'),
+                })
+            if recipe_id in updated_records:
+                continue
+            for comment in record.get('comments') or []:
+                comment_rows.append({
+                    'recipe_id': recipe_id,
+                    'user_id': self.user_ids[comment.get('author') or self._author(record)],
+                    'content': comment['content'],
+                })
+            rating_rows.extend(
+                {'recipe_id': recipe_id, 'user_id': user_id, 'rating': rating}
+                for user_id, rating in self._ratings(record).items()
+            )
+        if ingredient_rows:
+            db.session.execute(db.insert(RecipeIngredient), ingredient_rows)
+        if comment_rows:
+            db.session.execute(db.insert(Comment), comment_rows)
+        if rating_rows:
+            insert_ignore(Rating, rating_rows, ['user_id', 'recipe_id'])
+        index_recipes(list(records_by_id))
+
+        self.stats['recipes'] += len(new_records)
+        self.stats['updated'] += len(updated_records)
+        self.stats['ingredients'] += len(ingredient_rows)
+        self.stats['comments'] += len(comment_rows)
+        self.stats['ratings'] += len(rating_rows)
+
+    def _ratings(self, record):
+        """{user_id: оценка}: у пользователя одна оценка рецепта, при повторах - последняя"""
+        return {
+            self.user_ids[item.get('author') or self._author(record)]: int(item['rating'])
+            for item in record.get('ratings') or []
+        }
+
+    def _insert_recipes(self, new_records):
+        rows = []
+        for (user_id, title), record in new_records.items():
+            ratings = self._ratings(record)
+            rows.append({
+                'title': title,
+                # Принимается только имя существующего файла в папке загрузок
+                'image_path': stored_upload_name(record.get('image_path')),
+                'user_id': user_id,
+                'rating_sum': sum(ratings.values()),
+                'rating_count': len(ratings),
+                'comment_count': len(record.get('comments') or []),
+                **self._recipe_values(record),
+            })
+        db.session.execute(db.insert(Recipe), rows)
+        # Многострочный INSERT не возвращает id во всех СУБД, поэтому читаем их по ключу
+        return self._recipe_ids(new_records.keys())
+
+    def _update_recipes(self, records_by_id):
+        """UPDATE по первичному ключу одним executemany и замена ингредиентов"""
+        now = datetime.utcnow()
+        db.session.execute(db.update(Recipe), [
+            {'id': recipe_id, 'updated_at': now, **self._recipe_values(record)}
+            for recipe_id, record in records_by_id.items()
+        ])
+        db.session.execute(
+            db.delete(RecipeIngredient).where(RecipeIngredient.recipe_id.in_(list(records_by_id)))
+        )
+
+    def _recipe_ids(self, keys):
+        """{(user_id, title): id} для существующих рецептов (при дублях - последний)"""
+        if not keys:
+            return {}
+        user_ids = {user_id for user_id, _ in keys}
+        titles = {title for _, title in keys}
+        rows = db.session.execute(
+            db.select(Recipe.user_id, Recipe.title, Recipe.id)
+            .where(Recipe.user_id.in_(user_ids), Recipe.title.in_(titles))
+            .order_by(Recipe.id)
+        ).all()
+        return {(user_id, title): recipe_id for user_id, title, recipe_id in rows
+                if (user_id, title) in keys}
+
+
+def export_records(connection, after_id=0, user_id=None, include_authors=True, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Генератор записей рецептов с id больше after_id (по возрастанию id).
+
+    Выполняет один запрос с серверным курсором (stream_results): строки
+    читаются из БД порциями по chunk_size. Пока генератор не исчерпан,
+    соединение занято, поэтому ему нужно отдельное соединение (engine.connect()).
+    """
+    query = (
+        db.select(
+            Recipe.id, Recipe.title, Recipe.description, Recipe.instructions,
+            Recipe.prep_time, Recipe.cook_time, Recipe.servings,
+            Category.name.label('category'), User.email.label('author'),
+            Ingredient.name.label('ingredient'), Ingredient.unit,
+            RecipeIngredient.quantity, RecipeIngredient.notes,
+        )
+        .join(User, User.id == Recipe.user_id)
+        .outerjoin(Category, Category.id == Recipe.category_id)
+        .outerjoin(RecipeIngredient, RecipeIngredient.recipe_id == Recipe.id)
+        .outerjoin(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id)
+        .where(Recipe.id > after_id)
+        .order_by(Recipe.id, RecipeIngredient.id)
+    )
+    if user_id is not None:
+        query = query.where(Recipe.user_id == user_id)
+
+    result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+    try:
+        for _, rows in groupby(result, key=lambda row: row.id):
+            rows = list(rows)
+            first = rows[0]
+            record = {
+                'id': first.id,
+                'title': first.title,
+                'description': first.description,
+                'instructions': first.instructions,
+                'prep_time': first.prep_time,
+                'cook_time': first.cook_time,
+                'servings': first.servings,
+                'category': first.category,
+            }
+            if include_authors:
+                record['author'] = first.author
+            record['ingredients'] = [
+                {'name': row.ingredient, 'quantity': row.quantity, 'unit': row.unit, 'notes': row.notes}
+                for row in rows if row.ingredient is not None
+            ]
+            yield record
+    finally:
+        result.close()
+
+
+def to_ndjson(record):
+    return json.dumps(record, ensure_ascii=False) + '\n'